@@ -2,27 +2,40 @@ import json
 import os
 from pathlib import Path
 import time
-from datetime import datetime, timedelta
 from google import genai
 from google.genai import types
 import requests
 import threading
 import traceback
+from contextlib import nullcontext
 import socket
 import webbrowser
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 import logging
 from PIL import Image, UnidentifiedImageError
 import io
+import sys
 import PyPDF2
 
 SCRIPT_DIR = Path(os.path.dirname(os.path.abspath(__file__)))
+# Wspólne moduły projektu (wsgi_server) leżą katalog wyżej
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+from wsgi_server import SERVE_HOST, add_serve_arguments, serve
+from token_usage import TokenUsageTracker
+from background_writer import BackgroundWriter
+from session_store import SessionStore, gemini_chat_adapter
+
 CONFIG_FILE = SCRIPT_DIR / "config.json"
 API_HISTORY_DIR = SCRIPT_DIR / "api-history"
 LOG_FILE_ERROR = SCRIPT_DIR / "error-backend.txt"
 GEMINI_MODEL_NAME_FILE = SCRIPT_DIR / "gemini_model_name.txt"
 TOKEN_STATS_FILE = SCRIPT_DIR / "token_stats.json"
+TOKEN_LOG_FILE = SCRIPT_DIR / "token_usage.log"
+SESSION_SPILL_DIR = SCRIPT_DIR / "session-cache"
+MAX_SESSIONS = 50
+MAX_SESSIONS_MB = 256
+SESSION_TTL = 3600
 HOST = "0.0.0.0"
 PORT = 8147
 MAX_FILES = 5
@@ -76,11 +89,21 @@ class BackendApp:
         self.shutting_down = False
 
         self.gemini_client = None
-        self.chat_sessions = {}
+        # Sesje czatu: limit liczby i pamięci, TTL bezczynności, LRU; usunięte z pamięci wracają z dysku
+        self.chat_sessions = SessionStore(
+            **gemini_chat_adapter(lambda: self.gemini_client, lambda: self.current_model),
+            max_sessions=MAX_SESSIONS,
+            max_bytes=MAX_SESSIONS_MB * 1024 * 1024,
+            ttl=SESSION_TTL,
+            spill_dir=SESSION_SPILL_DIR
+        )
         self.current_model = GEMINI_MODEL_NAME
         self.model_info = load_model_info()
         self.api_connection_status = {self.current_model: None}
-        self.token_usage_history = []  # Lista z timestampami i liczbą tokenów
+        # Jeden wątek zapisu w tle dla historii API i statystyk tokenów
+        self.writer = BackgroundWriter(on_error=lambda message: self.log(message, is_error=True))
+        # Kubełki sekundowe i minutowe z bieżącymi sumami okien (snapshot + log dopisywany)
+        self.token_usage = TokenUsageTracker(TOKEN_STATS_FILE, TOKEN_LOG_FILE, writer=self.writer)
         
         # Wczytaj statystyki tokenów z pliku
         self.load_token_stats()
@@ -182,34 +205,26 @@ class BackendApp:
                 response_content = f"\n###RESPONSE### ({time.strftime('%H:%M:%S')})\n{response_text}\n"
                 separator = "\n" + "="*80 + "\n\n"
                 
-                # Dopisz do istniejącego pliku lub utwórz nowy
+                # Dopisz do istniejącego pliku lub utwórz nowy z nagłówkiem sesji (decyduje wątek zapisu)
                 full_content = ask_content + response_content + separator
-                if session_file_path.exists():
-                    # Dopisz do istniejącego pliku
-                    with open(session_file_path, 'a', encoding='utf-8') as f:
-                        f.write(full_content)
-                else:
-                    # Utwórz nowy plik z nagłówkiem sesji
-                    session_header = f"=== SESJA: {session_id} ===\n"
-                    session_header += f"=== ROZPOCZĘTA: {time.strftime('%Y-%m-%d %H:%M:%S')} ===\n"
-                    session_header += f"=== MODEL: {self.current_model} ===\n\n"
-                    with open(session_file_path, 'w', encoding='utf-8') as f:
-                        f.write(session_header + full_content)
+                session_header = f"=== SESJA: {session_id} ===\n"
+                session_header += f"=== ROZPOCZĘTA: {time.strftime('%Y-%m-%d %H:%M:%S')} ===\n"
+                session_header += f"=== MODEL: {self.current_model} ===\n\n"
+                self.writer.append(session_file_path, full_content, header=session_header)
                 
                 self.log(f"Zapisano do pliku sesji: {session_filename}")
             else:
                 # Tryb jednorazowy - zachowaj oryginalny sposób zapisu
                 timestamp_dir_name = time.strftime("%Y-%m-%d_%H-%M-%S")
                 history_folder = API_HISTORY_DIR / timestamp_dir_name
-                history_folder.mkdir(exist_ok=True, parents=True)
 
                 ask_content = f"--- PROMPT ---\n{prompt}\n"
 
-                (history_folder / "ask.txt").write_text(ask_content, encoding="utf-8")
+                self.writer.write(history_folder / "ask.txt", ask_content)
 
                 safe_model_name = self.current_model.replace("/", "_").replace(":", "_")
                 response_filename = f"response_{safe_model_name}.txt"
-                (history_folder / response_filename).write_text(str(response_text), encoding="utf-8")
+                self.writer.write(history_folder / response_filename, str(response_text))
                 self.log(f"Zapisano historię zapytania w: {history_folder}")
                 
         except Exception as e:
@@ -228,25 +243,79 @@ class BackendApp:
             self.log(f"BŁĄD weryfikacji PDF: {e}", is_error=True)
             return False
 
-    def get_or_create_session(self, session_id):
-        """Pobiera istniejącą sesję lub tworzy nową"""
-        if session_id not in self.chat_sessions:
-            try:
-                session_obj = self.gemini_client.chats.create(model=self.current_model)
-                self.chat_sessions[session_id] = session_obj
-                self.log(f"Utworzono nową sesję: {session_id} z modelem {self.current_model}")
-            except Exception as e:
-                self.log(f"BŁĄD tworzenia sesji {session_id}: {e}", is_error=True)
-                raise
-        return self.chat_sessions[session_id]
-    
     def reset_session(self, session_id):
-        if session_id in self.chat_sessions:
-            del self.chat_sessions[session_id]
+        if self.chat_sessions.reset(session_id):
             self.log(f"Zresetowano sesję: {session_id}")
             return True
         return False
 
+    def prepare_message(self, prompt, files, in_session=False):
+        """Prompt i zweryfikowane pliki (obrazy, PDF) jako treść wiadomości; zwraca (treść, nazwy plików)"""
+        target = " do sesji" if in_session else ""
+        message_content = [prompt]
+        processed_file_names = []
+        
+        # Pliki wysłane w sesji są automatycznie zapamiętane w jej historii
+        for file in files:
+            try:
+                file_data = file.read()
+                file_name = file.filename
+
+                if file.mimetype.startswith('image/'):
+                    try:
+                        # Zweryfikuj obraz
+                        img = Image.open(io.BytesIO(file_data))
+                        img.verify()
+                        img.close()  # Zwolnij zasoby po weryfikacji
+                        
+                        # Utwórz obraz do użycia
+                        pil_image = Image.open(io.BytesIO(file_data))
+                        message_content.append(pil_image)
+                        processed_file_names.append(file_name)
+                        self.log(f"Dodano obraz{target}: {file_name}")
+                    except (UnidentifiedImageError, Exception) as img_err:
+                        self.log(f"BŁĄD weryfikacji obrazu {file_name}: {img_err}. Pomijanie.", is_error=True)
+                        continue
+
+                elif file.mimetype == 'application/pdf':
+                    if self.verify_pdf(file_data):
+                        pdf_part = types.Part.from_bytes(
+                            data=file_data,
+                            mime_type='application/pdf'
+                        )
+                        message_content.append(pdf_part)
+                        processed_file_names.append(file_name)
+                        self.log(f"Dodano PDF{target}: {file_name}")
+                    else:
+                        self.log(f"BŁĄD: Plik {file_name} nie jest prawidłowym PDF. Pomijanie.", is_error=True)
+                        continue
+                else:
+                    self.log(f"OSTRZEŻENIE: Nieobsługiwany typ pliku: {file.mimetype} dla {file_name}. Pomijanie.", is_error=True)
+                    continue
+                file.seek(0)
+            except Exception as e:
+                self.log(f"BŁĄD przetwarzania pliku {file.filename}: {e}. Pomijanie.", is_error=True)
+                continue
+        
+        return message_content, processed_file_names
+
+    def add_token_fields(self, response_data, usage_metadata, total_tokens, session_id, remember_conversation):
+        """Dopisuje do odpowiedzi licznik tokenów sesji albo tokeny pojedynczej wiadomości"""
+        if remember_conversation:
+            response_data["sessionTokenCount"] = total_tokens
+            response_data["sessionId"] = session_id
+        else:
+            # Tryb pojedynczej wiadomości - dodaj informacje o tokenach
+            response_data["singleMessageTokens"] = total_tokens
+            # Spróbuj wyodrębnić tokeny wejściowe i wyjściowe
+            if usage_metadata:
+                if hasattr(usage_metadata, 'prompt_token_count') and hasattr(usage_metadata, 'candidates_token_count'):
+                    response_data["inputTokens"] = usage_metadata.prompt_token_count
+                    response_data["outputTokens"] = usage_metadata.candidates_token_count
+                else:
+                    response_data["inputTokens"] = "N/A"
+                    response_data["outputTokens"] = "N/A"
+
     def generate_response(self, prompt, files, session_id=None, remember_conversation=False):
         num_files = len(files)
         log_suffix = f" + {num_files} plik(ów)" if num_files > 0 else ""
@@ -262,79 +331,35 @@ class BackendApp:
 
         try:
             if remember_conversation and session_id:
-                # Tryb sesji - użyj lub utwórz sesję
-                chat_session = self.get_or_create_session(session_id)
+                # Tryb sesji - sesja jest pobierana (lub tworzona) pod blokadą przy wysyłce
+                message_content, processed_file_names = self.prepare_message(prompt, files, in_session=True)
                 
-                # Przygotuj zawartość wiadomości
-                message_content = [prompt]
-                processed_file_names = []
+                # Wyślij wiadomość w sesji - żądania tej samej sesji po kolei (np. dwie karty),
+                # różnych sesji równolegle; po bloku magazyn przelicza rozmiar sesji
+                with self.chat_sessions.session(session_id) as chat_session:
+                    response = chat_session.send_message(message_content)
                 
-                # Dodaj pliki do wiadomości (są automatycznie zapamiętane w sesji)
-                for file in files:
+                    # Pobierz historię sesji dla liczenia tokenów
+                    total_tokens = 0
                     try:
-                        file_data = file.read()
-                        file_name = file.filename
-
-                        if file.mimetype.startswith('image/'):
-                            try:
-                                # Zweryfikuj obraz
-                                img = Image.open(io.BytesIO(file_data))
-                                img.verify()
-                                img.close()  # Zwolnij zasoby po weryfikacji
-                                
-                                # Utwórz obraz do użycia
-                                pil_image = Image.open(io.BytesIO(file_data))
-                                message_content.append(pil_image)
-                                processed_file_names.append(file_name)
-                                self.log(f"Dodano obraz do sesji: {file_name}")
-                            except (UnidentifiedImageError, Exception) as img_err:
-                                self.log(f"BŁĄD weryfikacji obrazu {file_name}: {img_err}. Pomijanie.", is_error=True)
-                                continue
-
-                        elif file.mimetype == 'application/pdf':
-                            if self.verify_pdf(file_data):
-                                pdf_part = types.Part.from_bytes(
-                                    data=file_data,
-                                    mime_type='application/pdf'
-                                )
-                                message_content.append(pdf_part)
-                                processed_file_names.append(file_name)
-                                self.log(f"Dodano PDF do sesji: {file_name}")
-                            else:
-                                self.log(f"BŁĄD: Plik {file_name} nie jest prawidłowym PDF. Pomijanie.", is_error=True)
-                                continue
-                        else:
-                            self.log(f"OSTRZEŻENIE: Nieobsługiwany typ pliku: {file.mimetype} dla {file_name}. Pomijanie.", is_error=True)
-                            continue
-                        file.seek(0)
-                    except Exception as e:
-                        self.log(f"BŁĄD przetwarzania pliku {file.filename}: {e}. Pomijanie.", is_error=True)
-                        continue
-                
-                # Wyślij wiadomość w sesji
-                response = chat_session.send_message(message_content)
-                
-                # Pobierz historię sesji dla liczenia tokenów
-                total_tokens = 0
-                try:
-                    history = chat_session.get_history(curated=True)
+                        history = chat_session.get_history(curated=True)
                     
-                    # Liczenie tokenów - sprawdzamy każdy content w historii
-                    for content in history:
-                        if hasattr(content, 'usage_metadata') and content.usage_metadata:
-                            total_tokens += content.usage_metadata.total_token_count
+                        # Liczenie tokenów - sprawdzamy każdy content w historii
+                        for content in history:
+                            if hasattr(content, 'usage_metadata') and content.usage_metadata:
+                                total_tokens += content.usage_metadata.total_token_count
                     
-                    # Jeśli historia nie ma metadanych tokenów, użyj danych z aktualnej odpowiedzi
-                    if total_tokens == 0 and hasattr(response, 'usage_metadata') and response.usage_metadata:
-                        total_tokens = response.usage_metadata.total_token_count
+                        # Jeśli historia nie ma metadanych tokenów, użyj danych z aktualnej odpowiedzi
+                        if total_tokens == 0 and hasattr(response, 'usage_metadata') and response.usage_metadata:
+                            total_tokens = response.usage_metadata.total_token_count
                     
-                except Exception as e:
-                    self.log(f"❌ BŁĄD: Problem z get_history: {e}", is_error=True)
-                    # FALLBACK: Użyj danych z aktualnej odpowiedzi
-                    if hasattr(response, 'usage_metadata') and response.usage_metadata:
-                        total_tokens = response.usage_metadata.total_token_count
+                    except Exception as e:
+                        self.log(f"❌ BŁĄD: Problem z get_history: {e}", is_error=True)
+                        # FALLBACK: Użyj danych z aktualnej odpowiedzi
+                        if hasattr(response, 'usage_metadata') and response.usage_metadata:
+                            total_tokens = response.usage_metadata.total_token_count
                 
-                self.log(f"📊 TOKENY SESJI: {total_tokens}")
+                    self.log(f"📊 TOKENY SESJI: {total_tokens}")
                 
                 # Dodaj tokeny z aktualnego zapytania do historii
                 if hasattr(response, 'usage_metadata') and response.usage_metadata:
@@ -348,52 +373,7 @@ class BackendApp:
                 
                 # Utwórz tymczasową sesję
                 temp_session = self.gemini_client.chats.create(model=self.current_model)
-                
-                # Przygotuj zawartość wiadomości
-                message_content = [prompt]
-                processed_file_names = []
-                
-                # Dodaj pliki
-                for file in files:
-                    try:
-                        file_data = file.read()
-                        file_name = file.filename
-
-                        if file.mimetype.startswith('image/'):
-                            try:
-                                # Zweryfikuj obraz
-                                img = Image.open(io.BytesIO(file_data))
-                                img.verify()
-                                img.close()  # Zwolnij zasoby po weryfikacji
-                                
-                                # Utwórz obraz do użycia
-                                pil_image = Image.open(io.BytesIO(file_data))
-                                message_content.append(pil_image)
-                                processed_file_names.append(file_name)
-                                self.log(f"Dodano obraz: {file_name}")
-                            except (UnidentifiedImageError, Exception) as img_err:
-                                self.log(f"BŁĄD weryfikacji obrazu {file_name}: {img_err}. Pomijanie.", is_error=True)
-                                continue
-
-                        elif file.mimetype == 'application/pdf':
-                            if self.verify_pdf(file_data):
-                                pdf_part = types.Part.from_bytes(
-                                    data=file_data,
-                                    mime_type='application/pdf'
-                                )
-                                message_content.append(pdf_part)
-                                processed_file_names.append(file_name)
-                                self.log(f"Dodano PDF: {file_name}")
-                            else:
-                                self.log(f"BŁĄD: Plik {file_name} nie jest prawidłowym PDF. Pomijanie.", is_error=True)
-                                continue
-                        else:
-                            self.log(f"OSTRZEŻENIE: Nieobsługiwany typ pliku: {file.mimetype} dla {file_name}. Pomijanie.", is_error=True)
-                            continue
-                        file.seek(0)
-                    except Exception as e:
-                        self.log(f"BŁĄD przetwarzania pliku {file.filename}: {e}. Pomijanie.", is_error=True)
-                        continue
+                message_content, processed_file_names = self.prepare_message(prompt, files)
                 
                 # Wyślij wiadomość
                 response = temp_session.send_message(message_content)
@@ -417,24 +397,12 @@ class BackendApp:
             response_data["message"] = response_text
             
             # Dodaj licznik tokenów
-            if remember_conversation:
-                response_data["sessionTokenCount"] = total_tokens
-                response_data["sessionId"] = session_id
-            else:
-                # Tryb pojedynczej wiadomości - dodaj informacje o tokenach
-                response_data["singleMessageTokens"] = total_tokens
-                # Spróbuj wyodrębnić tokeny wejściowe i wyjściowe
-                if hasattr(response, 'usage_metadata') and response.usage_metadata:
-                    metadata = response.usage_metadata
-                    if hasattr(metadata, 'prompt_token_count') and hasattr(metadata, 'candidates_token_count'):
-                        response_data["inputTokens"] = metadata.prompt_token_count
-                        response_data["outputTokens"] = metadata.candidates_token_count
-                    else:
-                        response_data["inputTokens"] = "N/A"
-                        response_data["outputTokens"] = "N/A"
+            self.add_token_fields(response_data, getattr(response, 'usage_metadata', None), total_tokens,
+                                  session_id, remember_conversation)
             
             self.log(f"Gemini ({self.current_model}) odpowiedź wygenerowana.")
-            self.create_tracked_thread(self.save_api_communication, args=(prompt, response_text, processed_file_names, session_id, remember_conversation))
+            # Tylko wrzuca zapisy do kolejki BackgroundWriter - bez nowego wątku na żądanie
+            self.save_api_communication(prompt, response_text, processed_file_names, session_id, remember_conversation)
 
         except Exception as e:
             error_message = f"Błąd podczas generowania odpowiedzi ({self.current_model}): {e}"
@@ -444,6 +412,62 @@ class BackendApp:
 
         return response_data
 
+    def generate_response_stream(self, prompt, files, session_id=None, remember_conversation=False):
+        """Jak generate_response, ale oddaje zdarzenia w miarę generowania odpowiedzi.
+
+        {"type": "chunk", "text": ...} dla każdego fragmentu, na końcu
+        {"type": "done", ...} z polami generate_response albo
+        {"type": "error", "message": ...}. Sesja jest zablokowana do końca
+        strumienia - SDK zapisuje odpowiedź w historii po ostatnim fragmencie.
+        """
+        in_session = bool(remember_conversation and session_id)
+        num_files = len(files)
+        log_suffix = f" + {num_files} plik(ów)" if num_files > 0 else ""
+        mode_suffix = f" (sesja: {session_id})" if in_session else ""
+        self.log(f"Otrzymano żądanie (strumień) dla modelu: {self.current_model}{log_suffix}{mode_suffix}")
+
+        if not self.gemini_client:
+            message = "Błąd: Klient Gemini nie jest zainicjalizowany."
+            self.log(message, is_error=True)
+            yield {"type": "error", "message": message}
+            return
+
+        try:
+            message_content, processed_file_names = self.prepare_message(prompt, files, in_session)
+            if in_session:
+                chat_scope = self.chat_sessions.session(session_id)
+            else:
+                chat_scope = nullcontext(self.gemini_client.chats.create(model=self.current_model))
+
+            parts = []
+            usage_metadata = None
+            with chat_scope as chat:
+                for chunk in chat.send_message_stream(message_content):
+                    # Liczniki tokenów przychodzą z fragmentami, pełne - z ostatnim
+                    if chunk.usage_metadata:
+                        usage_metadata = chunk.usage_metadata
+                    if chunk.text:
+                        parts.append(chunk.text)
+                        yield {"type": "chunk", "text": chunk.text}
+
+            total_tokens = (usage_metadata.total_token_count or 0) if usage_metadata else 0
+            self.log(f"📊 TOKENY{' SESJI' if in_session else ''}: {total_tokens}")
+            self.add_token_usage(total_tokens)
+
+            response_text = ''.join(parts)
+            response_data = {"message": response_text}
+            self.add_token_fields(response_data, usage_metadata, total_tokens, session_id, remember_conversation)
+
+            self.log(f"Gemini ({self.current_model}) odpowiedź wygenerowana (strumień).")
+            self.save_api_communication(prompt, response_text, processed_file_names,
+                                        session_id, remember_conversation)
+            yield {"type": "done", **response_data}
+
+        except Exception as e:
+            self.log(f"Błąd podczas generowania odpowiedzi ({self.current_model}): {e}", is_error=True)
+            self.log(traceback.format_exc(), is_error=True)
+            yield {"type": "error", "message": f"Wystąpił błąd serwera podczas przetwarzania zapytania: {e}"}
+
     def get_predefined_prompt(self, prompt_id):
         self.log(f"Żądanie predefiniowanego promptu: {prompt_id}")
         filepath = SCRIPT_DIR / f"Prompt{prompt_id}.txt"
@@ -469,97 +493,39 @@ class BackendApp:
             return False
 
     def load_token_stats(self):
-        """Wczytaj statystyki tokenów z pliku JSON"""
+        """Wczytaj statystyki tokenów (snapshot + log, również stary format listy)"""
         try:
-            if TOKEN_STATS_FILE.exists():
-                with open(TOKEN_STATS_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                # Przekonwertuj timestampy z string z powrotem na datetime
-                for entry in data:
-                    entry['timestamp'] = datetime.fromisoformat(entry['timestamp'])
-                
-                # Usuń wpisy starsze niż 24 godziny
-                current_time = datetime.now()
-                cutoff_time = current_time - timedelta(hours=24)
-                self.token_usage_history = [
-                    entry for entry in data 
-                    if entry['timestamp'] > cutoff_time
-                ]
-                
-                self.log(f"Wczytano {len(self.token_usage_history)} wpisów statystyk tokenów")
+            loaded = self.token_usage.load()
+            self.log(f"Wczytano {loaded} wpisów statystyk tokenów")
         except Exception as e:
             self.log(f"BŁĄD wczytywania statystyk tokenów: {e}", is_error=True)
-            self.token_usage_history = []
+            self.token_usage = TokenUsageTracker(TOKEN_STATS_FILE, TOKEN_LOG_FILE, writer=self.writer)
 
     def save_token_stats(self):
-        """Zapisz statystyki tokenów do pliku JSON"""
+        """Zleć zapis snapshotu statystyk tokenów (wykona go wątek zapisu)"""
         try:
-            # Przekonwertuj datetime na string dla JSON
-            data = []
-            for entry in self.token_usage_history:
-                data.append({
-                    'timestamp': entry['timestamp'].isoformat(),
-                    'tokens': entry['tokens']
-                })
-            
-            with open(TOKEN_STATS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
-                
+            self.token_usage.snapshot()
         except Exception as e:
             self.log(f"BŁĄD zapisu statystyk tokenów: {e}", is_error=True)
 
     def add_token_usage(self, token_count):
         """Dodaj użycie tokenów do historii"""
-        if token_count > 0:
-            current_time = datetime.now()
-            self.token_usage_history.append({
-                'timestamp': current_time,
-                'tokens': token_count
-            })
-            
-            # Usuń wpisy starsze niż 24 godziny
-            cutoff_time = current_time - timedelta(hours=24)
-            self.token_usage_history = [
-                entry for entry in self.token_usage_history 
-                if entry['timestamp'] > cutoff_time
-            ]
-            
-            # Zapisz zaktualizowane statystyki
-            self.save_token_stats()
+        try:
+            self.token_usage.add(token_count)
+        except Exception as e:
+            self.log(f"BŁĄD zapisu statystyk tokenów: {e}", is_error=True)
 
     def get_token_statistics(self):
         """Pobierz statystyki tokenów dla różnych przedziałów czasowych"""
-        if not self.token_usage_history:
-            return {
-                'last_minute': 0,
-                'last_hour': 0,
-                'last_day': 0
-            }
-        
-        current_time = datetime.now()
-        minute_ago = current_time - timedelta(minutes=1)
-        hour_ago = current_time - timedelta(hours=1)
-        day_ago = current_time - timedelta(hours=24)
-        
-        stats = {
-            'last_minute': sum(entry['tokens'] for entry in self.token_usage_history 
-                              if entry['timestamp'] > minute_ago),
-            'last_hour': sum(entry['tokens'] for entry in self.token_usage_history 
-                            if entry['timestamp'] > hour_ago),
-            'last_day': sum(entry['tokens'] for entry in self.token_usage_history 
-                           if entry['timestamp'] > day_ago)
-        }
-        
-        return stats
+        return self.token_usage.stats()
 
     def cleanup_threads(self):
         self.shutting_down = True
         # Zapisz statystyki tokenów przed zamknięciem
         self.save_token_stats()
         
-        # Wyczyść wszystkie sesje
-        self.chat_sessions.clear()
+        # Zrzuć sesje na dysk (wrócą po restarcie) i wyczyść pamięć
+        self.chat_sessions.close()
         self.log("Zamykanie wątków i czyszczenie sesji...")
         
         # Poczekaj na zakończenie wszystkich wątków
@@ -572,6 +538,9 @@ class BackendApp:
             
         if self.active_threads:
             self.log(f"OSTRZEŻENIE: {len(self.active_threads)} wątków nie zostało zakończonych", is_error=True)
+        
+        # Zapisz resztę kolejki (snapshot tokenów, historia) i zrób fsync
+        self.writer.close()
 
 
 
@@ -586,11 +555,13 @@ def get_ip_address():
         return "127.0.0.1"
 
 
-if __name__ == "__main__":
-    backend_app = BackendApp()
+def create_app(backend_app=None):
+    """Fabryka aplikacji Flask (gunicorn: "Gemini_with_history:create_app()")."""
+    backend_app = backend_app or BackendApp()
 
     flask_app = Flask(__name__)
     CORS(flask_app)
+    flask_app.extensions['backend_app'] = backend_app
     logging.getLogger('werkzeug').setLevel(logging.ERROR)
 
     @flask_app.route('/')
@@ -664,6 +635,17 @@ if __name__ == "__main__":
             if len(files) > MAX_FILES:
                 return jsonify({"message": f"Przekroczono limit {MAX_FILES} plików."}), 400
 
+            if request.form.get('stream') == 'true':
+                # NDJSON: fragmenty odpowiedzi w miarę generowania, ostatnia linia z tokenami
+                def generate_events():
+                    for event in backend_app.generate_response_stream(prompt, files, session_id, remember_conversation):
+                        yield json.dumps(event, ensure_ascii=False) + '\n'
+
+                response = Response(stream_with_context(generate_events()), mimetype='application/x-ndjson')
+                response.headers['Cache-Control'] = 'no-store'
+                response.headers['X-Accel-Buffering'] = 'no'
+                return response
+
             result = backend_app.generate_response(prompt, files, session_id, remember_conversation)
             return jsonify(result)
 
@@ -702,6 +684,10 @@ if __name__ == "__main__":
             backend_app.log(f"Błąd sprawdzania dostępności nazwy sesji: {e}", is_error=True)
             return jsonify({"available": False, "message": f"Błąd: {e}"}), 500
 
+    @flask_app.route('/api/session-stats', methods=['GET'])
+    def get_session_stats():
+        return jsonify(backend_app.chat_sessions.get_stats())
+
     @flask_app.route('/api/token-stats', methods=['GET'])
     def get_token_stats():
         try:
@@ -711,9 +697,34 @@ if __name__ == "__main__":
             backend_app.log(f"Błąd pobierania statystyk tokenów: {e}", is_error=True)
             return jsonify({"last_minute": 0, "last_hour": 0, "last_day": 0}), 500
 
+    return flask_app
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Gemini backend')
+    parser.add_argument('--serve', action='store_true',
+                        help='Tryb produkcyjny (gunicorn/waitress) bez otwierania przeglądarki')
+    # --serve słucha domyślnie tylko lokalnie (SERVE_HOST); tryb z przeglądarką - jak dotąd w sieci (HOST)
+    add_serve_arguments(parser, None, PORT)
+    args = parser.parse_args()
+    if args.host is None:
+        args.host = SERVE_HOST if args.serve else HOST
+
+    if args.serve:
+        # Każdy proces gunicorn ma własne sesje czatu - przy rememberConversation zostaw --workers 1
+        serve(create_app, host=args.host, port=args.port, workers=args.workers, threads=args.threads,
+              keepalive=args.keepalive, backend=args.backend,
+              on_exit=lambda app: app.extensions['backend_app'].cleanup_threads())
+        raise SystemExit(0)
+
+    backend_app = BackendApp()
+    flask_app = create_app(backend_app)
+
     def run_flask():
         try:
-            flask_app.run(host=HOST, port=PORT, debug=False)
+            flask_app.run(host=args.host, port=args.port, debug=False)
         except Exception as e:
              backend_app.log(f"FATAL: Flask server failed: {e}", is_error=True)
              os._exit(1)
@@ -721,12 +732,12 @@ if __name__ == "__main__":
     threading.Thread(target=run_flask, daemon=True).start()
 
     server_ip = get_ip_address()
-    print(f"Serwer uruchomiony. Dostępny pod adresem: http://{server_ip}:{PORT}")
+    print(f"Serwer uruchomiony. Dostępny pod adresem: http://{server_ip}:{args.port}")
     print(f"Domyślny model: {GEMINI_MODEL_NAME}")
     
     # Automatyczne otwieranie index.html
     try:
-        webbrowser.open(f"http://{server_ip}:{PORT}")
+        webbrowser.open(f"http://{server_ip}:{args.port}")
     except Exception as e:
         print(f"Nie można otworzyć przeglądarki: {e}")
     
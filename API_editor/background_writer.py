@@ -0,0 +1,177 @@
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+WRITER_QUEUE_SIZE = 1000
+WRITER_BATCH_SIZE = 256
+FSYNC_INTERVAL = 1.0  # s
+
+
+class BackgroundWriter:
+    """Jeden wątek zapisu z ograniczoną kolejką (write-behind).
+
+    Żądania HTTP tylko wrzucają operacje do kolejki. Wątek zbiera je
+    partiami, kolejne dopisania do tego samego pliku łączy w jeden zapis,
+    a co `fsync_interval` s (i przy zamknięciu) robi fsync zmienionych
+    plików. Kolejność operacji jest zachowana - `call` (np. snapshot
+    statystyk, który czyści log) działa jak bariera dla dopisań przed nim.
+    Pełna kolejka blokuje wrzucającego, zamiast gubić zapisy.
+    """
+
+    def __init__(self, max_queued: int = WRITER_QUEUE_SIZE, batch_size: int = WRITER_BATCH_SIZE,
+                 fsync_interval: float = FSYNC_INTERVAL, on_error: Optional[Callable[[str], None]] = None):
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.on_error = on_error or print
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=max_queued)
+        self._dirty = set()
+        self._closed = False
+        self.stats = {'operations': 0, 'batches': 0, 'writes': 0, 'fsyncs': 0, 'blocked': 0, 'errors': 0}
+        self._thread = threading.Thread(target=self._run, daemon=True, name='background-writer')
+        self._thread.start()
+
+    def append(self, path, text: str, header: Optional[str] = None):
+        """Dopisuje tekst; `header` trafia na początek, gdy plik jeszcze nie istnieje."""
+        self._put(('append', str(path), text, header))
+
+    def write(self, path, text: str):
+        """Zapisuje cały plik (tworzy brakujące katalogi)."""
+        self._put(('write', str(path), text, None))
+
+    def call(self, fn: Callable[[], None]):
+        """Wykonuje `fn` w wątku zapisu, po wszystkich wcześniejszych operacjach."""
+        self._put(('call', None, fn, None))
+
+    def _put(self, item):
+        if self._closed:
+            raise RuntimeError("BackgroundWriter jest zamknięty")
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.stats['blocked'] += 1
+            self._queue.put(item)
+
+    def _run(self):
+        next_fsync = time.monotonic() + self.fsync_interval
+        while True:
+            try:
+                first = self._queue.get(timeout=max(0.0, next_fsync - time.monotonic()))
+            except queue.Empty:
+                first = None
+            batch = [first] if first is not None else []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            self._execute([item for item in batch if item is not None])
+            for _ in batch:
+                self._queue.task_done()
+            if stop or time.monotonic() >= next_fsync:
+                self._fsync()
+                next_fsync = time.monotonic() + self.fsync_interval
+            if stop:
+                return
+
+    def _execute(self, batch: List[tuple]):
+        if not batch:
+            return
+        self.stats['batches'] += 1
+        pending: Dict[str, List[str]] = {}
+        headers: Dict[str, Optional[str]] = {}
+        for kind, path, payload, header in batch:
+            self.stats['operations'] += 1
+            if kind == 'append':
+                pending.setdefault(path, []).append(payload)
+                headers.setdefault(path, header)
+                continue
+            # Bariera: najpierw wszystko, co było w kolejce wcześniej
+            self._flush_appends(pending, headers)
+            try:
+                if kind == 'write':
+                    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write(payload)
+                    self._dirty.add(path)
+                    self.stats['writes'] += 1
+                else:
+                    payload()
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.on_error(f"BŁĄD zapisu w tle ({path or kind}): {e}")
+        self._flush_appends(pending, headers)
+
+    def _flush_appends(self, pending: Dict[str, List[str]], headers: Dict[str, Optional[str]]):
+        for path, parts in pending.items():
+            try:
+                header = headers.get(path)
+                if header and os.path.exists(path):
+                    header = None
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write((header or '') + ''.join(parts))
+                self._dirty.add(path)
+                self.stats['writes'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.on_error(f"BŁĄD zapisu w tle ({path}): {e}")
+        pending.clear()
+        headers.clear()
+
+    def _fsync(self):
+        dirty, self._dirty = self._dirty, set()
+        for path in dirty:
+            try:
+                with open(path, 'ab') as f:
+                    os.fsync(f.fileno())
+                self.stats['fsyncs'] += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.stats['errors'] += 1
+                self.on_error(f"BŁĄD fsync ({path}): {e}")
+
+    def flush(self):
+        """Czeka, aż wszystkie operacje z kolejki zostaną zapisane."""
+        self._queue.join()
+
+    def close(self, timeout: float = 5.0):
+        """Zapisuje resztę kolejki, robi fsync i kończy wątek."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, 'queued': self._queue.qsize()}
+
+
+if __name__ == '__main__':
+    # Opóźnienie po stronie żądania: zapis synchroniczny z fsync vs. wrzucenie do kolejki
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'history.txt')
+        count = 2000
+        started = time.perf_counter()
+        for n in range(count):
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(f'linia {n}\n')
+                f.flush()
+                os.fsync(f.fileno())
+        sync_us = (time.perf_counter() - started) / count * 1e6
+
+        writer = BackgroundWriter()
+        started = time.perf_counter()
+        for n in range(count):
+            writer.append(path, f'linia {n}\n')
+        enqueue_us = (time.perf_counter() - started) / count * 1e6
+        writer.close()
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        assert len(lines) == 2 * count and lines[-1] == f'linia {count - 1}'
+        print(f"Zapis + fsync w żądaniu: {sync_us:.0f} µs, kolejka: {enqueue_us:.1f} µs; {writer.get_stats()}")
@@ -0,0 +1,260 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+SECOND_BUCKETS = 60          # okno "ostatnia minuta"
+MINUTE_BUCKETS = 24 * 60     # okno "ostatnie 24 h"
+HOUR_MINUTES = 60
+SNAPSHOT_VERSION = 2
+SNAPSHOT_INTERVAL = 60       # s między zapisami pełnego stanu
+
+
+class TokenUsageTracker:
+    """Liczniki tokenów w oknach 1 min / 1 h / 24 h o stałym koszcie.
+
+    Dwa bufory cykliczne - 60 kubełków sekundowych i 1440 minutowych - z
+    bieżącymi sumami okien. Upływ czasu zeruje tylko kubełki, które wypadły
+    z okna (najwyżej rozmiar bufora), więc `add` i `stats` nie przeglądają
+    historii. Każde użycie to jedna linia dopisana do logu; co
+    `snapshot_interval` s stan kubełków jest zapisywany atomowo do pliku
+    JSON, a log czyszczony. Stary format pliku (lista wpisów z timestampami)
+    jest wczytywany przez odtworzenie wpisów. Z `writer` (BackgroundWriter)
+    log i snapshoty są zapisywane w tle, w kolejności zgłoszenia.
+    """
+
+    def __init__(self, snapshot_file, log_file, snapshot_interval: float = SNAPSHOT_INTERVAL, writer=None):
+        self.snapshot_file = str(snapshot_file)
+        self.log_file = str(log_file)
+        self.snapshot_interval = snapshot_interval
+        self._seconds: List[Tuple[int, int]] = [(-1, 0)] * SECOND_BUCKETS
+        self._minutes: List[Tuple[int, int]] = [(-1, 0)] * MINUTE_BUCKETS
+        self._minute_sum = 0
+        self._hour_sum = 0
+        self._day_sum = 0
+        self._second: Optional[int] = None
+        self._minute: Optional[int] = None
+        self._last_snapshot = time.time()
+        self.writer = writer
+        self._lock = threading.Lock()
+
+    def _advance(self, now: float):
+        """Przesuwa okna do chwili `now`, zerując kubełki, które z nich wypadły."""
+        second = int(now)
+        minute = second // 60
+        if self._second is None:
+            self._second, self._minute = second, minute
+            return
+        if second > self._second:
+            for slot in range(max(self._second + 1, second - SECOND_BUCKETS + 1), second + 1):
+                index = slot % SECOND_BUCKETS
+                self._minute_sum -= self._seconds[index][1]
+                self._seconds[index] = (slot, 0)
+            self._second = second
+        if minute > self._minute:
+            if minute - self._minute >= HOUR_MINUTES:
+                self._hour_sum = 0
+            else:
+                for slot in range(self._minute + 1, minute + 1):
+                    expired_slot, tokens = self._minutes[(slot - HOUR_MINUTES) % MINUTE_BUCKETS]
+                    if expired_slot == slot - HOUR_MINUTES:
+                        self._hour_sum -= tokens
+            for slot in range(max(self._minute + 1, minute - MINUTE_BUCKETS + 1), minute + 1):
+                index = slot % MINUTE_BUCKETS
+                self._day_sum -= self._minutes[index][1]
+                self._minutes[index] = (slot, 0)
+            self._minute = minute
+
+    def _record(self, timestamp: float, tokens: int):
+        self._advance(timestamp)
+        index = self._second % SECOND_BUCKETS
+        self._seconds[index] = (self._second, self._seconds[index][1] + tokens)
+        index = self._minute % MINUTE_BUCKETS
+        self._minutes[index] = (self._minute, self._minutes[index][1] + tokens)
+        self._minute_sum += tokens
+        self._hour_sum += tokens
+        self._day_sum += tokens
+
+    def add(self, tokens: int, now: Optional[float] = None):
+        """Rejestruje użycie tokenów i dopisuje je do logu."""
+        if tokens <= 0:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            self._record(now, tokens)
+            line = f'{now:.3f} {tokens}\n'
+            if self.writer is not None:
+                self.writer.append(self.log_file, line)
+            else:
+                with open(self.log_file, 'a', encoding='utf-8') as f:
+                    f.write(line)
+            if now - self._last_snapshot >= self.snapshot_interval:
+                self._snapshot(now)
+
+    def stats(self, now: Optional[float] = None) -> Dict[str, int]:
+        with self._lock:
+            self._advance(time.time() if now is None else now)
+            return {
+                'last_minute': self._minute_sum,
+                'last_hour': self._hour_sum,
+                'last_day': self._day_sum,
+            }
+
+    def snapshot(self):
+        """Zapisuje pełny stan kubełków i czyści log."""
+        with self._lock:
+            self._snapshot(time.time())
+
+    def _snapshot(self, now: float):
+        self._advance(now)
+        data = {
+            'version': SNAPSHOT_VERSION,
+            'saved_at': now,
+            'second': self._second,
+            'seconds': [[slot, tokens] for slot, tokens in self._seconds if tokens],
+            'minutes': [[slot, tokens] for slot, tokens in self._minutes if tokens],
+        }
+        self._last_snapshot = now
+        # Wpisy logu zgłoszone przed snapshotem są w nim ujęte - zapis w tej samej kolejce
+        if self.writer is not None:
+            self.writer.call(lambda: self._write_snapshot(data))
+        else:
+            self._write_snapshot(data)
+
+    def _write_snapshot(self, data: Dict):
+        tmp_path = f'{self.snapshot_file}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_file)
+        if os.path.exists(self.log_file):
+            open(self.log_file, 'w').close()
+
+    def load(self) -> int:
+        """Wczytuje snapshot i odtwarza log; zwraca liczbę wczytanych wpisów."""
+        with self._lock:
+            loaded, saved_at = self._load_snapshot()
+            events = []
+            try:
+                with open(self.log_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            timestamp, tokens = line.split()
+                            events.append((float(timestamp), int(tokens)))
+                        except ValueError:
+                            continue  # urwana ostatnia linia po awarii
+            except FileNotFoundError:
+                pass
+            for timestamp, tokens in sorted(events):
+                if timestamp > saved_at:
+                    self._record(timestamp, tokens)
+                    loaded += 1
+            self._advance(time.time())
+            return loaded
+
+    def _load_snapshot(self) -> Tuple[int, float]:
+        try:
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0, 0.0
+
+        if isinstance(data, list):
+            # Stary format: [{"timestamp": ISO, "tokens": n}, ...]
+            entries = sorted((datetime.fromisoformat(e['timestamp']).timestamp(), e['tokens']) for e in data)
+            for timestamp, tokens in entries:
+                self._record(timestamp, tokens)
+            return len(entries), entries[-1][0] if entries else 0.0
+
+        if data.get('version') != SNAPSHOT_VERSION:
+            return 0, 0.0
+        saved_at = data['saved_at']
+        self._second = data.get('second', int(saved_at))
+        self._minute = self._second // 60
+        for slot, tokens in data.get('seconds', []):
+            if self._second - SECOND_BUCKETS < slot <= self._second:
+                self._seconds[slot % SECOND_BUCKETS] = (slot, tokens)
+                self._minute_sum += tokens
+        for slot, tokens in data.get('minutes', []):
+            if self._minute - MINUTE_BUCKETS < slot <= self._minute:
+                self._minutes[slot % MINUTE_BUCKETS] = (slot, tokens)
+                self._day_sum += tokens
+                if slot > self._minute - HOUR_MINUTES:
+                    self._hour_sum += tokens
+        return len(data.get('minutes', [])), saved_at
+
+
+
+if __name__ == '__main__':
+    # Poprawność względem naiwnego liczenia + porównanie z listą filtrowaną przy każdym dodaniu
+    import random
+    import tempfile
+    from datetime import timedelta
+
+    random.seed(1)
+    start = time.time() - 2 * 24 * 3600 - 3600
+    events = []
+    t = start
+    while t < start + 2 * 24 * 3600:
+        t += random.expovariate(1 / 20)
+        events.append((t, random.randint(1, 5000)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tracker = TokenUsageTracker(os.path.join(tmp, 'token_stats.json'), os.path.join(tmp, 'token_usage.log'))
+        started = time.perf_counter()
+        for n, (timestamp, tokens) in enumerate(events):
+            tracker.add(tokens, now=timestamp)
+            if n % 997 == 0:
+                stats = tracker.stats(now=timestamp)
+                second, minute = int(timestamp), int(timestamp) // 60
+                expected = {
+                    'last_minute': sum(k for s, k in events[:n + 1] if int(s) > second - 60),
+                    'last_hour': sum(k for s, k in events[:n + 1] if int(s) // 60 > minute - 60),
+                    'last_day': sum(k for s, k in events[:n + 1] if int(s) // 60 > minute - 1440),
+                }
+                assert stats == expected, (stats, expected)
+        elapsed = time.perf_counter() - started
+        print(f"{len(events)} wpisów: {elapsed / len(events) * 1e6:.1f} µs/add (z logiem i snapshotami)")
+
+        started = time.perf_counter()
+        for _ in range(10000):
+            tracker.stats(now=events[-1][0])
+        print(f"stats(): {(time.perf_counter() - started) / 10000 * 1e6:.2f} µs")
+
+        tracker.snapshot()
+        reloaded = TokenUsageTracker(tracker.snapshot_file, tracker.log_file)
+        reloaded.load()
+        assert reloaded.stats(now=events[-1][0]) == tracker.stats(now=events[-1][0])
+
+        # Log i snapshoty przez wątek zapisu w tle
+        from background_writer import BackgroundWriter
+
+        writer = BackgroundWriter()
+        behind = TokenUsageTracker(os.path.join(tmp, 'behind.json'), os.path.join(tmp, 'behind.log'), writer=writer)
+        started = time.perf_counter()
+        for timestamp, tokens in events:
+            behind.add(tokens, now=timestamp)
+        print(f"Z BackgroundWriter: {(time.perf_counter() - started) / len(events) * 1e6:.1f} µs/add")
+        behind.snapshot()
+        writer.close()
+        reloaded = TokenUsageTracker(behind.snapshot_file, behind.log_file)
+        reloaded.load()
+        assert reloaded.stats(now=events[-1][0]) == tracker.stats(now=events[-1][0])
+
+        # Dotychczasowe podejście: filtr całej listy + pełny zapis JSON przy każdym dodaniu
+        history = []
+        legacy_file = os.path.join(tmp, 'legacy.json')
+        sample = events[-2000:]
+        started = time.perf_counter()
+        for timestamp, tokens in sample:
+            now = datetime.fromtimestamp(timestamp)
+            history.append({'timestamp': now, 'tokens': tokens})
+            history = [e for e in history if e['timestamp'] > now - timedelta(hours=24)]
+            with open(legacy_file, 'w', encoding='utf-8') as f:
+                json.dump([{'timestamp': e['timestamp'].isoformat(), 'tokens': e['tokens']} for e in history], f)
+        print(f"Lista + pełny JSON: {(time.perf_counter() - started) / len(sample) * 1e6:.1f} µs/add "
+              f"(przy {len(history)} wpisach w historii)")
+        print("OK")
@@ -0,0 +1,171 @@
+import hashlib
+import os
+import shutil
+import sys
+import threading
+from typing import Dict, Any, Tuple
+
+from slide_numbering import file_lock
+
+# FICLONE z linux/fs.h - reflink (copy-on-write) na btrfs/XFS
+FICLONE = 0x40049409
+
+_stores: Dict[str, 'AssetStore'] = {}
+_stores_lock = threading.Lock()
+
+
+def reflink(src: str, dst: str):
+    """Klon copy-on-write pliku; OSError, gdy system plików go nie obsługuje."""
+    if not sys.platform.startswith('linux'):
+        raise OSError('reflink obsługiwany tylko na Linuksie')
+    import fcntl
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+class AssetStore:
+    """Magazyn obrazów slajdów adresowany treścią (slides/_blobs/<sha256><ext>).
+
+    Każdy obraz z banku trafia do magazynu raz, a pliki w katalogach
+    slajdów są do niego hardlinkami (albo reflinkami, gdy hardlink nie
+    jest możliwy, np. między systemami plików). Na końcu zawsze jest
+    zwykłe kopiowanie. Blob, do którego nie prowadzi już żaden hardlink
+    (st_nlink == 1), usuwa `gc`. Reflinki i kopie mają własną treść, więc
+    po eksporcie między systemami plików (albo bez obsługi hardlinków)
+    wszystkie użyte bloby mają st_nlink == 1 i następny `gc` je usuwa -
+    slajdy zostają nienaruszone, a kolejny eksport utworzy bloby od nowa.
+
+    Umieszczanie plików i `gc` biorą tę samą blokadę co rezerwacja
+    katalogów eksportu (slides/.export.lock), więc `gc` nie usunie bloba
+    między jego sprawdzeniem a podlinkowaniem.
+
+    Hardlinkowane pliki dzielą treść - obrazów w slides/ nie należy
+    edytować w miejscu, tylko zapisać nowy plik.
+    """
+
+    def __init__(self, blob_dir: str = os.path.join('slides', '_blobs')):
+        self.blob_dir = blob_dir
+        self.lock_file = os.path.join(os.path.dirname(blob_dir), '.export.lock')
+        self._digests: Dict[str, Tuple[int, int, int, str]] = {}  # ścieżka -> (ino, mtime_ns, size, sha256)
+        self._lock = threading.Lock()
+        self.stats = {'blobs_created': 0, 'hardlinks': 0, 'reflinks': 0, 'copies': 0}
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+    def digest(self, path: str) -> str:
+        """SHA-256 pliku; wynik jest pamiętany, dopóki plik się nie zmieni."""
+        stat = os.stat(path)
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._digests.get(path)
+        if cached and cached[:3] == signature:
+            return cached[3]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        with self._lock:
+            self._digests[path] = (*signature, digest.hexdigest())
+        return digest.hexdigest()
+
+    def blob_for(self, src_path: str) -> str:
+        """Zwraca ścieżkę bloba z treścią `src_path`, dodając go w razie potrzeby."""
+        ext = os.path.splitext(src_path)[1].lower()
+        blob_path = os.path.join(self.blob_dir, f'{self.digest(src_path)}{ext}')
+        if not os.path.exists(blob_path):
+            tmp_path = f'{blob_path}.{threading.get_ident()}.tmp'
+            shutil.copy2(src_path, tmp_path)
+            os.replace(tmp_path, blob_path)
+            with self._lock:
+                self.stats['blobs_created'] += 1
+        return blob_path
+
+    def place(self, src_path: str, dst_path: str) -> str:
+        """Umieszcza kopię `src_path` w `dst_path`; zwraca użytą metodę."""
+        tmp_path = f'{dst_path}.{threading.get_ident()}.tmp'
+        with file_lock(self.lock_file):
+            blob_path = self.blob_for(src_path)
+            try:
+                os.link(blob_path, tmp_path)
+                method = 'hardlinks'
+            except OSError:
+                try:
+                    reflink(blob_path, tmp_path)
+                    method = 'reflinks'
+                except OSError:
+                    shutil.copy2(blob_path, tmp_path)
+                    method = 'copies'
+        # Zamiana przez rename nadpisuje istniejący plik (os.link by go nie nadpisał)
+        os.replace(tmp_path, dst_path)
+        with self._lock:
+            self.stats[method] += 1
+        return method
+
+    def gc(self, dry_run: bool = False) -> Dict[str, Any]:
+        """Usuwa bloby, do których nie odwołuje się już żaden slajd.
+
+        Bloby podlinkowane przez reflink albo kopię też są usuwane (patrz
+        docstring klasy).
+        """
+        removed, freed = [], 0
+        with file_lock(self.lock_file):
+            for filename in os.listdir(self.blob_dir):
+                path = os.path.join(self.blob_dir, filename)
+                if filename.endswith('.tmp'):
+                    continue
+                stat = os.stat(path)
+                # Reflinki i kopie mają własną treść, więc blob bez hardlinków nie jest potrzebny
+                if stat.st_nlink > 1:
+                    continue
+                if not dry_run:
+                    os.remove(path)
+                removed.append(filename)
+                freed += stat.st_size
+        return {'removed': len(removed), 'freed_bytes': freed, 'files': removed, 'dry_run': dry_run}
+
+    def get_stats(self) -> Dict[str, Any]:
+        blobs = 0
+        total_bytes = 0
+        unreferenced = 0
+        for filename in os.listdir(self.blob_dir):
+            if filename.endswith('.tmp'):
+                continue
+            stat = os.stat(os.path.join(self.blob_dir, filename))
+            blobs += 1
+            total_bytes += stat.st_size
+            unreferenced += stat.st_nlink == 1
+        with self._lock:
+            return {**self.stats, 'blobs': blobs, 'bytes': total_bytes, 'unreferenced': unreferenced}
+
+
+def get_asset_store(slides_dir: str = 'slides') -> AssetStore:
+    """Wspólny magazyn dla katalogu slajdów (jeden na proces)."""
+    blob_dir = os.path.normpath(os.path.join(slides_dir, '_blobs'))
+    with _stores_lock:
+        if blob_dir not in _stores:
+            _stores[blob_dir] = AssetStore(blob_dir)
+        return _stores[blob_dir]
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Magazyn obrazów slajdów (slides/_blobs)')
+    parser.add_argument('command', choices=['gc', 'stats'], help='gc - usuń nieużywane bloby, stats - statystyki')
+    parser.add_argument('--slides-dir', default='slides', help='Katalog slajdów (domyślnie slides)')
+    parser.add_argument('--dry-run', action='store_true', help='gc: tylko pokaż, co zostałoby usunięte')
+    args = parser.parse_args()
+
+    store = get_asset_store(args.slides_dir)
+    if args.command == 'gc':
+        result = store.gc(dry_run=args.dry_run)
+        print(f"{'Do usunięcia' if args.dry_run else 'Usunięto'} {result['removed']} blobów "
+              f"({result['freed_bytes'] / 1024 / 1024:.1f} MB)")
+    else:
+        print(json.dumps(store.get_stats(), indent=2))
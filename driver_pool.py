@@ -0,0 +1,181 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional, List
+
+
+class PooledDriver:
+    """Pojedynczy worker puli - instancja Chrome z licznikiem screenshotów."""
+
+    def __init__(self, worker_id: int, driver):
+        self.worker_id = worker_id
+        self.driver = driver
+        self.captures = 0
+        self.created_at = time.time()
+
+    def __repr__(self):
+        return f"<PooledDriver #{self.worker_id} captures={self.captures}>"
+
+
+class DriverPool:
+    """Pula headless Chrome z semantyką checkout/return.
+
+    Instancje są tworzone leniwie (maksymalnie `size`), sprawdzane przy
+    każdym pobraniu z puli i wymieniane na nowe po `max_captures`
+    screenshotach, żeby nie kumulować wycieków pamięci Chrome.
+    """
+
+    def __init__(self, driver_factory: Callable[[], object], size: int = 2,
+                 max_captures: int = 100, on_create: Optional[Callable] = None):
+        if size < 1:
+            raise ValueError("Rozmiar puli musi być >= 1")
+        self.driver_factory = driver_factory
+        self.size = size
+        self.max_captures = max_captures
+        self.on_create = on_create
+
+        self._idle: List[PooledDriver] = []
+        self._created = 0
+        self._next_id = 1
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self.stats = {
+            'created': 0,
+            'recycled': 0,
+            'unhealthy': 0,
+            'checkouts': 0,
+        }
+
+    def _create_worker(self) -> PooledDriver:
+        driver = self.driver_factory()
+        with self._cond:
+            worker = PooledDriver(self._next_id, driver)
+            self._next_id += 1
+            self.stats['created'] += 1
+        if self.on_create:
+            try:
+                self.on_create(driver)
+            except Exception:
+                self._quit(worker)
+                raise
+        print(f"[POOL] Utworzono Chrome #{worker.worker_id}")
+        return worker
+
+    def _quit(self, worker: PooledDriver):
+        try:
+            worker.driver.quit()
+        except Exception as e:
+            print(f"[POOL] Błąd zamykania Chrome #{worker.worker_id}: {e}")
+
+    def is_healthy(self, worker: PooledDriver) -> bool:
+        try:
+            return worker.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def captures_left(self, worker: PooledDriver, limit: int) -> int:
+        """Ile screenshotów `worker` może zrobić przed recyklingiem (najwyżej `limit`)."""
+        if not self.max_captures:
+            return limit
+        return max(1, min(limit, self.max_captures - worker.captures))
+
+    def checkout(self, timeout: Optional[float] = None) -> PooledDriver:
+        """Pobiera wolny driver z puli (lub tworzy nowy, jeśli jest miejsce)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Pula Chrome została zamknięta")
+                    if self._idle:
+                        worker = self._idle.pop()
+                        break
+                    if self._created < self.size:
+                        self._created += 1
+                        worker = None
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("Brak wolnego Chrome w puli")
+                    self._cond.wait(remaining)
+
+            if worker is None:
+                try:
+                    worker = self._create_worker()
+                except Exception:
+                    with self._cond:
+                        self._created -= 1
+                        self._cond.notify()
+                    raise
+            elif not self.is_healthy(worker):
+                print(f"[POOL] Chrome #{worker.worker_id} nie odpowiada - wymiana")
+                self._discard(worker, 'unhealthy')
+                continue
+
+            with self._cond:
+                self.stats['checkouts'] += 1
+            return worker
+
+    def release(self, worker: PooledDriver, healthy: bool = True, captures: int = 1):
+        """Zwraca driver do puli; zepsute lub zużyte instancje są zamykane."""
+        worker.captures += captures
+        if not healthy:
+            self._discard(worker, 'unhealthy')
+            return
+        if self.max_captures and worker.captures >= self.max_captures:
+            print(f"[POOL] Recykling Chrome #{worker.worker_id} po {worker.captures} screenshotach")
+            self._discard(worker, 'recycled')
+            return
+        with self._cond:
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._idle.append(worker)
+                self._cond.notify()
+        if closed:
+            self._discard(worker, None)
+
+    def _discard(self, worker: PooledDriver, reason: Optional[str]):
+        self._quit(worker)
+        with self._cond:
+            self._created -= 1
+            if reason:
+                self.stats[reason] += 1
+            self._cond.notify()
+
+    @contextmanager
+    def driver(self, timeout: Optional[float] = None):
+        """Context manager: `with pool.driver() as driver: ...`"""
+        worker = self.checkout(timeout)
+        healthy = True
+        try:
+            yield worker.driver
+        except Exception:
+            healthy = self.is_healthy(worker)
+            raise
+        finally:
+            self.release(worker, healthy)
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                **self.stats,
+                'size': self.size,
+                'alive': self._created,
+                'idle': len(self._idle),
+                'busy': self._created - len(self._idle),
+            }
+
+    def shutdown(self):
+        """Zamyka wszystkie bezczynne instancje i blokuje dalsze pobieranie."""
+        with self._cond:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+            self._cond.notify_all()
+        for worker in idle:
+            self._quit(worker)
+            with self._cond:
+                self._created -= 1
@@ -0,0 +1,149 @@
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Polityki Cache-Control: HTML/JSON/tekst zawsze rewalidowane (tanie 304),
+# obrazy i inne pliki cache'owane krótko
+CACHE_NO_STORE = 'no-store'
+CACHE_REVALIDATE = 'no-cache'
+CACHE_ASSET = f"public, max-age={int(os.environ.get('HTTP_ASSET_MAX_AGE', 3600))}"
+
+# Obrazy z banku i ich warianty mają stałe URL-e, a źródło można podmienić -
+# zawsze rewalidacja (nowy wariant ma inny plik, więc inny ETag)
+REVALIDATE_PREFIXES = ('/img_slides/', '/img_variants/')
+# Ścieżki wykonujące pracę przy każdym wywołaniu - odpowiedź nie może pochodzić z cache
+NO_STORE_PREFIXES = ('/screenshot',)
+
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'text/plain', 'text/javascript',
+                      'application/javascript', 'application/json', 'image/svg+xml')
+COMPRESS_MIN_BYTES = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+class CompressedBodyCache:
+    """Skompresowane odpowiedzi kluczowane (ETag, kodowanie) - LRU po bajtach."""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Tuple[str, str], bytes]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: Tuple[str, str], body: bytes):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+def cache_control_for(path: str, mimetype: Optional[str]) -> Optional[str]:
+    if path.startswith(NO_STORE_PREFIXES):
+        return CACHE_NO_STORE
+    if path.startswith('/api/'):
+        return None
+    if mimetype in COMPRESSIBLE_TYPES or path.startswith(REVALIDATE_PREFIXES):
+        return CACHE_REVALIDATE
+    return CACHE_ASSET
+
+
+def choose_encoding(request) -> Optional[str]:
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def install_http_cache(app):
+    """Dodaje do aplikacji Flask ETagi, odpowiedzi 304, Cache-Control i kompresję.
+
+    Pliki z send_from_directory mają już ETag i Last-Modified z Werkzeug;
+    pozostałe odpowiedzi GET dostają silny ETag z hasha treści. Dla wersji
+    skompresowanej ETag (silny i słaby) ma sufiks kodowania, więc każda
+    reprezentacja ma własny walidator. Przy trafieniu w If-None-Match plik nie jest czytany.
+    """
+    from flask import request
+
+    compressed_bodies = CompressedBodyCache()
+
+    @app.after_request
+    def http_cache(response):
+        # Pliki z send_file też są "streamed", ale mają znaną długość - pomijamy tylko generatory (NDJSON)
+        if (response.is_streamed and not response.direct_passthrough) or response.status_code not in (200, 304):
+            return response
+
+        # send_file ustawia własne "no-cache" - polityka ścieżki ma pierwszeństwo
+        policy = cache_control_for(request.path, response.mimetype)
+        if policy:
+            response.headers['Cache-Control'] = policy
+        compressible = response.mimetype in COMPRESSIBLE_TYPES
+        if compressible:
+            response.vary.add('Accept-Encoding')
+        if response.status_code == 304:
+            return response
+
+        encoding = choose_encoding(request) if compressible else None
+        if encoding and response.content_length is not None and response.content_length < COMPRESS_MIN_BYTES:
+            encoding = None
+
+        if request.method in ('GET', 'HEAD'):
+            etag, weak = response.get_etag()
+            if not etag and response.direct_passthrough:
+                return response
+            if not etag:
+                response.add_etag()
+                etag, weak = response.get_etag()
+            if encoding:
+                # Także słaby ETag dostaje sufiks - inaczej 304 dla gzip pasowałby do wersji br
+                etag = f'{etag}-{encoding}'
+                response.set_etag(etag, weak=weak)
+            if request.if_none_match.contains_weak(etag):
+                not_modified = app.response_class(status=304)
+                for header in ('ETag', 'Cache-Control', 'Vary', 'Last-Modified'):
+                    if header in response.headers:
+                        not_modified.headers[header] = response.headers[header]
+                response.close()
+                return not_modified
+        else:
+            etag = None
+
+        if encoding:
+            cached = compressed_bodies.get((etag, encoding)) if etag else None
+            if cached is None:
+                response.direct_passthrough = False
+                cached = compress(response.get_data(), encoding)
+                if etag:
+                    compressed_bodies.put((etag, encoding), cached)
+            else:
+                response.close()
+            response.direct_passthrough = False
+            response.set_data(cached)
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    return app
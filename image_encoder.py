@@ -0,0 +1,72 @@
+from typing import Dict, Any, Optional, Tuple
+
+# Formaty wyjściowe screenshotów: rozszerzenie, format PIL, parametry zapisu,
+# domyślna jakość (tylko formaty stratne) i format, który Chrome potrafi
+# zakodować sam przez Page.captureScreenshot.
+OUTPUT_FORMATS = {
+    'png': {'ext': 'png', 'pil': 'PNG', 'params': {}, 'quality': None, 'browser': 'png'},
+    'png-fast': {'ext': 'png', 'pil': 'PNG', 'params': {'compress_level': 1}, 'quality': None, 'browser': None},
+    'png-optimized': {'ext': 'png', 'pil': 'PNG', 'params': {'optimize': True}, 'quality': None, 'browser': None},
+    'webp': {'ext': 'webp', 'pil': 'WEBP', 'params': {'method': 4}, 'quality': 85, 'browser': 'webp'},
+    'webp-lossless': {'ext': 'webp', 'pil': 'WEBP', 'params': {'lossless': True, 'method': 4}, 'quality': None, 'browser': None},
+    'jpeg': {'ext': 'jpg', 'pil': 'JPEG', 'params': {'optimize': False, 'subsampling': 0}, 'quality': 90, 'browser': 'jpeg'},
+}
+
+
+def webp_supported() -> bool:
+    try:
+        from PIL import features
+        return bool(features.check('webp'))
+    except Exception:
+        return False
+
+
+def resolve_output_format(name: Optional[str], quality: Any = None) -> Tuple[str, Optional[int]]:
+    """Waliduje format i jakość; WebP bez wsparcia w Pillow przechodzi na PNG."""
+    name = (name or 'png').lower()
+    if name == 'jpg':
+        name = 'jpeg'
+    if name not in OUTPUT_FORMATS:
+        raise ValueError(f"Nieznany format wyjściowy: {name} (dostępne: {', '.join(OUTPUT_FORMATS)})")
+    if name.startswith('webp') and not webp_supported():
+        print("[ENCODER] Pillow bez obsługi WebP - zapis jako PNG")
+        name = 'png'
+
+    default_quality = OUTPUT_FORMATS[name]['quality']
+    if default_quality is None:
+        return name, None
+    if quality in (None, ''):
+        return name, default_quality
+    try:
+        quality = int(quality)
+    except (TypeError, ValueError):
+        raise ValueError(f"Nieprawidłowa jakość: {quality}")
+    if not 1 <= quality <= 100:
+        raise ValueError("Jakość musi być w zakresie 1-100")
+    return name, quality
+
+
+def extension_for(name: str) -> str:
+    return OUTPUT_FORMATS[name]['ext']
+
+
+def browser_encoding(name: str, quality: Optional[int]) -> Optional[Dict[str, Any]]:
+    """Parametry Page.captureScreenshot, jeśli Chrome może od razu zakodować wynik."""
+    browser_format = OUTPUT_FORMATS[name]['browser']
+    if not browser_format:
+        return None
+    params = {'format': browser_format}
+    if quality is not None:
+        params['quality'] = quality
+    return params
+
+
+def save_image(img, path: str, name: str, quality: Optional[int] = None):
+    """Zapisuje obraz PIL w wybranym formacie."""
+    spec = OUTPUT_FORMATS[name]
+    params = dict(spec['params'])
+    if quality is not None:
+        params['quality'] = quality
+    if spec['pil'] == 'JPEG' and img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    img.save(path, spec['pil'], **params)
@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from slide_numbering import write_atomic
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+# Obrazy, których dHash różni się o najwyżej tyle bitów, uznajemy za duplikaty
+DUPLICATE_DISTANCE = 4
+INDEX_VERSION = 1
+
+
+def analyze_image(path: str) -> Dict[str, Any]:
+    """Wymiary, format, dHash (64 bity) i średni kolor obrazu."""
+    from PIL import Image
+
+    with Image.open(path) as img:
+        width, height = img.size
+        image_format = img.format
+        # Do hasha i koloru wystarczy mały obraz - JPEG dekodowany od razu w skali 1/8
+        img.draft('RGB', (64, 64))
+        small = img.convert('RGB')
+        small.thumbnail((64, 64))
+
+    red, green, blue = small.resize((1, 1), Image.BOX).getpixel((0, 0))
+    gray = small.convert('L').resize((9, 8), Image.LANCZOS)
+    pixels = gray.tobytes()
+    dhash = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            dhash = (dhash << 1) | (left > right)
+
+    return {
+        'width': width,
+        'height': height,
+        'format': image_format,
+        'dhash': f'{dhash:016x}',
+        'average_color': f'#{red:02x}{green:02x}{blue:02x}',
+    }
+
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+class ImageIndex:
+    """Trwały indeks metadanych obrazów z img_slides/ (plik JSON).
+
+    `refresh` porównuje mtime i rozmiar każdego pliku z indeksem i analizuje
+    (równolegle) tylko nowe lub zmienione obrazy; usunięte znikają z indeksu.
+    Plik indeksu jest zapisywany atomowo i tylko wtedy, gdy coś się zmieniło.
+    """
+
+    def __init__(self, images_dir: str = 'img_slides', index_file: str = 'image_index.json', workers: int = 4):
+        self.images_dir = images_dir
+        self.index_file = index_file
+        self.workers = max(1, workers)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.stats = {'refreshes': 0, 'analyzed': 0, 'removed': 0, 'errors': 0}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (ValueError, OSError) as e:
+            print(f"[IMAGES] Uszkodzony indeks {self.index_file}, zostanie odbudowany: {e}")
+            return
+        if data.get('version') == INDEX_VERSION:
+            self._entries = data.get('images', {})
+
+    def _save(self, entries: Dict[str, Dict[str, Any]]):
+        write_atomic(self.index_file, json.dumps({'version': INDEX_VERSION, 'images': entries},
+                                                 ensure_ascii=False, indent=1, sort_keys=True))
+
+    def refresh(self) -> Dict[str, Dict[str, Any]]:
+        """Aktualizuje indeks po zmianach w katalogu i zwraca wpisy.
+
+        Przegląd katalogu i analiza obrazów idą poza blokadą - pod nią jest
+        tylko podmiana wyników. Gdy inny wątek właśnie analizuje, zwracany
+        jest ostatni gotowy stan zamiast czekania na koniec analizy.
+        """
+        with self._lock:
+            self.stats['refreshes'] += 1
+            if self._refreshing:
+                return dict(self._entries)
+            self._refreshing = True
+            # _entries jest tylko podmieniany, nigdy modyfikowany - bezpieczny snapshot
+            known = self._entries
+
+        try:
+            try:
+                names = [n for n in os.listdir(self.images_dir) if n.lower().endswith(IMAGE_EXTENSIONS)]
+            except FileNotFoundError:
+                names = []
+
+            current = {}
+            changed = []
+            for name in names:
+                try:
+                    stat = os.stat(os.path.join(self.images_dir, name))
+                except FileNotFoundError:
+                    continue
+                entry = known.get(name)
+                if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['bytes'] == stat.st_size:
+                    current[name] = entry
+                else:
+                    changed.append((name, stat))
+
+            removed = len(set(known) - set(names))
+            analyzed = 0
+            if changed:
+                with ThreadPoolExecutor(max_workers=min(self.workers, len(changed))) as executor:
+                    results = executor.map(self._analyze, changed)
+                    for (name, stat), info in zip(changed, results):
+                        if info is None:
+                            continue
+                        current[name] = {'name': name, 'bytes': stat.st_size, 'mtime_ns': stat.st_mtime_ns, **info}
+                        analyzed += 1
+
+            if not (changed or removed):
+                return dict(known)
+            with self._lock:
+                self.stats['analyzed'] += analyzed
+                self.stats['removed'] += removed
+                self._entries = current
+            # Zapisuje tylko wątek z flagą _refreshing - jeden naraz
+            self._save(current)
+            return dict(current)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _analyze(self, item) -> Optional[Dict[str, Any]]:
+        name, _ = item
+        try:
+            return analyze_image(os.path.join(self.images_dir, name))
+        except Exception as e:
+            print(f"[IMAGES] Nie można przeanalizować {name}: {e}")
+            with self._lock:
+                self.stats['errors'] += 1
+            return None
+
+    def details(self, entries: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Wpisy posortowane po nazwie, bez pól wewnętrznych.
+
+        `entries` z wcześniejszego `refresh()` pozwala uniknąć drugiego przeglądu katalogu.
+        """
+        entries = self.refresh() if entries is None else entries
+        return [{k: v for k, v in entries[name].items() if k != 'mtime_ns'} for name in sorted(entries)]
+
+    def duplicates(self, max_distance: int = DUPLICATE_DISTANCE,
+                   entries: Optional[Dict[str, Dict[str, Any]]] = None) -> List[List[str]]:
+        """Grupy obrazów o prawie identycznym dHash (te same zdjęcia w innych plikach)."""
+        entries = sorted((self.refresh() if entries is None else entries).values(), key=lambda e: e['name'])
+        groups: List[List[str]] = []
+        assigned = set()
+        for i, entry in enumerate(entries):
+            if entry['name'] in assigned:
+                continue
+            group = [entry['name']]
+            for other in entries[i + 1:]:
+                if other['name'] not in assigned and hamming(entry['dhash'], other['dhash']) <= max_distance:
+                    group.append(other['name'])
+                    assigned.add(other['name'])
+            if len(group) > 1:
+                groups.append(group)
+        return groups
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'images': len(self._entries)}
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = ImageIndex(index_file=os.path.join(tmp, 'image_index.json'), workers=os.cpu_count() or 4)
+        started = time.perf_counter()
+        entries = index.details()
+        cold = time.perf_counter() - started
+        started = time.perf_counter()
+        index.details()
+        warm = time.perf_counter() - started
+        print(f"Indeks {len(entries)} obrazów: budowa {cold * 1000:.0f} ms, odświeżenie bez zmian {warm * 1000:.1f} ms")
+        print(f"Przykład: {entries[0] if entries else '-'}")
+        print(f"Duplikaty: {index.duplicates()}")
+
+        # Żądanie w trakcie budowy indeksu dostaje ostatni stan zamiast czekać na analizę
+        building = ImageIndex(index_file=os.path.join(tmp, 'building.json'))
+        builder = threading.Thread(target=building.refresh)
+        builder.start()
+        time.sleep(0.02)
+        started = time.perf_counter()
+        partial = building.refresh()
+        concurrent = time.perf_counter() - started
+        builder.join()
+        print(f"Odświeżenie w trakcie budowy: {concurrent * 1000:.1f} ms ({len(partial)} gotowych wpisów), "
+              f"po budowie: {len(building.refresh())} wpisów")
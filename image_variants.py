@@ -0,0 +1,206 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Iterable, Set
+
+THUMBNAIL_SIZE = 256
+MAX_VARIANT_SIZE = 4096
+JPEG_QUALITY = 85
+# Warianty zachowują format źródła tylko dla tych rozszerzeń (GIF straciłby animację)
+VARIANT_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+class ImageVariants:
+    """Miniatury i warianty obrazów z img_slides/ dopasowane do rozmiaru boksu.
+
+    Warianty są generowane leniwie (przy pierwszym żądaniu) w puli wątków
+    i zapisywane w `cache_dir`. Nazwa pliku zawiera sygnaturę źródła
+    (mtime + rozmiar), więc podmiana obrazu w banku daje nowy wariant.
+    Kilka równoczesnych żądań o ten sam wariant czeka na jedno generowanie.
+    JPEG jest zmniejszany już przy dekodowaniu (Image.draft), co przy
+    miniaturach pomija większość pracy dekodera.
+    """
+
+    def __init__(self, images_dir: str = 'img_slides', cache_dir: str = 'image_variants', workers: int = 4):
+        self.images_dir = images_dir
+        self.cache_dir = cache_dir
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='image-variant')
+        self._pending: Dict[str, Future] = {}
+        # Warianty, które okazały się zbędne (oryginał już jest dość mały) - ścieżka
+        # cache zawiera sygnaturę źródła, więc podmiana obrazu unieważnia wpis
+        self._originals: Set[str] = set()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'generated': 0, 'originals': 0, 'errors': 0, 'generate_ms': 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def source_path(self, name: str) -> str:
+        """Ścieżka obrazu w banku; odrzuca nazwy spoza katalogu."""
+        if not name or name != os.path.basename(name) or name.startswith('.'):
+            raise ValueError(f"Nieprawidłowa nazwa obrazu: {name}")
+        path = os.path.join(self.images_dir, name)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Obraz {name} nie istnieje")
+        return path
+
+    def thumbnail(self, name: str, size: int = THUMBNAIL_SIZE) -> str:
+        """Miniatura mieszcząca się w kwadracie size x size."""
+        size = max(16, min(int(size), 1024))
+        return self._get(name, f't{size}', (size, size))
+
+    def variant(self, name: str, width: int, zoom: int = 100, scale: float = 1.0) -> str:
+        """Wariant dla boksu o szerokości `width` px z background-size: {zoom}%.
+
+        Przy background-size w procentach szerokość obrazu to width * zoom / 100
+        (wysokość proporcjonalnie), więc tylko ona wyznacza rozmiar wariantu.
+        Gdy wariant nie byłby mniejszy od oryginału albo zmieniłby format
+        (GIF, WebP...), zwracany jest oryginał - eksport zapisuje go pod
+        nazwą z banku, więc treść musi pasować do rozszerzenia.
+        """
+        if os.path.splitext(name)[1].lower() not in VARIANT_EXTENSIONS:
+            src_path = self.source_path(name)
+            with self._lock:
+                self.stats['originals'] += 1
+            return src_path
+        target = int(round(int(width) * int(zoom) / 100 * float(scale)))
+        if target < 1:
+            raise ValueError("Szerokość wariantu musi być > 0")
+        target = min(target, MAX_VARIANT_SIZE)
+        # Wysokość pudełka wynika z proporcji źródła - wyznacza ją _generate
+        return self._get(name, f'w{target}', (target, None))
+
+    def _cache_path(self, src_path: str, kind: str) -> str:
+        stat = os.stat(src_path)
+        signature = hashlib.sha1(f'{stat.st_mtime_ns}:{stat.st_size}'.encode()).hexdigest()[:10]
+        stem, ext = os.path.splitext(os.path.basename(src_path))
+        ext = '.png' if ext.lower() in ('.png', '.gif') else '.jpg'
+        return os.path.join(self.cache_dir, f'{stem}-{kind}-{signature}{ext}')
+
+    def _get(self, name: str, kind: str, box) -> str:
+        src_path = self.source_path(name)
+        cache_path = self._cache_path(src_path, kind)
+        with self._lock:
+            if cache_path in self._originals:
+                self.stats['originals'] += 1
+                return src_path
+        if os.path.exists(cache_path):
+            with self._lock:
+                self.stats['hits'] += 1
+            return cache_path
+        return self._submit(src_path, cache_path, box).result()
+
+    def _submit(self, src_path: str, cache_path: str, box) -> Future:
+        with self._lock:
+            future = self._pending.get(cache_path)
+            if future is None:
+                future = self.executor.submit(self._generate, src_path, cache_path, box)
+                self._pending[cache_path] = future
+                future.add_done_callback(lambda f, key=cache_path: self._finished(key))
+            return future
+
+    def _finished(self, cache_path: str):
+        with self._lock:
+            self._pending.pop(cache_path, None)
+
+    def _generate(self, src_path: str, cache_path: str, box) -> str:
+        from PIL import Image
+
+        started = time.perf_counter()
+        try:
+            with Image.open(src_path) as img:
+                if box[1] is None:
+                    # Draft zmniejsza skalę tylko, gdy wynik nadal pokrywa pudełko w obu
+                    # wymiarach - stała wysokość (np. 4096) wymusiłaby dekodowanie w pełnej skali
+                    box = (box[0], math.ceil(box[0] * img.height / img.width))
+                if img.width <= box[0] and img.height <= box[1]:
+                    # Wariant nie byłby mniejszy - użyj oryginału
+                    with self._lock:
+                        self.stats['originals'] += 1
+                        self._originals.add(cache_path)
+                    return src_path
+                # JPEG: dekodowanie od razu w skali 1/2, 1/4 lub 1/8 (nie mniejszej niż box)
+                img.draft('RGB', box)
+                if cache_path.endswith('.png'):
+                    img = img.convert('RGBA')
+                elif img.mode != 'RGB':
+                    img = img.convert('RGB')
+                img.thumbnail(box, Image.LANCZOS, reducing_gap=2.0)
+
+                tmp_path = f'{cache_path}.{threading.get_ident()}.tmp'
+                if cache_path.endswith('.png'):
+                    img.save(tmp_path, 'PNG', optimize=False, compress_level=6)
+                else:
+                    img.save(tmp_path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+                os.replace(tmp_path, cache_path)
+        except Exception:
+            with self._lock:
+                self.stats['errors'] += 1
+            raise
+        with self._lock:
+            self.stats['generated'] += 1
+            self.stats['generate_ms'] += int((time.perf_counter() - started) * 1000)
+        return cache_path
+
+    def warm_thumbnails(self, names: Iterable[str], size: int = THUMBNAIL_SIZE):
+        """Zleca w tle generowanie brakujących miniatur (nie czeka na wynik)."""
+        for name in names:
+            try:
+                src_path = self.source_path(name)
+                cache_path = self._cache_path(src_path, f't{size}')
+            except (ValueError, OSError):
+                continue
+            with self._lock:
+                if cache_path in self._originals:
+                    continue
+            if not os.path.exists(cache_path):
+                self._submit(src_path, cache_path, (size, size))
+
+    def clear(self):
+        with self._lock:
+            self._originals.clear()
+        for filename in os.listdir(self.cache_dir):
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except FileNotFoundError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        files = os.listdir(self.cache_dir)
+        total_bytes = sum(os.path.getsize(os.path.join(self.cache_dir, f)) for f in files)
+        with self._lock:
+            return {**self.stats, 'files': len(files), 'bytes': total_bytes, 'pending': len(self._pending),
+                    'known_originals': len(self._originals)}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+if __name__ == '__main__':
+    # Porównanie: pełny rozmiar banku vs miniatury, czas generowania na zimno i z cache
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = ImageVariants(cache_dir=tmp, workers=os.cpu_count() or 4)
+        names = sorted(n for n in os.listdir('img_slides') if n.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')))
+        original_bytes = sum(os.path.getsize(os.path.join('img_slides', n)) for n in names)
+
+        started = time.perf_counter()
+        variants.warm_thumbnails(names)
+        thumbs = [variants.thumbnail(n) for n in names]
+        cold = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for n in names:
+            variants.thumbnail(n)
+        warm = time.perf_counter() - started
+
+        thumb_bytes = sum(os.path.getsize(p) for p in thumbs)
+        print(f"{len(names)} obrazów: {original_bytes / 1024 / 1024:.1f} MB → miniatury "
+              f"{thumb_bytes / 1024:.0f} KB; generowanie {cold * 1000:.0f} ms, z cache {warm * 1000:.1f} ms")
+        variant = variants.variant(names[0], 400, zoom=100)
+        print(f"Wariant 400px @100%: {os.path.getsize(variant) / 1024:.0f} KB "
+              f"(oryginał {os.path.getsize(os.path.join('img_slides', names[0])) / 1024:.0f} KB)")
+        print(variants.get_stats())
+        variants.shutdown()
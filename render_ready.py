@@ -0,0 +1,145 @@
+import time
+from typing import Dict, Iterable
+
+# Licznik aktywnych fetch() na stronie. Zapytanie jest "zakończone" dopiero
+# po odczytaniu body i jednym tiku pętli zdarzeń, czyli po tym, jak kod
+# przeglądarki slajdów zdążył wstawić HTML do DOM.
+FETCH_TRACKER_JS = """
+(function() {
+    if (window.__pendingFetches !== undefined) return;
+    window.__pendingFetches = 0;
+    const originalFetch = window.fetch;
+    window.fetch = function() {
+        window.__pendingFetches++;
+        let settled = false;
+        const done = () => {
+            if (settled) return;
+            settled = true;
+            setTimeout(() => { window.__pendingFetches--; }, 0);
+        };
+        return originalFetch.apply(this, arguments).then(response => {
+            ['text', 'json', 'blob', 'arrayBuffer'].forEach(method => {
+                const read = response[method].bind(response);
+                response[method] = () => {
+                    const result = read();
+                    result.then(done, done);
+                    return result;
+                };
+            });
+            // Body nigdy nie odczytane - nie blokuj gotowości w nieskończoność
+            setTimeout(done, 2000);
+            return response;
+        }, error => {
+            done();
+            throw error;
+        });
+    };
+})();
+"""
+
+# Czeka na wybrane fazy gotowości i zwraca czas każdej z nich (ms od startu).
+READY_JS = """
+const callback = arguments[arguments.length - 1];
+const phases = arguments[0];
+const timeoutMs = arguments[1];
+const started = performance.now();
+const timings = {};
+const mark = name => { timings[name] = Math.round((performance.now() - started) * 10) / 10; };
+const tick = ms => new Promise(resolve => setTimeout(resolve, ms));
+const frame = () => new Promise(resolve => requestAnimationFrame(() => resolve()));
+
+async function waitFetches() {
+    while ((window.__pendingFetches || 0) > 0) await tick(5);
+}
+
+async function waitImages() {
+    const root = document.getElementById('slide-window') || document.body;
+    const pending = [];
+    root.querySelectorAll('img').forEach(img => {
+        if (img.src) pending.push(img.decode().catch(() => {}));
+    });
+    const urls = new Set();
+    [root, ...root.querySelectorAll('*')].forEach(el => {
+        const bg = getComputedStyle(el).backgroundImage;
+        if (!bg || bg === 'none') return;
+        for (const match of bg.matchAll(/url\\(["']?(.*?)["']?\\)/g)) urls.add(match[1]);
+    });
+    urls.forEach(url => {
+        const img = new Image();
+        img.src = url;
+        pending.push(img.decode().catch(() => {}));
+    });
+    await Promise.all(pending);
+}
+
+async function waitStableFrames() {
+    const root = document.getElementById('slide-window') || document.body;
+    const signature = () => {
+        const rect = root.getBoundingClientRect();
+        return [rect.x, rect.y, rect.width, rect.height, root.scrollHeight, root.childElementCount].join(',');
+    };
+    let previous = null;
+    let stable = 0;
+    while (stable < 2) {
+        await frame();
+        const current = signature();
+        stable = current === previous ? stable + 1 : 0;
+        previous = current;
+    }
+}
+
+const steps = {
+    fetch: waitFetches,
+    fonts: () => document.fonts ? document.fonts.ready : Promise.resolve(),
+    images: waitImages,
+    frames: waitStableFrames
+};
+
+(async () => {
+    for (const phase of phases) {
+        await steps[phase]();
+        mark(phase);
+    }
+    return true;
+})().then(
+    () => callback({ok: true, timings: timings}),
+    error => callback({ok: false, error: String(error), timings: timings})
+);
+tick(timeoutMs).then(() => callback({ok: false, timedOut: true, timings: timings}));
+"""
+
+ALL_PHASES = ('fetch', 'fonts', 'images', 'frames')
+
+
+def install_fetch_tracker(driver) -> bool:
+    """Instaluje licznik fetch() dla każdego nowego dokumentu (CDP).
+
+    Zwraca False, gdy driver nie obsługuje CDP - wtedy trzeba wykonać
+    FETCH_TRACKER_JS ręcznie po załadowaniu strony.
+    """
+    if not hasattr(driver, 'execute_cdp_cmd'):
+        return False
+    driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': FETCH_TRACKER_JS})
+    return True
+
+
+def wait_for_render_ready(driver, phases: Iterable[str] = ALL_PHASES,
+                          timeout: float = 5.0) -> Dict[str, float]:
+    """Czeka aż slajd jest wyrenderowany zamiast stałego time.sleep.
+
+    Fazy: `fetch` (brak aktywnych zapytań), `fonts` (document.fonts.ready),
+    `images` (zdekodowane <img> i obrazy tła), `frames` (dwie stabilne
+    klatki animacji). Zwraca czasy faz w ms; po przekroczeniu `timeout`
+    zwraca to, co zdążyło się zakończyć, z kluczem `timed_out`.
+    """
+    started = time.perf_counter()
+    driver.set_script_timeout(timeout + 1)
+    result = driver.execute_async_script(READY_JS, list(phases), int(timeout * 1000)) or {}
+    timings = dict(result.get('timings') or {})
+    timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+    if result.get('timedOut'):
+        timings['timed_out'] = True
+        print(f"[READY] Przekroczono limit {timeout}s gotowości renderu (fazy: {timings})")
+    elif not result.get('ok', True):
+        print(f"[READY] Błąd oczekiwania na render: {result.get('error')}")
+    return timings
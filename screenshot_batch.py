@@ -0,0 +1,250 @@
+import queue
+import re
+import threading
+import time
+from typing import Callable, Iterator, List, Dict, Any, Optional, Union
+
+SLIDE_ID_RE = re.compile(r'^(s|p)?(\d+)$')
+SLIDE_RANGE_RE = re.compile(r'^(s|p)?(\d+)\s*(?:\.\.|-)\s*(s|p)?(\d+)$')
+
+# Screenshoty na jedno pobranie Chrome z puli - potem driver wraca do puli (kontrola zdrowia, recykling)
+BATCH_CHECKOUT_CAPTURES = 10
+BATCH_CHECKOUT_TIMEOUT = 30.0   # s oczekiwania na wolny Chrome
+BATCH_CHECKOUT_RETRIES = 2
+BATCH_RETRY_DELAY = 1.0         # s, rośnie z kolejnymi próbami
+# Bez żadnego postępu przez tyle sekund batch kończy się, zgłaszając pozostałe slajdy jako błędy
+BATCH_STALL_TIMEOUT = 120.0
+
+
+def normalize_slide_id(slide_id: Union[str, int]) -> str:
+    """Zamienia 's3' / '3' / 3 na '3', a 'p2' zostawia jako 'p2'."""
+    match = SLIDE_ID_RE.match(str(slide_id).strip().lower())
+    if not match:
+        raise ValueError(f"Nieprawidłowy identyfikator slajdu: {slide_id}")
+    prefix, number = match.groups()
+    if int(number) < 1:
+        raise ValueError(f"Numer slajdu musi być >= 1: {slide_id}")
+    return f'p{int(number)}' if prefix == 'p' else str(int(number))
+
+
+def parse_slide_ids(spec: Union[str, List[Any]]) -> List[str]:
+    """Parsuje listę lub zakresy slajdów: "s1..s5,p1..p3,7" lub ["s1", "p2..p4"]."""
+    if isinstance(spec, str):
+        parts = [part for part in spec.split(',') if part.strip()]
+    else:
+        parts = list(spec)
+
+    slide_ids = []
+    for part in parts:
+        text = str(part).strip().lower()
+        range_match = SLIDE_RANGE_RE.match(text)
+        if range_match:
+            start_prefix, start, end_prefix, end = range_match.groups()
+            prefix = start_prefix or end_prefix or 's'
+            if (start_prefix or prefix) != (end_prefix or prefix):
+                raise ValueError(f"Zakres nie może mieszać s i p: {part}")
+            start, end = int(start), int(end)
+            if end < start:
+                raise ValueError(f"Pusty zakres slajdów: {part}")
+            slide_ids.extend(normalize_slide_id(f'{prefix}{n}') for n in range(start, end + 1))
+        else:
+            slide_ids.append(normalize_slide_id(text))
+
+    # Usuń duplikaty zachowując kolejność
+    return list(dict.fromkeys(slide_ids))
+
+
+def run_batch(pool, render: Callable, encode: Callable, slide_ids: List[str],
+              encoder, lookup: Optional[Callable] = None,
+              stall_timeout: float = BATCH_STALL_TIMEOUT) -> Iterator[Dict[str, Any]]:
+    """Robi screenshoty wielu slajdów, zwracając kolejne zdarzenia postępu.
+
+    Workery biorą rozgrzany Chrome z puli na co najwyżej
+    `BATCH_CHECKOUT_CAPTURES` slajdów, a potem go oddają - pula sprawdza
+    zdrowie i recykluje Chrome po `max_captures` także w długim batchu.
+    Kodowanie obrazu trafia do `encoder` (ThreadPoolExecutor), więc driver
+    przechodzi do kolejnego slajdu, zanim poprzedni zostanie zapisany.
+    Nieudane pobranie Chrome jest ponawiane; slajdy oznacza jako błędy
+    dopiero ostatni worker, który się poddał. Gdy przez `stall_timeout` s
+    nie ma żadnego postępu (zawieszony Selenium), pozostałe slajdy są
+    zgłaszane jako błędy. Opcjonalne `lookup(slide_id)` zwraca nazwę pliku
+    z cache - takie slajdy nie trafiają do Chrome. Ostatnie zdarzenie to
+    manifest wszystkich wygenerowanych plików.
+    """
+    batch_started = time.time()
+    total = len(slide_ids)
+    work = queue.Queue()
+    results = queue.Queue()
+    for index, slide_id in enumerate(slide_ids):
+        cached_file = lookup(slide_id) if lookup else None
+        if cached_file:
+            results.put({
+                'event': 'progress',
+                'index': index,
+                'slide': slide_id,
+                'file': cached_file,
+                'ms': int((time.time() - batch_started) * 1000),
+                'cached': True
+            })
+        else:
+            work.put((index, slide_id))
+
+    def fail(index, slide_id, started, error):
+        results.put({
+            'event': 'error',
+            'index': index,
+            'slide': slide_id,
+            'error': str(error),
+            'ms': int((time.time() - started) * 1000)
+        })
+
+    def on_encoded(index, slide_id, started, timings, future):
+        try:
+            filename = future.result()
+        except Exception as e:
+            fail(index, slide_id, started, e)
+            return
+        results.put({
+            'event': 'progress',
+            'index': index,
+            'slide': slide_id,
+            'file': filename,
+            'ms': int((time.time() - started) * 1000),
+            'timings': timings
+        })
+
+    stop = threading.Event()
+    state_lock = threading.Lock()
+    state = {'alive': 0, 'error': None}
+
+    def fail_remaining(error):
+        while True:
+            try:
+                index, slide_id = work.get_nowait()
+            except queue.Empty:
+                return
+            fail(index, slide_id, time.time(), error)
+
+    def capture_slides():
+        failures = 0
+        while not work.empty() and not stop.is_set():
+            try:
+                pooled = pool.checkout(timeout=BATCH_CHECKOUT_TIMEOUT)
+            except Exception as e:
+                with state_lock:
+                    state['error'] = e
+                failures += 1
+                if failures > BATCH_CHECKOUT_RETRIES:
+                    # Slajdy zostają w kolejce dla pozostałych workerów
+                    return
+                time.sleep(BATCH_RETRY_DELAY * failures)
+                continue
+            failures = 0
+
+            limit = pool.captures_left(pooled, BATCH_CHECKOUT_CAPTURES)
+            healthy = True
+            captures = 0
+            try:
+                while healthy and captures < limit and not stop.is_set():
+                    try:
+                        index, slide_id = work.get_nowait()
+                    except queue.Empty:
+                        break
+                    started = time.time()
+                    captures += 1
+                    try:
+                        screenshot_png, location, timings = render(pooled.driver, slide_id)
+                    except Exception as e:
+                        fail(index, slide_id, started, e)
+                        # Zepsuty Chrome wraca do puli jako niezdrowy i zostaje wymieniony
+                        healthy = pool.is_healthy(pooled)
+                        continue
+                    future = encoder.submit(encode, screenshot_png, location, slide_id)
+                    future.add_done_callback(
+                        lambda f, i=index, s=slide_id, t=started, r=timings: on_encoded(i, s, t, r, f)
+                    )
+            finally:
+                pool.release(pooled, healthy, captures=captures)
+
+    def worker():
+        try:
+            capture_slides()
+        finally:
+            with state_lock:
+                state['alive'] -= 1
+                last = state['alive'] == 0
+                error = state['error']
+            if last and not stop.is_set():
+                # Nikt już nie zrobi pozostałych slajdów - nie da się uruchomić Chrome
+                fail_remaining(error or RuntimeError("Brak wolnego Chrome w puli"))
+
+    workers = [
+        threading.Thread(target=worker, daemon=True, name=f'screenshot-batch-{n}')
+        for n in range(min(pool.size, work.qsize()))
+    ]
+    state['alive'] = len(workers)
+    for thread in workers:
+        thread.start()
+
+    files = [None] * total
+    errors = []
+    reported = set()
+
+    def record(event):
+        reported.add(event['index'])
+        event['done'] = len(reported)
+        event['total'] = total
+        if event['event'] == 'progress':
+            files[event['index']] = {
+                'slide': event['slide'],
+                'file': event['file'],
+                'ms': event['ms'],
+                'cached': event.get('cached', False)
+            }
+        else:
+            errors.append({'slide': event['slide'], 'error': event['error']})
+        return event
+
+    try:
+        while len(reported) < total:
+            try:
+                event = results.get(timeout=stall_timeout)
+            except queue.Empty:
+                # Zawieszony worker (np. Selenium bez odpowiedzi) - nie czekamy w nieskończoność
+                stop.set()
+                stuck = [(index, slide_id) for index, slide_id in enumerate(slide_ids) if index not in reported]
+                print(f"[BATCH] Brak postępu przez {stall_timeout:g} s - pomijam slajdy: "
+                      f"{', '.join(slide_id for _, slide_id in stuck)}")
+                for index, slide_id in stuck:
+                    yield record({
+                        'event': 'error',
+                        'index': index,
+                        'slide': slide_id,
+                        'error': f"Brak postępu przez {stall_timeout:g} s (zawieszony Chrome)",
+                        'ms': int((time.time() - batch_started) * 1000),
+                        'stuck': True
+                    })
+                break
+            if event['index'] in reported:
+                continue
+            yield record(event)
+
+        if not stop.is_set():
+            for thread in workers:
+                thread.join()
+
+        yield {
+            'event': 'manifest',
+            'total': total,
+            'files': [entry for entry in files if entry],
+            'errors': errors,
+            'elapsed_ms': int((time.time() - batch_started) * 1000)
+        }
+    finally:
+        # Klient rozłączony (generator zamknięty przy yield) albo koniec - workery nie biorą kolejnych slajdów
+        stop.set()
+        while True:
+            try:
+                work.get_nowait()
+            except queue.Empty:
+                break
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List
+
+# Odwołania do plików w HTML slajdu: url(...) w CSS oraz src/href w znacznikach
+ASSET_REF_RE = re.compile(r"""url\(\s*['"]?([^'")]+)['"]?\s*\)|(?:src|href)\s*=\s*['"]([^'"]+)['"]""")
+
+
+class ScreenshotCache:
+    """Cache screenshotów adresowany treścią slajdu.
+
+    Klucz to hash HTML slajdu, plików, do których się odwołuje (obrazy,
+    snippety, style) i opcji renderowania. Niezmieniony slajd zwraca gotowy
+    PNG bez uruchamiania Chrome. Eviction LRU po liczbie wpisów i rozmiarze.
+    """
+
+    def __init__(self, cache_dir: str = 'screenshot_cache', max_entries: int = 500,
+                 max_bytes: int = 512 * 1024 * 1024, root_dir: str = '.'):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.root_dir = root_dir
+
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()  # klucz -> rozmiar pliku
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        """Odbudowuje kolejność LRU z plików pozostałych po poprzednim uruchomieniu."""
+        files = []
+        for filename in os.listdir(self.cache_dir):
+            key, ext = os.path.splitext(filename)
+            if ext != '.cache':
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, filename))
+            files.append((stat.st_mtime, key, stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.cache')
+
+    def _resolve_asset(self, ref: str, html_dir: str) -> Optional[str]:
+        ref = ref.split('?', 1)[0].split('#', 1)[0].strip()
+        if not ref or re.match(r'^[a-z][a-z0-9+.-]*:', ref, re.IGNORECASE):
+            return None  # data:, http:, itp. - nie są plikami lokalnymi
+        if ref.startswith('/'):
+            candidates = [os.path.join(self.root_dir, ref.lstrip('/'))]
+        else:
+            # Slajdy są renderowane z <base href="/">, ale w index.html bywa też ścieżka względna do pliku
+            candidates = [os.path.join(self.root_dir, ref), os.path.join(html_dir, ref)]
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                return os.path.normpath(candidate)
+        return None
+
+    def referenced_assets(self, html: str, html_path: str) -> List[str]:
+        """Lista lokalnych plików, do których odwołuje się HTML slajdu."""
+        html_dir = os.path.dirname(html_path)
+        assets = set()
+        for match in ASSET_REF_RE.finditer(html):
+            path = self._resolve_asset(match.group(1) or match.group(2), html_dir)
+            if path:
+                assets.add(path)
+        return sorted(assets)
+
+    def compute_key(self, html_path: str, options: Dict[str, Any], extra: str = '') -> str:
+        """Hash HTML slajdu, wszystkich odwołań do plików i opcji renderowania."""
+        digest = hashlib.sha256()
+        with open(html_path, 'rb') as f:
+            html_bytes = f.read()
+        digest.update(html_bytes)
+        for asset in self.referenced_assets(html_bytes.decode('utf-8', errors='replace'), html_path):
+            digest.update(b'\0' + asset.encode('utf-8') + b'\0')
+            with open(asset, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        for name in sorted(options):
+            digest.update(f'\0{name}={options[name]}'.encode('utf-8'))
+        digest.update(extra.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str, output_path: str) -> bool:
+        """Przy trafieniu kopiuje PNG z cache do `output_path`."""
+        with self._lock:
+            if key not in self._entries:
+                self.stats['misses'] += 1
+                return False
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+        try:
+            shutil.copyfile(self._path(key), output_path)
+            os.utime(self._path(key))
+            return True
+        except FileNotFoundError:
+            # Plik usunięty spoza aplikacji - potraktuj jak chybienie
+            with self._lock:
+                size = self._entries.pop(key, 0)
+                self._total_bytes -= size
+                self.stats['hits'] -= 1
+                self.stats['misses'] += 1
+            return False
+
+    def put(self, key: str, source_path: str):
+        """Zapisuje gotowy screenshot w cache."""
+        tmp_path = f'{self._path(key)}.{threading.get_ident()}.tmp'
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, self._path(key))
+        size = os.path.getsize(self._path(key))
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self.stats['stores'] += 1
+            self._evict()
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.stats['evictions'] += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+            self._total_bytes = 0
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else 0.0,
+            }
+
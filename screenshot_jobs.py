@@ -0,0 +1,145 @@
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional
+
+
+class QueueFullError(Exception):
+    """Kolejka zadań screenshotów jest pełna - klient powinien spróbować później."""
+
+
+class ScreenshotJobQueue:
+    """Ograniczona kolejka asynchronicznych zadań screenshotów.
+
+    `submit` od razu zwraca id zadania (albo QueueFullError, gdy kolejka
+    jest pełna), a stała liczba workerów - tyle, ile Chrome w puli -
+    wykonuje `capture(slide_id, options)`. Dzięki temu seria kliknięć czy
+    skrypt nie tworzą nowych wątków czekających na przeglądarkę.
+    """
+
+    def __init__(self, capture: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+                 workers: int = 2, max_queued: int = 32, keep_finished: int = 200):
+        self.capture = capture
+        self.keep_finished = keep_finished
+        self._queue: 'queue.Queue[Optional[str]]' = queue.Queue(maxsize=max_queued)
+        self._jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._worker, daemon=True, name=f'screenshot-job-{n}')
+            for n in range(workers)
+        ]
+        for thread in self._workers:
+            thread.start()
+
+    def submit(self, slide_id: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            'id': job_id,
+            'slide': slide_id,
+            'status': 'queued',
+            'options': options,
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job_id]
+            raise QueueFullError(f"Kolejka screenshotów jest pełna ({self._queue.maxsize} zadań)")
+        return self.status(job_id)
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                job['status'] = 'running'
+                job['started_at'] = time.time()
+            try:
+                result = self.capture(job['slide'], job['options'])
+                with self._lock:
+                    job['result'] = result
+                    job['status'] = 'done'
+            except Exception as e:
+                with self._lock:
+                    job['error'] = str(e)
+                    job['status'] = 'error'
+            finally:
+                with self._lock:
+                    job['finished_at'] = time.time()
+                    self._prune()
+
+    def _prune(self):
+        """Usuwa najstarsze zakończone zadania ponad limit `keep_finished`."""
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in ('done', 'error')]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Stan zadania z czasami oczekiwania i wykonania (ms)."""
+        job = self.get(job_id)
+        if not job:
+            return None
+
+        def ms(start, end):
+            if start is None:
+                return None
+            return int(((end or time.time()) - start) * 1000)
+
+        status = {
+            'id': job['id'],
+            'slide': job['slide'],
+            'status': job['status'],
+            'queued_ms': ms(job['submitted_at'], job['started_at']),
+            'run_ms': ms(job['started_at'], job['finished_at']),
+        }
+        if job['status'] == 'queued':
+            status['position'] = self.position(job_id)
+        if job['result']:
+            status['file'] = job['result'].get('file')
+            status['cached'] = job['result'].get('cached', False)
+            status['timings'] = job['result'].get('timings')
+        if job['error']:
+            status['error'] = job['error']
+        return status
+
+    def position(self, job_id: str) -> int:
+        with self._lock:
+            queued = [jid for jid, job in self._jobs.items() if job['status'] == 'queued']
+        return queued.index(job_id) + 1 if job_id in queued else 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {
+            'queued': self._queue.qsize(),
+            'max_queued': self._queue.maxsize,
+            'workers': len(self._workers),
+            'jobs': counts,
+        }
+
+    def shutdown(self):
+        for _ in self._workers:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Serwer slajdów bez GUI: python serve.py [--port 8000 --workers 2 --threads 16]
+
+Start ładuje tylko Flask i lekkie moduły projektu - Tk nie jest importowany
+wcale, Selenium i PIL przy pierwszym screenshocie, google.genai przy
+pierwszej edycji AI. `--check-cold-start` mierzy start w świeżym procesie
+i kończy się błędem po przekroczeniu budżetu.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from server import SERVE_HOST, SERVE_PORT, serve_production
+from wsgi_server import add_serve_arguments
+
+# Budżet zimnego startu: import server + create_app() + pierwsze GET /
+COLD_START_BUDGET_MS = int(os.environ.get('COLD_START_BUDGET_MS', 500))
+# Moduły, które nie mogą być załadowane po samym starcie serwera slajdów
+HEAVY_MODULES = ('tkinter', 'selenium', 'google.genai', 'PIL', 'numpy')
+
+COLD_START_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+app = server.create_app()
+created = time.perf_counter()
+status = app.test_client().get('/').status_code
+finished = time.perf_counter()
+heavy = [name for name in %r if name in sys.modules]
+app.extensions['slide_server'].shutdown()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'create_ms': (created - imported) * 1000,
+                  'first_request_ms': (finished - created) * 1000, 'total_ms': (finished - started) * 1000,
+                  'status': status, 'heavy_modules': heavy}))
+"""
+
+
+def measure_cold_start(runs: int = 3) -> dict:
+    """Mediana czasów startu z `runs` świeżych procesów Pythona."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', COLD_START_SCRIPT % (HEAVY_MODULES,)], cwd=root,
+                                capture_output=True, text=True, check=True)
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    summary = {key: round(statistics.median(s[key] for s in samples), 1)
+               for key in ('import_ms', 'create_ms', 'first_request_ms', 'total_ms')}
+    summary['status'] = samples[-1]['status']
+    summary['heavy_modules'] = sorted({name for s in samples for name in s['heavy_modules']})
+    summary['budget_ms'] = COLD_START_BUDGET_MS
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serwer slajdów bez GUI (tryb produkcyjny)')
+    add_serve_arguments(parser, SERVE_HOST, SERVE_PORT)
+    parser.add_argument('--check-cold-start', action='store_true',
+                        help=f'Zmierz zimny start i sprawdź budżet {COLD_START_BUDGET_MS} ms (COLD_START_BUDGET_MS)')
+    args = parser.parse_args(argv)
+
+    if args.check_cold_start:
+        result = measure_cold_start()
+        print(f"Zimny start: import {result['import_ms']} ms, create_app {result['create_ms']} ms, "
+              f"pierwsze GET / {result['first_request_ms']} ms (HTTP {result['status']}), "
+              f"razem {result['total_ms']} ms / budżet {result['budget_ms']} ms")
+        if result['heavy_modules']:
+            print(f"Załadowane ciężkie moduły: {', '.join(result['heavy_modules'])}")
+        ok = result['total_ms'] <= COLD_START_BUDGET_MS and not result['heavy_modules'] and result['status'] == 200
+        print("OK" if ok else "PRZEKROCZONY BUDŻET")
+        return 0 if ok else 1
+
+    serve_production(args.host, args.port, args.workers, args.threads, args.keepalive, args.backend)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
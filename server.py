@@ -1,39 +1,217 @@
 #!/usr/bin/env python3
-import tkinter as tk
-from tkinter import ttk
 import threading
-import webbrowser
 import random
 from flask import Flask, send_from_directory, jsonify
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+from werkzeug.exceptions import NotFound
 import os
 import time
 import json
 from pathlib import Path
-from google import genai
+from concurrent.futures import ThreadPoolExecutor
+from driver_pool import DriverPool
+from screenshot_batch import normalize_slide_id, parse_slide_ids, run_batch
+from render_ready import FETCH_TRACKER_JS, install_fetch_tracker, wait_for_render_ready
+from screenshot_cache import ScreenshotCache
+from slide_export import SlideExportEngine
+from asset_store import get_asset_store
+from slide_index import SlideIndex
+from slide_numbering import write_atomic
+from http_cache import install_http_cache
+from image_variants import ImageVariants
+from image_index import ImageIndex
+from session_store import SessionStore, gemini_chat_adapter
+from screenshot_jobs import ScreenshotJobQueue, QueueFullError
+from image_encoder import OUTPUT_FORMATS, resolve_output_format, extension_for, browser_encoding, save_image
+from wsgi_server import SERVE_BACKEND, SERVE_HOST, SERVE_KEEPALIVE, SERVE_THREADS, SERVE_WORKERS, add_serve_arguments, resolve_backend, serve
 
-class SlideScreenshotApp:
-    def __init__(self):
-        self.root = tk.Tk()
-        self.root.title("Slide Screenshot Tool")
-        self.root.geometry("300x150")
-        self.root.resizable(False, False)
-        
-        self.port = random.randint(8000, 9999)
+# Pula Chrome dla screenshotów (liczba instancji i recykling po K screenshotach)
+SCREENSHOT_WORKERS = int(os.environ.get('SCREENSHOT_WORKERS', min(4, os.cpu_count() or 1)))
+SCREENSHOT_MAX_CAPTURES = int(os.environ.get('SCREENSHOT_MAX_CAPTURES', 100))
+# Tryb screenshotu: 'clip' - Chrome renderuje tylko #slide-window (CDP),
+# 'full' - screenshot całego okna + przycięcie w PIL
+SCREENSHOT_MODE = os.environ.get('SCREENSHOT_MODE', 'clip')
+SCREENSHOT_MODES = ('clip', 'full')
+# Ścieżka renderowania: 'direct' - samodzielny dokument /render/{id},
+# 'viewer' - nawigacja przez index.html (loadSlide / loadSlideFromP)
+SCREENSHOT_RENDER = os.environ.get('SCREENSHOT_RENDER', 'direct')
+SCREENSHOT_RENDERS = ('direct', 'viewer')
+# Domyślny format wyjściowy (png, png-fast, png-optimized, webp, webp-lossless, jpeg) i katalog zapisu
+SCREENSHOT_FORMAT = os.environ.get('SCREENSHOT_FORMAT', 'png')
+SCREENSHOT_OUTPUT_DIR = os.environ.get('SCREENSHOT_OUTPUT_DIR', '.')
+# Maksymalna liczba oczekujących zadań w asynchronicznej kolejce screenshotów
+SCREENSHOT_QUEUE_SIZE = int(os.environ.get('SCREENSHOT_QUEUE_SIZE', 32))
+# Cache screenshotów adresowany treścią slajdu (LRU po liczbie wpisów i rozmiarze)
+SCREENSHOT_CACHE_DIR = os.environ.get('SCREENSHOT_CACHE_DIR', 'screenshot_cache')
+SCREENSHOT_CACHE_MAX_ENTRIES = int(os.environ.get('SCREENSHOT_CACHE_MAX_ENTRIES', 500))
+SCREENSHOT_CACHE_MAX_MB = int(os.environ.get('SCREENSHOT_CACHE_MAX_MB', 512))
+# Maksymalny czas oczekiwania na gotowość renderu (fonty, obrazy, fetch, klatki)
+RENDER_READY_TIMEOUT = float(os.environ.get('RENDER_READY_TIMEOUT', 5.0))
+# Eksport i generowanie slajdów: wątki zapisu plików i limit slajdów w jednym żądaniu
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 8))
+EXPORT_MAX_SLIDES = int(os.environ.get('EXPORT_MAX_SLIDES', 1000))
+# Obrazy w eksportowanych slajdach przeskalowane do szerokości boksu x skala (0 - pełne pliki z banku)
+EXPORT_IMAGE_SCALE = float(os.environ.get('EXPORT_IMAGE_SCALE', 1.0))
+# Miniatury i warianty obrazów z img_slides (cache na dysku, generowanie w puli wątków)
+IMAGE_VARIANTS_DIR = os.environ.get('IMAGE_VARIANTS_DIR', 'image_variants')
+IMAGE_VARIANT_WORKERS = int(os.environ.get('IMAGE_VARIANT_WORKERS', min(4, os.cpu_count() or 1)))
+# Trwały indeks metadanych obrazów z img_slides (wymiary, format, dHash, średni kolor)
+IMAGE_INDEX_FILE = os.environ.get('IMAGE_INDEX_FILE', 'image_index.json')
+# Sesje AI edycji snippetów: limit liczby i pamięci, TTL bezczynności, zrzut na dysk po usunięciu z pamięci
+GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-1.5-flash-latest')
+AI_SESSION_MAX_COUNT = int(os.environ.get('AI_SESSION_MAX_COUNT', 50))
+AI_SESSION_MAX_MB = int(os.environ.get('AI_SESSION_MAX_MB', 128))
+AI_SESSION_TTL = int(os.environ.get('AI_SESSION_TTL', 3600))
+AI_SESSION_SPILL_DIR = os.environ.get('AI_SESSION_SPILL_DIR', 'ai_sessions')
+CODE_FENCE = '```html'
+# Port trybu produkcyjnego (--serve); GUI losuje port z zakresu 8000-9999
+SERVE_PORT = int(os.environ.get('SERVE_PORT', 8000))
+
+# Catch-all dla plików statycznych: reszta repo (config.json, locki, cache) zwraca 404
+STATIC_DIRS = ('slides', 'templates', 'img_slides')
+STATIC_ROOT_EXTENSIONS = ('.html', '.css', '.js', '.ico', '.png', '.jpg', '.jpeg', '.webp', '.svg')
+PRIVATE_SUFFIXES = ('.lock', '.tmp', '.partial')
+
+# Style dokumentu /render/{id} - odpowiednik wymuszeń robionych wcześniej w JS przed screenshotem
+RENDER_DOCUMENT_CSS = """
+        html, body { margin: 0; padding: 0; }
+        #slide-window {
+            width: 1536px; height: 864px; min-height: 864px; max-height: 864px;
+            overflow: hidden; background-color: white; position: relative; box-sizing: border-box;
+        }
+        #slide-window .box1-snippet table, #slide-window .box2-snippet table {
+            display: table !important; width: 100% !important; height: 100% !important;
+            table-layout: fixed !important; border-collapse: collapse !important;
+        }
+        #slide-window .box1-snippet tr, #slide-window .box2-snippet tr {
+            display: table-row !important; height: 50% !important; min-height: 50% !important;
+        }
+        #slide-window .box1-snippet td, #slide-window .box2-snippet td {
+            display: table-cell !important; width: 50% !important; height: 50% !important;
+            min-height: 50% !important; vertical-align: middle !important;
+        }
+"""
+
+
+def screenshot_options(values=None):
+    """Waliduje opcje screenshotu (z query stringa, JSON batcha lub CLI)"""
+    values = values or {}
+    options = {
+        'mode': values.get('mode') or SCREENSHOT_MODE,
+        'render': values.get('render') or SCREENSHOT_RENDER,
+        'cache': str(values.get('cache', True)).lower() not in ('0', 'false', 'no'),
+    }
+    options['format'], options['quality'] = resolve_output_format(
+        values.get('format') or SCREENSHOT_FORMAT, values.get('quality')
+    )
+    if options['mode'] not in SCREENSHOT_MODES:
+        raise ValueError(f"Nieznany tryb screenshotu: {options['mode']}")
+    if options['render'] not in SCREENSHOT_RENDERS:
+        raise ValueError(f"Nieznana ścieżka renderowania: {options['render']}")
+    return options
+
+
+def is_public_static(filename):
+    """Czy plik spoza dedykowanych tras można podać przeglądarce.
+
+    Tylko katalogi slajdów, template'ów i obrazów oraz zasoby statyczne
+    w katalogu głównym; pliki ukryte, locki i pliki tymczasowe nigdy -
+    config.json, indeksy i cache zostają po stronie serwera.
+    """
+    parts = filename.replace('\\', '/').split('/')
+    if any(part.startswith('.') for part in parts) or filename.endswith(PRIVATE_SUFFIXES):
+        return False
+    if len(parts) > 1:
+        return parts[0] in STATIC_DIRS
+    return os.path.splitext(filename)[1].lower() in STATIC_ROOT_EXTENSIONS
+
+
+def slide_html_path(slide_id):
+    """Ścieżka pliku HTML slajdu: '3' -> slides/s3.html, 'p2' -> slides/p2/s1.html"""
+    if slide_id.startswith('p'):
+        return os.path.join('slides', slide_id, 's1.html')
+    return os.path.join('slides', f's{slide_id}.html')
+
+
+def strip_code_fence(text):
+    """Usuwa markdown code block (```html ... ```) z odpowiedzi modelu"""
+    if text.startswith(CODE_FENCE):
+        text = text.replace(CODE_FENCE, '', 1)
+    if text.endswith('```'):
+        text = text.rsplit('```', 1)[0]
+    return text.strip()
+
+
+def screenshot_filename(slide_id, output_format='png'):
+    timestamp = int(time.time())
+    filename = f'screenshot_slide_{slide_id}_{timestamp}.{extension_for(output_format)}'
+    if SCREENSHOT_OUTPUT_DIR in ('', '.'):
+        return filename
+    os.makedirs(SCREENSHOT_OUTPUT_DIR, exist_ok=True)
+    return os.path.join(SCREENSHOT_OUTPUT_DIR, filename)
+
+
+class SlideServer:
+    """Aplikacja Flask z pulą Chrome, cache i indeksami - bez GUI.
+
+    Używana bezpośrednio przez tryb produkcyjny (create_app / --serve)
+    i batch screenshotów; SlideScreenshotApp dokłada do niej okno Tk.
+    """
+
+    def __init__(self, port=None):
+        self.port = port or random.randint(8000, 9999)
         self.server_running = False
         self.flask_app = None
-        self.driver = None  # Persistent Chrome instance
+        self.driver_pool = DriverPool(
+            self.create_driver,
+            size=SCREENSHOT_WORKERS,
+            max_captures=SCREENSHOT_MAX_CAPTURES,
+            on_create=self.prepare_driver
+        )
+        self.screenshot_cache = ScreenshotCache(
+            SCREENSHOT_CACHE_DIR,
+            max_entries=SCREENSHOT_CACHE_MAX_ENTRIES,
+            max_bytes=SCREENSHOT_CACHE_MAX_MB * 1024 * 1024
+        )
+        self.image_index = ImageIndex('img_slides', IMAGE_INDEX_FILE)
+        self.image_variants = ImageVariants('img_slides', IMAGE_VARIANTS_DIR, workers=IMAGE_VARIANT_WORKERS)
+        self.export_engine = SlideExportEngine(image_variants=self.image_variants, image_scale=EXPORT_IMAGE_SCALE)
+        # Indeks slajdów, presetów i obrazów w pamięci (odświeżany po zmianie mtime katalogów)
+        self.slide_index = SlideIndex()
+        # Lista obrazów, dla której ostatnio zlecono miniatury (warm tylko po zmianie banku)
+        self.warmed_images = None
+        self.served_number = None
+        # Kodowanie PNG w osobnych wątkach - driver może w tym czasie renderować kolejny slajd
+        self.encoder_executor = ThreadPoolExecutor(max_workers=SCREENSHOT_WORKERS, thread_name_prefix='encoder')
+        # Asynchroniczne zadania: tyle workerów, ile Chrome w puli, reszta czeka w ograniczonej kolejce
+        self.screenshot_jobs = ScreenshotJobQueue(
+            self.capture_screenshot,
+            workers=SCREENSHOT_WORKERS,
+            max_queued=SCREENSHOT_QUEUE_SIZE
+        )
         
-        # Gemini API setup
+        # Gemini API setup - klient powstaje przy pierwszej edycji AI (import google.genai trwa ~0,5 s)
         self.gemini_client = None
-        self.ai_sessions = {}  # Przechowuje sesje AI
-        self.init_gemini_api()
+        self.gemini_initialized = False
+        self.gemini_lock = threading.Lock()
+        self.ai_sessions = SessionStore(
+            **gemini_chat_adapter(lambda: self.gemini_client, lambda: GEMINI_MODEL),
+            max_sessions=AI_SESSION_MAX_COUNT,
+            max_bytes=AI_SESSION_MAX_MB * 1024 * 1024,
+            ttl=AI_SESSION_TTL,
+            spill_dir=AI_SESSION_SPILL_DIR or None
+        )
         
-        self.setup_gui()
         self.setup_flask()
     
     def init_gemini_api(self):
+        """Tworzy klienta Gemini przy pierwszym wywołaniu i zwraca go (None bez klucza)"""
+        with self.gemini_lock:
+            if not self.gemini_initialized:
+                self.gemini_initialized = True
+                self.load_gemini_client()
+            return self.gemini_client
+    
+    def load_gemini_client(self):
         try:
             config_file = Path('API_editor/config.json')
             if config_file.exists():
@@ -41,6 +219,7 @@ class SlideScreenshotApp:
                     config = json.load(f)
                     api_key = config.get('api_key_gemini')
                     if api_key:
+                        from google import genai
                         self.gemini_client = genai.Client(api_key=api_key)
                         print("Gemini API zainicjalizowany")
                     else:
@@ -51,60 +230,106 @@ class SlideScreenshotApp:
             print(f"Błąd inicjalizacji Gemini API: {e}")
     
     def generate_with_gemini(self, prompt, session_id=None, remember_conversation=False):
-        if not self.gemini_client:
+        if not self.init_gemini_api():
             return None
         try:
             if remember_conversation and session_id:
-                # Użyj istniejącej sesji lub utwórz nową
-                if session_id not in self.ai_sessions:
-                    self.ai_sessions[session_id] = self.gemini_client.chats.create(model="gemini-1.5-flash-latest")
-                    print(f"Utworzono nową sesję AI: {session_id}")
-                session = self.ai_sessions[session_id]
+                # Istniejąca, odtworzona z dysku lub nowa sesja; wiadomości jednej sesji po kolei
+                with self.ai_sessions.session(session_id) as session:
+                    response = session.send_message(prompt)
             else:
                 # Sesja jednorazowa
-                session = self.gemini_client.chats.create(model="gemini-1.5-flash-latest")
-            
-            response = session.send_message(prompt)
-            result = response.text
+                session = self.gemini_client.chats.create(model=GEMINI_MODEL)
+                response = session.send_message(prompt)
             
             # Usuń markdown code blocks jeśli istnieją
-            if result.startswith('```html'):
-                result = result.replace('```html', '', 1)
-            if result.endswith('```'):
-                result = result.rsplit('```', 1)[0]
-            result = result.strip()
-            
-            return result
+            return strip_code_fence(response.text)
         except Exception as e:
             print(f"Błąd generowania z Gemini: {e}")
             return None
     
+    def stream_with_gemini(self, prompt, session_id=None, remember_conversation=False):
+        """Jak generate_with_gemini, ale oddaje fragmenty tekstu w miarę generowania.
+
+        Początkowy ```html jest pomijany już w strumieniu; końcowy ``` zostaje
+        w ostatnim fragmencie, więc pełny tekst trzeba przepuścić przez
+        strip_code_fence. Sesja jest zablokowana do końca strumienia - SDK
+        zapisuje odpowiedź w historii dopiero po ostatnim fragmencie.
+        """
+        if not self.init_gemini_api():
+            raise RuntimeError("Gemini API nie jest zainicjalizowany")
+        if remember_conversation and session_id:
+            with self.ai_sessions.session(session_id) as session:
+                yield from self._stream_text(session.send_message_stream(prompt))
+        else:
+            session = self.gemini_client.chats.create(model=GEMINI_MODEL)
+            yield from self._stream_text(session.send_message_stream(prompt))
+    
+    @staticmethod
+    def _stream_text(chunks):
+        head = ''  # początek odpowiedzi, dopóki nie wiadomo, czy to ```html
+        for chunk in chunks:
+            text = chunk.text or ''
+            if head is not None:
+                head += text
+                if len(head) < len(CODE_FENCE) and CODE_FENCE.startswith(head):
+                    continue
+                text = head[len(CODE_FENCE):] if head.startswith(CODE_FENCE) else head
+                head = None
+            if text:
+                yield text
+        if head:
+            yield head
+    
+    def stream_snippet_edit(self, prompt, session_id=None, remember_conversation=False):
+        """Edycja box1a.html przez AI ze strumieniowaniem odpowiedzi.
+
+        Fragmenty są od razu dopisywane do pliku .partial (podgląd postępu)
+        i oddawane jako zdarzenia {"type": "chunk"}. Po końcu odpowiedzi
+        oczyszczony HTML zastępuje box1a.html atomowo przez os.replace; przy
+        błędzie lub zerwanym połączeniu plik .partial jest usuwany, a
+        box1a.html zostaje nietknięty. Każdy zapis ma własny plik .partial
+        (pid + wątek), więc równoległe edycje nie nadpisują sobie danych.
+        """
+        box1a_path = os.path.join('templates/presets', 'box1a.html')
+        partial_path = f'{box1a_path}.{os.getpid()}.{threading.get_ident()}.partial'
+        parts = []
+        try:
+            with open(partial_path, 'w', encoding='utf-8') as f:
+                for text in self.stream_with_gemini(prompt, session_id, remember_conversation):
+                    parts.append(text)
+                    f.write(text)
+                    f.flush()
+                    yield {'type': 'chunk', 'text': text}
+                
+                new_content = strip_code_fence(''.join(parts))
+                if not new_content:
+                    raise ValueError("Pusta odpowiedź z Gemini API")
+                f.seek(0)
+                f.truncate()
+                f.write(new_content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(partial_path, box1a_path)
+            self.export_engine.invalidate_snippet('box1a.html')
+            print(f"Zaktualizowano box1a.html przez API (strumień, {len(new_content)} znaków)")
+            yield {'type': 'done', 'success': True, 'message': 'Snippet zaktualizowany pomyślnie'}
+        except Exception as e:
+            print(f"Błąd edycji snippet: {str(e)}")
+            yield {'type': 'error', 'success': False, 'error': str(e)}
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+    
     def reset_ai_session(self, session_id):
-        if session_id in self.ai_sessions:
-            del self.ai_sessions[session_id]
+        if self.ai_sessions.reset(session_id):
             print(f"Zresetowano sesję AI: {session_id}")
             return True
         return False
         
-    def setup_gui(self):
-        # Główna ramka
-        main_frame = ttk.Frame(self.root, padding="10")
-        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        # Przycisk otwórz
-        self.open_button = ttk.Button(main_frame, text="Otwórz", command=self.open_browser)
-        self.open_button.grid(row=0, column=0, pady=10)
-        
-        # Status połączenia
-        self.status_label = ttk.Label(main_frame, text="Status: Nie uruchomiono")
-        self.status_label.grid(row=1, column=0, pady=5)
-        
-        # Port info
-        self.port_label = ttk.Label(main_frame, text=f"Port: {self.port}")
-        self.port_label.grid(row=2, column=0, pady=5)
-        
     def setup_flask(self):
         self.flask_app = Flask(__name__)
+        install_http_cache(self.flask_app)
         
         @self.flask_app.route('/')
         def index():
@@ -112,63 +337,104 @@ class SlideScreenshotApp:
             
         @self.flask_app.route('/slides/s<int:slide_num>.html')
         def serve_slide(slide_num):
+            # send_from_directory daje ETag i Last-Modified - powtórna nawigacja kończy się 304 bez czytania pliku
             try:
-                with open(f'slides/s{slide_num}.html', 'r', encoding='utf-8') as f:
-                    return f.read()
-            except FileNotFoundError:
+                return send_from_directory('slides', f's{slide_num}.html')
+            except NotFound:
                 return "Slajd nie znaleziony", 404
                 
         @self.flask_app.route('/number.txt')
         def serve_number():
-            try:
-                with open('number.txt', 'r') as f:
-                    content = f.read()
+            content = self.slide_index.number_text()
+            # Loguj tylko zmiany - przeglądarka slajdów pyta o number.txt często
+            if content != self.served_number:
+                self.served_number = content
+                if content is None:
+                    print("[SERVER] BŁĄD: number.txt nie znaleziono, zwracam domyślną wartość 3")
+                else:
                     print(f"[SERVER] Serwowanie number.txt: '{content}'")
-                    return content
-            except FileNotFoundError:
-                print("[SERVER] BŁĄD: number.txt nie znaleziono, zwracam domyślną wartość 3")
-                return "3"
+            return content if content is not None else "3"
                 
         @self.flask_app.route('/slides/<path:filename>')
         def serve_slide_static(filename):
+            if not is_public_static(f'slides/{filename}'):
+                return "Not found", 404
             return send_from_directory('slides', filename)
         
         @self.flask_app.route('/img_slides/<path:filename>')
         def serve_img_slide_static(filename):
+            if not is_public_static(f'img_slides/{filename}'):
+                return "Not found", 404
             return send_from_directory('img_slides', filename)
         
         @self.flask_app.route('/slides/<path:slide_dir>/<path:filename>')
         def serve_slide_assets(slide_dir, filename):
-            if slide_dir.startswith('p') and slide_dir[1:].isdigit():
+            if slide_dir.startswith('p') and slide_dir[1:].isdigit() and is_public_static(f'slides/{slide_dir}/{filename}'):
                 return send_from_directory(f'slides/{slide_dir}', filename)
             else:
                 return "Not found", 404
         
         @self.flask_app.route('/templates/<path:filename>')
         def serve_template_static(filename):
+            if not is_public_static(f'templates/{filename}'):
+                return "Not found", 404
             return send_from_directory('templates', filename)
         
         @self.flask_app.route('/api/template-images')
         def get_template_images():
             try:
-                import os
-                img_dir = 'img_slides'
-                print(f"[API] Sprawdzam katalog: {img_dir}")
-                if not os.path.exists(img_dir):
-                    print(f"[API] Katalog {img_dir} nie istnieje")
-                    return jsonify({'images': []})
-                
-                images = []
-                for filename in os.listdir(img_dir):
-                    if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
-                        images.append(filename)
-                
-                print(f"[API] Znaleziono {len(images)} obrazów: {images[:5]}...")
-                return jsonify({'images': sorted(images)})
+                from flask import request
+                images = self.slide_index.images()
+                # Picker za chwilę poprosi o miniatury - wygeneruj brakujące w tle,
+                # ale tylko gdy lista obrazów w banku się zmieniła
+                if images != self.warmed_images:
+                    self.warmed_images = images
+                    self.image_variants.warm_thumbnails(images)
+                if request.args.get('details') in ('1', 'true'):
+                    # Wymiary, rozmiar, format, dHash i średni kolor - bez pobierania obrazów
+                    # Jeden przegląd katalogu na żądanie - szczegóły i duplikaty z tego samego stanu
+                    entries = self.image_index.refresh()
+                    return jsonify({
+                        'images': images,
+                        'details': self.image_index.details(entries),
+                        'duplicates': self.image_index.duplicates(entries=entries)
+                    })
+                return jsonify({'images': images})
             except Exception as e:
                 print(f"[API] Błąd template-images: {str(e)}")
                 return jsonify({'error': str(e)}), 500
         
+        @self.flask_app.route('/img_variants/thumb/<path:filename>')
+        def serve_image_thumbnail(filename):
+            from flask import request, send_file
+            try:
+                size = request.args.get('size', type=int) or 256
+                return send_file(os.path.abspath(self.image_variants.thumbnail(filename, size)))
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            except FileNotFoundError as e:
+                return jsonify({'success': False, 'error': str(e)}), 404
+        
+        @self.flask_app.route('/img_variants/<int:width>/<path:filename>')
+        def serve_image_variant(width, filename):
+            from flask import request, send_file
+            try:
+                zoom = request.args.get('zoom', type=int) or 100
+                scale = request.args.get('scale', type=float) or 1.0
+                return send_file(os.path.abspath(self.image_variants.variant(filename, width, zoom, scale)))
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            except FileNotFoundError as e:
+                return jsonify({'success': False, 'error': str(e)}), 404
+        
+        @self.flask_app.route('/api/image-variants')
+        def image_variants_stats():
+            return jsonify(self.image_variants.get_stats())
+        
+        @self.flask_app.route('/api/deck-manifest')
+        def deck_manifest():
+            return jsonify(self.slide_index.manifest())
+        
         @self.flask_app.route('/api/create-slide', methods=['POST'])
         def create_slide():
             try:
@@ -212,6 +478,46 @@ class SlideScreenshotApp:
                 print(f"Błąd tworzenia slajdu: {str(e)}")
                 return jsonify({'success': False, 'error': str(e)}), 500
         
+        @self.flask_app.route('/api/create-slides', methods=['POST'])
+        def create_slides():
+            try:
+                from slide_generator import SlideGenerator
+                from flask import request
+                
+                data = request.get_json(silent=True)
+                items = data.get('slides') if isinstance(data, dict) else data
+                if not items or not isinstance(items, list):
+                    return jsonify({'success': False, 'error': 'Podaj listę slajdów w polu "slides"'}), 400
+                if len(items) > EXPORT_MAX_SLIDES:
+                    return jsonify({'success': False, 'error': f'Maksymalnie {EXPORT_MAX_SLIDES} slajdów w jednym żądaniu'}), 400
+                
+                # Te same pola co w /api/create-slide
+                slides = []
+                for item in items:
+                    slides.append({
+                        'preset': item.get('preset', 'preset-1'),
+                        'images': {'green': item['image']} if item.get('image') else {},
+                        'texts': {
+                            'header': item.get('header', 'Nagłówek'),
+                            'content': item.get('content', 'Treść slajdu')
+                        }
+                    })
+                
+                started = time.time()
+                slide_numbers = SlideGenerator().create_slides(slides, workers=EXPORT_WORKERS)
+                
+                return jsonify({
+                    'success': True,
+                    'slide_numbers': slide_numbers,
+                    'count': len(slide_numbers),
+                    'elapsed_ms': int((time.time() - started) * 1000),
+                    'message': f'Utworzono {len(slide_numbers)} slajdów'
+                })
+                
+            except Exception as e:
+                print(f"Błąd tworzenia slajdów: {str(e)}")
+                return jsonify({'success': False, 'error': str(e)}), 500
+        
         @self.flask_app.route('/api/presets/<path:filename>')
         def serve_preset(filename):
             return send_from_directory('templates/presets', filename)
@@ -290,21 +596,7 @@ class SlideScreenshotApp:
         @self.flask_app.route('/api/available-presets')
         def get_available_presets():
             try:
-                import os
-                presets_dir = 'templates/presets'
-                presets = []
-                
-                if os.path.exists(presets_dir):
-                    for filename in os.listdir(presets_dir):
-                        if filename.startswith('preset-') and filename.endswith('.json'):
-                            # Wyciągnij numer presetu z nazwy pliku
-                            preset_num = filename.replace('preset-', '').replace('.json', '')
-                            try:
-                                presets.append(int(preset_num))
-                            except ValueError:
-                                continue
-                
-                return jsonify({'presets': sorted(presets)})
+                return jsonify({'presets': self.slide_index.presets()})
             except Exception as e:
                 print(f"Błąd pobierania dostępnych presetów: {str(e)}")
                 return jsonify({'presets': []})
@@ -372,7 +664,7 @@ class SlideScreenshotApp:
         @self.flask_app.route('/api/edit-snippet', methods=['POST'])
         def edit_snippet():
             try:
-                from flask import request
+                from flask import request, Response, stream_with_context
                 import os
                 
                 data = request.get_json()
@@ -387,17 +679,26 @@ class SlideScreenshotApp:
                 remember_conversation = data.get('rememberConversation', False)
                 session_id = data.get('sessionId', None) if remember_conversation else None
                 
+                if data.get('stream'):
+                    # NDJSON: fragmenty w miarę generowania, ostatnia linia to wynik
+                    def generate():
+                        for event in self.stream_snippet_edit(prompt, session_id, remember_conversation):
+                            yield json.dumps(event, ensure_ascii=False) + '\n'
+                    
+                    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+                    response.headers['Cache-Control'] = 'no-store'
+                    response.headers['X-Accel-Buffering'] = 'no'
+                    return response
+                
                 # Generuj odpowiedź używając wbudowanego Gemini API
                 new_content = self.generate_with_gemini(prompt, session_id, remember_conversation)
                 
                 if not new_content:
                     return jsonify({'success': False, 'error': 'Błąd generowania odpowiedzi z Gemini API'}), 500
                 
-                # Nadpisz box1a.html
-                box1a_path = os.path.join('templates/presets', 'box1a.html')
-                
-                with open(box1a_path, 'w', encoding='utf-8') as f:
-                    f.write(new_content)
+                # Nadpisz box1a.html atomowo - równoległy eksport nie przeczyta połowy pliku
+                write_atomic(os.path.join('templates/presets', 'box1a.html'), new_content)
+                self.export_engine.invalidate_snippet('box1a.html')
                 
                 print(f"Zaktualizowano box1a.html przez API")
                 
@@ -414,534 +715,495 @@ class SlideScreenshotApp:
         def export_slide():
             try:
                 from flask import request
-                import json
-                import os
-                import shutil
                 
                 data = request.get_json()
                 if not data:
                     return jsonify({'success': False, 'error': 'Brak danych'}), 400
                 
-                # Znajdź następny numer katalogu p{n}
-                slides_dir = 'slides'
-                if not os.path.exists(slides_dir):
-                    os.makedirs(slides_dir)
-                
-                next_num = 1
-                existing_dirs = [d for d in os.listdir(slides_dir) if d.startswith('p') and d[1:].isdigit()]
-                if existing_dirs:
-                    existing_nums = [int(d[1:]) for d in existing_dirs]
-                    next_num = max(existing_nums) + 1
-                
-                export_dir = os.path.join(slides_dir, f'p{next_num}')
-                os.makedirs(export_dir, exist_ok=True)
-                
-                # Skopiuj obrazy jeśli są używane
-                images_to_copy = []
-                if data['green']['image']:
-                    images_to_copy.append(data['green']['image'])
-                if data['orange']['image']:
-                    images_to_copy.append(data['orange']['image'])
-                
-                for image_name in images_to_copy:
-                    src_path = os.path.join('img_slides', image_name)
-                    dst_path = os.path.join(export_dir, image_name)
-                    if os.path.exists(src_path):
-                        shutil.copy2(src_path, dst_path)
-                
-                # Generuj HTML
-                html_content = generate_slide_html(data, f'p{next_num}')
-                
-                # Zapisz HTML
-                html_path = os.path.join(export_dir, 's1.html')
-                with open(html_path, 'w', encoding='utf-8') as f:
-                    f.write(html_content)
+                exported = self.export_engine.export_slides([data], workers=EXPORT_WORKERS)[0]
                 
                 return jsonify({
                     'success': True,
-                    'path': f'slides/p{next_num}/s1.html',
-                    'directory': f'p{next_num}',
-                    'message': f'Slajd wyeksportowany do {export_dir}'
+                    'path': exported['path'],
+                    'directory': exported['directory'],
+                    'message': f"Slajd wyeksportowany do {os.path.join('slides', exported['directory'])}"
                 })
                 
             except Exception as e:
                 return jsonify({'success': False, 'error': str(e)}), 500
         
-        def generate_slide_html(data, slide_dir):
-            # Pomocnicze funkcje
-            def get_border_radius(element_data):
-                if element_data.get('circle'):
-                    return '50%'
-                elif element_data.get('rounded'):
-                    w, h = element_data['w'], element_data['h']
-                    radius = min(w, h) * 0.05
-                    return f'{radius}px'
-                return '0px'
-            
-            def get_text_decoration(styles):
-                return 'underline' if styles.get('underline') else 'none'
-            
-            def get_font_weight(styles):
-                return 'bold' if styles.get('bold') else 'normal'
-            
-            def get_font_style(styles):
-                return 'italic' if styles.get('italic') else 'normal'
-            
-            def get_background_image(image_name, zoom):
-                if image_name:
-                    return f"background-image: url('slides/{slide_dir}/{image_name}'); background-size: {zoom}%; background-position: center; background-repeat: no-repeat;"
-                return ""
-            
-            def load_html_snippet(snippet_file):
-                """Ładuje snippet HTML z foldera presets"""
-                try:
-                    snippet_path = os.path.join('templates/presets', snippet_file)
-                    if os.path.exists(snippet_path):
-                        with open(snippet_path, 'r', encoding='utf-8') as f:
-                            return f.read()
-                    return ""
-                except Exception as e:
-                    print(f"Błąd ładowania snippetu {snippet_file}: {e}")
-                    return ""
-            
-            def parse_snippet_content(snippet_html):
-                """Parsuje snippet HTML i wydziela CSS oraz HTML"""
-                import re
+        @self.flask_app.route('/api/export-slides', methods=['POST'])
+        def export_slides():
+            try:
+                from flask import request
                 
-                # Wyciągnij CSS z <style>
-                css_match = re.search(r'<style>(.*?)</style>', snippet_html, re.DOTALL)
-                css_content = css_match.group(1).strip() if css_match else ""
+                data = request.get_json(silent=True)
+                slides = data.get('slides') if isinstance(data, dict) else data
+                if not slides or not isinstance(slides, list):
+                    return jsonify({'success': False, 'error': 'Podaj listę slajdów w polu "slides"'}), 400
+                if len(slides) > EXPORT_MAX_SLIDES:
+                    return jsonify({'success': False, 'error': f'Maksymalnie {EXPORT_MAX_SLIDES} slajdów w jednym eksporcie'}), 400
                 
-                # Wyciągnij HTML bez <style>
-                html_content = re.sub(r'<style>.*?</style>', '', snippet_html, flags=re.DOTALL).strip()
+                started = time.time()
+                exported = self.export_engine.export_slides(slides, workers=EXPORT_WORKERS)
+                print(f"Wyeksportowano {len(exported)} slajdów: {exported[0]['directory']}..{exported[-1]['directory']}")
                 
-                return css_content, html_content
-            
-            # Generuj style CSS
-            styles = f"""
-                body {{
-                    margin: 0;
-                    padding: 0;
-                    background-color: {data['slide']['backgroundColor']};
-                    font-family: Arial, sans-serif;
-                }}
-                .container {{
-                    width: 1536px;
-                    height: 864px;
-                    position: relative;
-                    margin: 0 auto;
-                    background-color: {data['slide']['backgroundColor']};
-                }}
-            """
-            
-            # Green box
-            if not data['green']['hidden']:
-                # Sprawdź czy używa HTML snippet
-                if data['green'].get('snippetFile'):
-                    
-                    # Załaduj i parsuj snippet
-                    snippet_html = load_html_snippet(data['green']['snippetFile'])
-                    if snippet_html:
-                        snippet_css, snippet_html_content = parse_snippet_content(snippet_html)
-                        
-                        # Dodaj podstawowe style dla green-box z pozycjonowaniem
-                        styles += f"""
-                        .box2 {{
-                            position: absolute;
-                            left: {data['green']['x']}px;
-                            top: {data['green']['y']}px;
-                            width: {data['green']['w']}px;
-                            height: {data['green']['h']}px;
-                            border-radius: {get_border_radius(data['green'])};
-                        }}
-                        """
-                        
-                        # Dodaj CSS ze snippetu
-                        styles += snippet_css
-                    else:
-                        # Fallback - zwykły green box
-                        styles += f"""
-                        .box2 {{
-                            position: absolute;
-                            left: {data['green']['x']}px;
-                            top: {data['green']['y']}px;
-                            width: {data['green']['w']}px;
-                            height: {data['green']['h']}px;
-                            background-color: #81c784;
-                            border-radius: {get_border_radius(data['green'])};
-                            {get_background_image(data['green']['image'], data['green']['zoom'])}
-                        }}
-                        """
-                else:
-                    # Standardowy green box
-                    styles += f"""
-                    .box2 {{
-                        position: absolute;
-                        left: {data['green']['x']}px;
-                        top: {data['green']['y']}px;
-                        width: {data['green']['w']}px;
-                        height: {data['green']['h']}px;
-                        background-color: #81c784;
-                        border-radius: {get_border_radius(data['green'])};
-                        {get_background_image(data['green']['image'], data['green']['zoom'])}
-                    }}
-                    """
-                
-                # Green caption (tylko jeśli nie używa snippet)
-                if not data['green'].get('snippetFile') and data['green']['captionEnabled'] and data['green']['captionText']:
-                    caption_x = data['green']['x'] + data['green']['w'] // 2
-                    caption_y = data['green']['y'] + data['green']['h'] + 10
-                    styles += f"""
-                    .green-caption {{
-                        position: absolute;
-                        left: {caption_x}px;
-                        top: {caption_y}px;
-                        transform: translateX(-50%);
-                        font-size: {data['green']['captionSize']}px;
-                        background-color: {data['green']['captionBackgroundColor']};
-                        color: {data['green']['captionColor']};
-                        padding: 4px 8px;
-                        border-radius: 4px;
-                        font-family: {data['content']['fontFamily']};
-                    }}
-                    """
-            
-            # Orange box  
-            if not data['orange']['hidden']:
-                # Sprawdź czy używa HTML snippet
-                if data['orange'].get('snippetFile'):
-                    
-                    # Załaduj i parsuj snippet
-                    snippet_html = load_html_snippet(data['orange']['snippetFile'])
-                    if snippet_html:
-                        snippet_css, snippet_html_content = parse_snippet_content(snippet_html)
-                        
-                        # Dodaj podstawowe style dla orange-box z pozycjonowaniem
-                        styles += f"""
-                        .box1 {{
-                            position: absolute;
-                            left: {data['orange']['x']}px;
-                            top: {data['orange']['y']}px;
-                            width: {data['orange']['w']}px;
-                            height: {data['orange']['h']}px;
-                            border-radius: {get_border_radius(data['orange'])};
-                        }}
-                        """
-                        
-                        # Dodaj CSS ze snippetu
-                        styles += snippet_css
-                    else:
-                        # Fallback - zwykły orange box
-                        styles += f"""
-                        .box1 {{
-                            position: absolute;
-                            left: {data['orange']['x']}px;
-                            top: {data['orange']['y']}px;
-                            width: {data['orange']['w']}px;
-                            height: {data['orange']['h']}px;
-                            background-color: #ff9800;
-                            border-radius: {get_border_radius(data['orange'])};
-                            {get_background_image(data['orange']['image'], data['orange']['zoom'])}
-                        }}
-                        """
-                else:
-                    # Standardowy orange box
-                    styles += f"""
-                    .box1 {{
-                        position: absolute;
-                        left: {data['orange']['x']}px;
-                        top: {data['orange']['y']}px;
-                        width: {data['orange']['w']}px;
-                        height: {data['orange']['h']}px;
-                        background-color: #ff9800;
-                        border-radius: {get_border_radius(data['orange'])};
-                        {get_background_image(data['orange']['image'], data['orange']['zoom'])}
-                    }}
-                    """
-                
-                # Orange caption (tylko jeśli nie używa snippet)
-                if not data['orange'].get('snippetFile') and data['orange']['captionEnabled'] and data['orange']['captionText']:
-                    caption_x = data['orange']['x'] + data['orange']['w'] // 2
-                    caption_y = data['orange']['y'] + data['orange']['h'] + 10
-                    styles += f"""
-                    .orange-caption {{
-                        position: absolute;
-                        left: {caption_x}px;
-                        top: {caption_y}px;
-                        transform: translateX(-50%);
-                        font-size: {data['orange']['captionSize']}px;
-                        background-color: {data['orange']['captionBackgroundColor']};
-                        color: {data['orange']['captionColor']};
-                        padding: 4px 8px;
-                        border-radius: 4px;
-                        font-family: {data['content']['fontFamily']};
-                    }}
-                    """
-            
-            # Header
-            if not data['header']['hidden']:
-                styles += f"""
-                .header {{
-                    position: absolute;
-                    left: {data['header']['x']}px;
-                    top: {data['header']['y']}px;
-                    font-size: {data['header']['fontSize']}px;
-                    font-family: {data['header']['fontFamily']};
-                    font-weight: {get_font_weight(data['header'])};
-                    font-style: {get_font_style(data['header'])};
-                    text-decoration: {get_text_decoration(data['header'])};
-                    background-color: {data['header']['backgroundColor']};
-                    color: {data['header']['color']};
-                    padding-left: {data['header']['marginLeft']}px;
-                    padding-right: {data['header']['marginRight']}px;
-                    padding-top: 8px;
-                    padding-bottom: 8px;
-                    display: inline-block;
-                }}
-                """
-            
-            # Content
-            if not data['content']['hidden']:
-                styles += f"""
-                .content {{
-                    position: absolute;
-                    left: {data['content']['x']}px;
-                    top: {data['content']['y']}px;
-                    font-size: {data['content']['fontSize']}px;
-                    font-family: {data['content']['fontFamily']};
-                    font-weight: {get_font_weight(data['content'])};
-                    font-style: {get_font_style(data['content'])};
-                    text-decoration: {get_text_decoration(data['content'])};
-                    background-color: {data['content']['backgroundColor']};
-                    color: {data['content']['color']};
-                    padding-left: {data['content']['marginLeft']}px;
-                    padding-right: {data['content']['marginRight']}px;
-                    padding-top: 8px;
-                    padding-bottom: 8px;
-                    display: inline-block;
-                    white-space: pre-wrap;
-                    line-height: 1.2;
-                }}
-                """
-            
-            # Generuj HTML
-            html_body = '<div class="container">'
-            
-            # Dodaj elementy
-            if not data['green']['hidden']:
-                # Sprawdź czy używa HTML snippet
-                if data['green'].get('snippetFile'):
-                    # Załaduj snippet HTML
-                    snippet_html = load_html_snippet(data['green']['snippetFile'])
-                    if snippet_html:
-                        snippet_css, snippet_html_content = parse_snippet_content(snippet_html)
-                        # Dodaj div z klasą box2-snippet i wewnętrznym HTML ze snippetu
-                        html_body += f'<div class="green-box box2-snippet">{snippet_html_content}</div>'
-                    else:
-                        # Fallback - zwykły green box
-                        html_body += '<div class="green-box"></div>'
-                else:
-                    # Standardowy green box
-                    html_body += '<div class="green-box"></div>'
-                    # Caption tylko dla standardowego green box
-                    if data['green']['captionEnabled'] and data['green']['captionText']:
-                        html_body += f'<div class="green-caption">{data["green"]["captionText"]}</div>'
+                return jsonify({
+                    'success': True,
+                    'slides': exported,
+                    'count': len(exported),
+                    'elapsed_ms': int((time.time() - started) * 1000)
+                })
+                
+            except Exception as e:
+                print(f"Błąd eksportu slajdów: {str(e)}")
+                return jsonify({'success': False, 'error': str(e)}), 500
+        
+        @self.flask_app.route('/<path:filename>')
+        def serve_static(filename):
+            if not is_public_static(filename):
+                return "Not found", 404
+            return send_from_directory('.', filename)
             
-            if not data['orange']['hidden']:
-                # Sprawdź czy używa HTML snippet
-                if data['orange'].get('snippetFile'):
-                    # Załaduj snippet HTML
-                    snippet_html = load_html_snippet(data['orange']['snippetFile'])
-                    if snippet_html:
-                        snippet_css, snippet_html_content = parse_snippet_content(snippet_html)
-                        # Dodaj div z klasą box1-snippet i wewnętrznym HTML ze snippetu
-                        html_body += f'<div class="orange-box box1-snippet">{snippet_html_content}</div>'
-                    else:
-                        # Fallback - zwykły orange box
-                        html_body += '<div class="orange-box"></div>'
-                else:
-                    # Standardowy orange box
-                    html_body += '<div class="orange-box"></div>'
-                    # Caption tylko dla standardowego orange box
-                    if data['orange']['captionEnabled'] and data['orange']['captionText']:
-                        html_body += f'<div class="orange-caption">{data["orange"]["captionText"]}</div>'
+        @self.flask_app.route('/screenshot')
+        def take_screenshot():
+            try:
+                # Pobierz aktualny slajd z sesji użytkownika
+                from flask import request
+                current_slide = request.args.get('slide', '1')
+                result = self.capture_screenshot(current_slide, screenshot_options(request.args))
+                return jsonify({
+                    "status": "success",
+                    "message": f"Screenshot slajdu {current_slide} zapisany",
+                    "file": result['file'],
+                    "timings": result['timings'],
+                    "cached": result['cached']
+                })
+            except Exception as e:
+                return jsonify({"status": "error", "message": str(e)})
+        
+        @self.flask_app.route('/api/screenshot-batch', methods=['POST'])
+        def screenshot_batch():
+            from flask import request, Response, stream_with_context
             
-            if not data['header']['hidden']:
-                html_body += f'<div class="header">{data["header"]["text"]}</div>'
+            data = request.get_json(silent=True) or {}
+            try:
+                slide_ids = parse_slide_ids(data.get('slides') or data.get('range') or '')
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            if not slide_ids:
+                return jsonify({'success': False, 'error': 'Brak slajdów do zrobienia screenshotów'}), 400
+            try:
+                options = screenshot_options(data)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
             
-            if not data['content']['hidden']:
-                html_body += f'<div class="content">{data["content"]["text"]}</div>'
+            # NDJSON: jedna linia na slajd, ostatnia linia to manifest
+            def generate():
+                for event in self.capture_batch(slide_ids, options):
+                    yield json.dumps(event, ensure_ascii=False) + '\n'
             
-            html_body += '</div>'
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+        @self.flask_app.route('/render/<slide_id>')
+        def render_slide_document(slide_id):
+            # Samodzielny dokument 1536x864 dla screenshotów - bez JS przeglądarki slajdów
+            try:
+                slide_id = normalize_slide_id(slide_id)
+            except ValueError:
+                return "Slajd nie znaleziony", 404
+            try:
+                with open(slide_html_path(slide_id), 'r', encoding='utf-8') as f:
+                    slide_html = f.read()
+            except FileNotFoundError:
+                return "Slajd nie znaleziony", 404
             
-            # Kompletny HTML
+            # <base href="/"> - ścieżki względne (slides/p{n}/...) działają jak w index.html
             return f"""<!DOCTYPE html>
-<html lang="pl">
+<html>
 <head>
     <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Eksportowany slajd</title>
-    <style>
-        {styles}
-    </style>
+    <base href="/">
+    <style>{RENDER_DOCUMENT_CSS}    </style>
 </head>
 <body>
-    {html_body}
+    <div class="window" id="slide-window">{slide_html}</div>
 </body>
 </html>"""
+        
+        @self.flask_app.route('/api/screenshot-jobs', methods=['POST'])
+        def submit_screenshot_job():
+            from flask import request
             
-        @self.flask_app.route('/<path:filename>')
-        def serve_static(filename):
-            return send_from_directory('.', filename)
-            
-        @self.flask_app.route('/screenshot')
-        def take_screenshot():
+            data = request.get_json(silent=True) or {}
             try:
-                # Pobierz aktualny slajd z sesji użytkownika
-                from flask import request
-                current_slide = request.args.get('slide', '1')
-                self.capture_screenshot(current_slide)
-                return jsonify({"status": "success", "message": f"Screenshot slajdu {current_slide} zapisany"})
-            except Exception as e:
-                return jsonify({"status": "error", "message": str(e)})
-    
-    def ensure_driver_ready(self):
-        """Upewnij się, że persistent Chrome driver jest gotowy"""
-        if self.driver is None:
-            print("Inicjalizacja Chrome...")
+                slide_id = normalize_slide_id(data.get('slide', '1'))
+                options = screenshot_options(data)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
             
-            # Konfiguracja Chrome
-            options = Options()
-            options.add_argument('--headless')
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--force-device-scale-factor=1')
-            options.add_argument('--window-size=1600,1200')
-            options.add_argument('--no-first-run')
-            options.add_argument('--disable-default-apps')
+            try:
+                job = self.screenshot_jobs.submit(slide_id, options)
+            except QueueFullError as e:
+                # Backpressure - klient powinien ponowić później
+                response = jsonify({'success': False, 'error': str(e)})
+                response.headers['Retry-After'] = '1'
+                return response, 429
             
-            self.driver = webdriver.Chrome(options=options)
+            return jsonify({'success': True, 'job': job}), 202
+        
+        @self.flask_app.route('/api/screenshot-jobs')
+        def screenshot_jobs_stats():
+            return jsonify(self.screenshot_jobs.get_stats())
+        
+        @self.flask_app.route('/api/screenshot-jobs/<job_id>')
+        def screenshot_job_status(job_id):
+            status = self.screenshot_jobs.status(job_id)
+            if not status:
+                return jsonify({'success': False, 'error': 'Zadanie nie istnieje'}), 404
+            return jsonify({'success': True, 'job': status})
+        
+        @self.flask_app.route('/api/screenshot-jobs/<job_id>/result')
+        def screenshot_job_result(job_id):
+            from flask import send_file
             
-            self.driver.get(f'http://localhost:{self.port}')
-            time.sleep(0.7)  # Skrócone z 1s
-            print("Chrome persistent gotowy")
+            job = self.screenshot_jobs.get(job_id)
+            if not job:
+                return jsonify({'success': False, 'error': 'Zadanie nie istnieje'}), 404
+            if job['status'] != 'done':
+                return jsonify({'success': False, 'error': f"Zadanie w stanie: {job['status']}"}), 409
+            return send_file(os.path.abspath(job['result']['file']))
+        
+        @self.flask_app.route('/api/screenshot-cache')
+        def screenshot_cache_stats():
+            return jsonify(self.screenshot_cache.get_stats())
+        
+        @self.flask_app.route('/api/screenshot-cache/clear', methods=['POST'])
+        def clear_screenshot_cache():
+            self.screenshot_cache.clear()
+            return jsonify({'success': True, 'message': 'Cache screenshotów wyczyszczony'})
+        
+        @self.flask_app.route('/api/ai-sessions')
+        def ai_sessions_stats():
+            return jsonify(self.ai_sessions.get_stats())
+        
+        @self.flask_app.route('/api/snippet-cache')
+        def snippet_cache_stats():
+            return jsonify(self.export_engine.snippets.get_stats())
+        
+        @self.flask_app.route('/api/asset-store')
+        def asset_store_stats():
+            return jsonify(get_asset_store().get_stats())
+        
+        @self.flask_app.route('/api/asset-store/gc', methods=['POST'])
+        def asset_store_gc():
+            result = get_asset_store().gc()
+            print(f"[ASSETS] Usunięto {result['removed']} nieużywanych blobów")
+            return jsonify({'success': True, **result})
+        
+        @self.flask_app.route('/api/screenshot-pool')
+        def screenshot_pool_stats():
+            return jsonify(self.driver_pool.get_stats())
+    
+    def create_driver(self):
+        """Tworzy nową instancję headless Chrome dla puli"""
+        # Selenium ładowany dopiero przy pierwszym screenshocie
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        
+        print("Inicjalizacja Chrome...")
+        
+        # Konfiguracja Chrome
+        options = Options()
+        options.add_argument('--headless')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--force-device-scale-factor=1')
+        options.add_argument('--window-size=1600,1200')
+        options.add_argument('--no-first-run')
+        options.add_argument('--disable-default-apps')
+        
+        return webdriver.Chrome(options=options)
 
-    def capture_screenshot(self, slide_number='1'):
-        from PIL import Image
-        import io
-        import numpy as np
+    def prepare_driver(self, driver):
+        """Przygotowuje świeżą instancję Chrome z puli"""
+        install_fetch_tracker(driver)
+        # Tryb direct nawiguje od razu do /render/<id> - index.html byłby zbędnym ładowaniem
+        # strony przy każdym utworzeniu i recyklingu Chrome; viewer załaduje go w razie potrzeby
+        if SCREENSHOT_RENDER != 'direct':
+            self.load_viewer(driver)
+
+    def load_viewer(self, driver):
+        """Ładuje przeglądarkę slajdów (index.html) w instancji Chrome"""
+        driver.get(f'http://localhost:{self.port}')
+        if not hasattr(driver, 'execute_cdp_cmd'):
+            driver.execute_script(FETCH_TRACKER_JS)
+        # Zamiast stałego sleep - czekaj na number.txt, pierwszy slajd, fonty i obrazy
+        timings = wait_for_render_ready(driver, timeout=RENDER_READY_TIMEOUT)
+        print(f"Chrome persistent gotowy ({timings['total']} ms)")
+
+    def capture_screenshot(self, slide_number='1', options=None):
+        options = options or screenshot_options()
+        slide_number = normalize_slide_id(slide_number)
         
-        # Upewnij się że driver jest gotowy
-        self.ensure_driver_ready()
+        # Niezmieniony slajd - gotowy PNG z cache, bez Chrome
+        started = time.perf_counter()
+        key = self.screenshot_cache_key(slide_number, options)
+        if key:
+            filename = screenshot_filename(slide_number, options['format'])
+            if self.screenshot_cache.get(key, filename):
+                timings = {'cache': round((time.perf_counter() - started) * 1000, 1)}
+                print(f"[SCREENSHOT] Slajd {slide_number} z cache: {timings}")
+                return {'file': filename, 'timings': timings, 'cached': True}
         
+        # Każdy screenshot dostaje własny Chrome z puli - brak wyścigów o stan strony.
+        # Kodowanie odbywa się już po oddaniu drivera, więc może on renderować kolejny slajd.
+        with self.driver_pool.driver() as driver:
+            screenshot_png, location, timings = self.render_slide(driver, slide_number, options)
+        return self.finish_capture(screenshot_png, location, timings, slide_number, options, key)
+
+    def screenshot_cache_key(self, slide_number, options):
+        """Klucz cache dla slajdu lub None (cache wyłączony / slajd nie istnieje)"""
+        if not options.get('cache'):
+            return None
         try:
-            # Przejdź do odpowiedniego slajdu
-            if slide_number.startswith('p'):
-                # Slajd z katalogu p{n}
-                self.driver.execute_script(f"""
-                    loadSlideFromP1();
-                """)
-                time.sleep(0.2)
-            elif slide_number != '1':
-                # Normalny slajd
-                self.driver.execute_script(f"""
-                    // Symuluj przejście do slajdu {slide_number}
-                    currentSlide = {slide_number};
-                    loadSlide(currentSlide);
-                """)
-                time.sleep(0.2)
-            
-            # Wymuszenie dokładnych rozmiarów + fix dla tabel snippetów
-            self.driver.execute_script("""
-                const slideWindow = document.getElementById('slide-window');
-                slideWindow.style.width = '1536px';
-                slideWindow.style.height = '864px';
-                slideWindow.style.minHeight = '864px';
-                slideWindow.style.maxHeight = '864px';
-                slideWindow.style.overflow = 'hidden';
-                slideWindow.style.backgroundColor = 'white';
-                slideWindow.style.position = 'relative';
-                
-                // Fix specjalny dla snippet tables
-                const snippetTables = slideWindow.querySelectorAll('.box1-snippet table, .box2-snippet table');
-                snippetTables.forEach(table => {
-                    table.style.display = 'table';
-                    table.style.width = '100%';
-                    table.style.height = '100%';
-                    table.style.tableLayout = 'fixed';
-                    table.style.borderCollapse = 'collapse';
-                    
-                    // Force rows to show
-                    const rows = table.querySelectorAll('tr');
-                    rows.forEach((row, index) => {
-                        row.style.display = 'table-row';
-                        row.style.height = '50%';
-                        row.style.minHeight = '50%';
-                    });
-                    
-                    // Force cells to show
-                    const cells = table.querySelectorAll('td');
-                    cells.forEach(cell => {
-                        cell.style.display = 'table-cell';
-                        cell.style.width = '50%';
-                        cell.style.height = '50%';
-                        cell.style.minHeight = '50%';
-                        cell.style.verticalAlign = 'middle';
-                    });
-                });
-            """)
-            
-            time.sleep(0.5)  # Zwiększone dla stabilności layout tabeli
-            
+            render_options = {key: options[key] for key in ('mode', 'render', 'format', 'quality')}
+            return self.screenshot_cache.compute_key(slide_html_path(slide_number), render_options, RENDER_DOCUMENT_CSS)
+        except FileNotFoundError:
+            return None
+
+    def capture_batch(self, slide_ids, options=None):
+        """Screenshoty wielu slajdów naraz - generator zdarzeń postępu i manifestu"""
+        options = options or screenshot_options()
+        cache_keys = {}
+        
+        def lookup(slide_id):
+            cache_keys[slide_id] = self.screenshot_cache_key(slide_id, options)
+            if not cache_keys[slide_id]:
+                return None
+            filename = screenshot_filename(slide_id, options['format'])
+            return filename if self.screenshot_cache.get(cache_keys[slide_id], filename) else None
+        
+        def encode(screenshot_png, location, slide_id):
+            filename = self.encode_screenshot(screenshot_png, location, slide_id, options)
+            if cache_keys.get(slide_id):
+                self.screenshot_cache.put(cache_keys[slide_id], filename)
+            return filename
+        
+        return run_batch(
+            self.driver_pool,
+            lambda driver, slide_id: self.render_slide(driver, slide_id, options),
+            encode,
+            [normalize_slide_id(slide_id) for slide_id in slide_ids],
+            self.encoder_executor,
+            lookup=lookup
+        )
+
+    def capture_with_driver(self, driver, slide_number='1', options=None, cache_key=None):
+        options = options or screenshot_options()
+        slide_number = normalize_slide_id(slide_number)
+        screenshot_png, location, timings = self.render_slide(driver, slide_number, options)
+        return self.finish_capture(screenshot_png, location, timings, slide_number, options, cache_key)
+
+    def finish_capture(self, screenshot_png, location, timings, slide_number, options, cache_key=None):
+        """Kodowanie w puli wątków enkodera i zapis do cache"""
+        phase_started = time.perf_counter()
+        filename = self.encoder_executor.submit(
+            self.encode_screenshot, screenshot_png, location, slide_number, options
+        ).result()
+        if cache_key:
+            self.screenshot_cache.put(cache_key, filename)
+        timings['encode'] = round((time.perf_counter() - phase_started) * 1000, 1)
+        print(f"[SCREENSHOT] Slajd {slide_number}: {timings}")
+        return {'file': filename, 'timings': timings, 'cached': False}
+
+    def render_slide(self, driver, slide_number, options=None):
+        """Etap przeglądarki: nawigacja, layout i surowy PNG okna (bez dekodowania).
+
+        Zwraca (png, pozycja #slide-window, czasy faz w ms). W trybie 'clip'
+        PNG ma już dokładnie 1536x864 i pozycja jest None.
+        """
+        options = options or screenshot_options()
+        timings = {}
+        phase_started = time.perf_counter()
+        
+        def mark(phase):
+            nonlocal phase_started
+            now = time.perf_counter()
+            timings[phase] = round((now - phase_started) * 1000, 1)
+            phase_started = now
+        
+        # Błąd nie zamyka drivera - wraca do puli (lub zostanie wymieniony)
+        if options['render'] == 'direct':
+            # Samodzielny dokument slajdu - bez index.html, loadSlide i poprawek w JS
+            if not os.path.exists(slide_html_path(slide_number)):
+                raise FileNotFoundError(f"Slajd {slide_number} nie istnieje ({slide_html_path(slide_number)})")
+            driver.get(f'http://localhost:{self.port}/render/{slide_number}')
+            mark('navigate')
+        else:
+            self.navigate_viewer(driver, slide_number, mark)
+        
+        # Fonty, obrazy i dwie stabilne klatki zamiast sleep 0.5s
+        ready = wait_for_render_ready(driver, phases=('fonts', 'images', 'frames'), timeout=RENDER_READY_TIMEOUT)
+        mark('ready')
+        timings['ready_phases'] = ready
+        
+        if options['mode'] == 'clip' and hasattr(driver, 'execute_cdp_cmd'):
+            # Chrome renderuje tylko obszar slajdu - bez dekodowania i przycinania w Pythonie
+            screenshot_png = self.capture_clip(driver, browser_encoding(options['format'], options['quality']))
+            location = None
+        else:
             # Screenshot całej strony
-            screenshot_png = self.driver.get_screenshot_as_png()
-            img = Image.open(io.BytesIO(screenshot_png))
+            screenshot_png = driver.get_screenshot_as_png()
             
             # Znajdź element slajdu
-            slide_element = self.driver.find_element("id", "slide-window")
+            slide_element = driver.find_element("id", "slide-window")
             location = slide_element.location
+        mark('screenshot')
+        return screenshot_png, location, timings
+
+    def navigate_viewer(self, driver, slide_number, mark):
+        """Stara ścieżka: nawigacja w index.html i wymuszenie layoutu w JS"""
+        if not driver.execute_script("return typeof loadSlide === 'function'"):
+            # Driver bez przeglądarki slajdów (render=direct przy tworzeniu albo po /render/<id>)
+            self.load_viewer(driver)
+            mark('viewer')
+        if slide_number.startswith('p'):
+            # Slajd z katalogu p{n}
+            driver.execute_script(f"""
+                loadSlideFromP('{slide_number}');
+            """)
+        else:
+            # Normalny slajd (również s1 - driver z puli mógł zostać na innym slajdzie)
+            driver.execute_script(f"""
+                // Symuluj przejście do slajdu {slide_number}
+                currentSlide = {slide_number};
+                loadSlide(currentSlide);
+            """)
+        mark('navigate')
+        
+        # Poczekaj aż fetch slajdu wstawi HTML do DOM (zamiast sleep 0.2s)
+        wait_for_render_ready(driver, phases=('fetch',), timeout=RENDER_READY_TIMEOUT)
+        mark('fetch')
+        
+        # Wymuszenie dokładnych rozmiarów + fix dla tabel snippetów
+        driver.execute_script("""
+            const slideWindow = document.getElementById('slide-window');
+            slideWindow.style.width = '1536px';
+            slideWindow.style.height = '864px';
+            slideWindow.style.minHeight = '864px';
+            slideWindow.style.maxHeight = '864px';
+            slideWindow.style.overflow = 'hidden';
+            slideWindow.style.backgroundColor = 'white';
+            slideWindow.style.position = 'relative';
             
-            # Poprawka dla ujemnych pozycji
-            left = location['x']
-            top = location['y']
-            
-            # Jeśli pozycja Y jest ujemna, skoryguj ją
-            if top < 0:
-                top = 0
-            
-            # Jeśli pozycja X jest ujemna, skoryguj ją  
-            if left < 0:
-                left = 0
+            // Fix specjalny dla snippet tables
+            const snippetTables = slideWindow.querySelectorAll('.box1-snippet table, .box2-snippet table');
+            snippetTables.forEach(table => {
+                table.style.display = 'table';
+                table.style.width = '100%';
+                table.style.height = '100%';
+                table.style.tableLayout = 'fixed';
+                table.style.borderCollapse = 'collapse';
+                
+                // Force rows to show
+                const rows = table.querySelectorAll('tr');
+                rows.forEach((row, index) => {
+                    row.style.display = 'table-row';
+                    row.style.height = '50%';
+                    row.style.minHeight = '50%';
+                });
                 
-            right = left + 1536
-            bottom = top + 864
-            
-            # Sprawdź czy nie wychodzimy poza granice
-            if right > img.size[0]:
-                right = img.size[0]
-                left = right - 1536
-                
-            if bottom > img.size[1]:
-                bottom = img.size[1]
-                top = bottom - 864
-                # Sprawdź czy top nie jest ujemne po korekcie
-                if top < 0:
-                    top = 0
-                    bottom = min(864, img.size[1])
-            
-            cropped_img = img.crop((left, top, right, bottom))
-            
-            # Wymuszenie dokładnego rozmiaru 1536x864
-            final_img = Image.new('RGB', (1536, 864), 'white')
-            final_img.paste(cropped_img, (0, 0))
+                // Force cells to show
+                const cells = table.querySelectorAll('td');
+                cells.forEach(cell => {
+                    cell.style.display = 'table-cell';
+                    cell.style.width = '50%';
+                    cell.style.height = '50%';
+                    cell.style.minHeight = '50%';
+                    cell.style.verticalAlign = 'middle';
+                });
+            });
+        """)
+        
+        mark('layout')
+
+    def capture_clip(self, driver, encoding=None):
+        """Obraz samego #slide-window 1536x864 przez DevTools (Page.captureScreenshot z clip).
+
+        `encoding` to format/jakość, które Chrome koduje sam (png, jpeg, webp);
+        bez niego zwracany jest PNG do dalszego kodowania w PIL.
+        """
+        import base64
+        
+        rect = driver.execute_script("""
+            const r = document.getElementById('slide-window').getBoundingClientRect();
+            return {x: Math.max(0, r.left + window.scrollX), y: Math.max(0, r.top + window.scrollY)};
+        """)
+        result = driver.execute_cdp_cmd('Page.captureScreenshot', {
+            **(encoding or {'format': 'png'}),
+            'clip': {'x': rect['x'], 'y': rect['y'], 'width': 1536, 'height': 864, 'scale': 1},
+            'captureBeyondViewport': True,
+            'fromSurface': True
+        })
+        return base64.b64decode(result['data'])
+
+    def encode_screenshot(self, screenshot_png, location, slide_number, options=None):
+        """Etap CPU: dekodowanie, przycięcie do 1536x864 i zapis w wybranym formacie"""
+        options = options or screenshot_options()
+        filename = screenshot_filename(slide_number, options['format'])
+        
+        if location is None and browser_encoding(options['format'], options['quality']):
+            # Tryb 'clip' - Chrome zakodował już obraz docelowego rozmiaru i formatu, zapisz bajty bez dekodowania
+            with open(filename, 'wb') as f:
+                f.write(screenshot_png)
+            return filename
+        
+        from PIL import Image
+        import io
+        
+        img = Image.open(io.BytesIO(screenshot_png))
+        if location is None:
+            # Tryb 'clip' z formatem kodowanym w PIL (png-fast, png-optimized, webp-lossless)
+            save_image(img, filename, options['format'], options['quality'])
+            return filename
+        
+        # Poprawka dla ujemnych pozycji
+        left = location['x']
+        top = location['y']
+        
+        # Jeśli pozycja Y jest ujemna, skoryguj ją
+        if top < 0:
+            top = 0
+        
+        # Jeśli pozycja X jest ujemna, skoryguj ją  
+        if left < 0:
+            left = 0
             
-            timestamp = int(time.time())
-            filename = f'screenshot_slide_{slide_number}_{timestamp}.png'
-            final_img.save(filename, 'PNG')
+        right = left + 1536
+        bottom = top + 864
+        
+        # Sprawdź czy nie wychodzimy poza granice
+        if right > img.size[0]:
+            right = img.size[0]
+            left = right - 1536
             
-        except Exception as e:
-            # Nie zamykaj drivera - zostanie persistent
-            raise
+        if bottom > img.size[1]:
+            bottom = img.size[1]
+            top = bottom - 864
+            # Sprawdź czy top nie jest ujemne po korekcie
+            if top < 0:
+                top = 0
+                bottom = min(864, img.size[1])
+        
+        cropped_img = img.crop((left, top, right, bottom))
+        
+        # Wymuszenie dokładnego rozmiaru 1536x864
+        final_img = Image.new('RGB', (1536, 864), 'white')
+        final_img.paste(cropped_img, (0, 0))
+        
+        save_image(final_img, filename, options['format'], options['quality'])
+        return filename
     
     def start_server(self):
         import logging
@@ -970,6 +1232,77 @@ class SlideScreenshotApp:
             request_handler=QuietWSGIRequestHandler
         )
     
+    def shutdown(self):
+        """Zamyka pulę Chrome, kolejki i pule wątków"""
+        print("Zamykanie Chrome...")
+        self.screenshot_jobs.shutdown()
+        self.driver_pool.shutdown()
+        self.encoder_executor.shutdown(wait=True)
+        self.image_variants.shutdown()
+        # Sesje AI na dysk - wrócą po restarcie
+        self.ai_sessions.close()
+
+    def run_batch_cli(self, spec, manifest_path=None, options=None):
+        """Batch screenshotów z linii poleceń (bez otwierania przeglądarki)"""
+        server_thread = threading.Thread(target=self.start_server, daemon=True)
+        server_thread.start()
+        self.server_running = True
+        time.sleep(1)  # Krótkie opóźnienie na uruchomienie serwera
+        
+        manifest = None
+        try:
+            for event in self.capture_batch(parse_slide_ids(spec), options):
+                if event['event'] == 'progress':
+                    print(f"[BATCH] {event['done']}/{event['total']} slajd {event['slide']} -> {event['file']} ({event['ms']} ms)")
+                elif event['event'] == 'error':
+                    print(f"[BATCH] {event['done']}/{event['total']} slajd {event['slide']} BŁĄD: {event['error']}")
+                else:
+                    manifest = event
+        finally:
+            self.shutdown()
+        
+        if manifest_path:
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+            print(f"[BATCH] Manifest zapisany: {manifest_path}")
+        print(f"[BATCH] Gotowe: {len(manifest['files'])} plików, {len(manifest['errors'])} błędów, {manifest['elapsed_ms']} ms")
+        return manifest
+
+
+class SlideScreenshotApp(SlideServer):
+    """Okno Tk z przyciskiem "Otwórz" - serwer deweloperski w wątku tła"""
+
+    def __init__(self):
+        import tkinter as tk
+
+        self.root = tk.Tk()
+        self.root.title("Slide Screenshot Tool")
+        self.root.geometry("300x150")
+        self.root.resizable(False, False)
+        
+        super().__init__()
+        self.setup_gui()
+        
+    def setup_gui(self):
+        import tkinter as tk
+        from tkinter import ttk
+
+        # Główna ramka
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Przycisk otwórz
+        self.open_button = ttk.Button(main_frame, text="Otwórz", command=self.open_browser)
+        self.open_button.grid(row=0, column=0, pady=10)
+        
+        # Status połączenia
+        self.status_label = ttk.Label(main_frame, text="Status: Nie uruchomiono")
+        self.status_label.grid(row=1, column=0, pady=5)
+        
+        # Port info
+        self.port_label = ttk.Label(main_frame, text=f"Port: {self.port}")
+        self.port_label.grid(row=2, column=0, pady=5)
+    
     def open_browser(self):
         if not self.server_running:
             # Uruchom serwer w osobnym wątku
@@ -980,17 +1313,72 @@ class SlideScreenshotApp:
             time.sleep(1)  # Krótkie opóźnienie na uruchomienie serwera
         
         # Otwórz przeglądarkę
+        import webbrowser
         webbrowser.open(f'http://localhost:{self.port}')
     
     def run(self):
         try:
             self.root.mainloop()
         finally:
-            # Zamknij persistent Chrome przy wyjściu
-            if self.driver:
-                print("Zamykanie Chrome...")
-                self.driver.quit()
+            # Zamknij pulę Chrome przy wyjściu
+            self.shutdown()
+
+
+def create_app(port=None):
+    """Fabryka aplikacji WSGI bez GUI (gunicorn: "server:create_app()").
+
+    `port` to port, na którym serwer faktycznie nasłuchuje - Chrome z puli
+    screenshotów ładuje slajdy z http://localhost:{port}.
+    """
+    server = SlideServer(port or SERVE_PORT)
+    server.flask_app.extensions['slide_server'] = server
+    return server.flask_app
+
+
+def serve_production(host=SERVE_HOST, port=SERVE_PORT, workers=SERVE_WORKERS, threads=SERVE_THREADS,
+                     keepalive=SERVE_KEEPALIVE, backend=SERVE_BACKEND):
+    """Tryb produkcyjny bez Tk: gunicorn/waitress zamiast serwera Werkzeug"""
+    if workers > 1 and resolve_backend(backend) == 'gunicorn':
+        # Każdy proces ma własną pulę Chrome, kolejkę zadań i sesje AI
+        print(f"[SERVER] {workers} procesów: do {workers * SCREENSHOT_WORKERS} instancji Chrome; "
+              f"status /api/screenshot-jobs/<id> jest dostępny tylko w procesie, który przyjął zadanie")
+    serve(lambda: create_app(port), host=host, port=port, workers=workers, threads=threads,
+          keepalive=keepalive, backend=backend,
+          on_exit=lambda app: app.extensions['slide_server'].shutdown())
+
 
 if __name__ == '__main__':
-    app = SlideScreenshotApp()
-    app.run()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Slide Screenshot Tool')
+    parser.add_argument('--screenshots', metavar='SLAJDY',
+                        help='Batch screenshotów bez GUI, np. "s1..s10,p1..p3"')
+    parser.add_argument('--manifest', metavar='PLIK', help='Zapisz manifest batcha do pliku JSON')
+    parser.add_argument('--mode', choices=SCREENSHOT_MODES, default=SCREENSHOT_MODE,
+                        help='Tryb screenshotu (clip - tylko slajd przez DevTools, full - całe okno + przycięcie)')
+    parser.add_argument('--format', choices=sorted(OUTPUT_FORMATS), default=SCREENSHOT_FORMAT,
+                        help='Format wyjściowy screenshotów')
+    parser.add_argument('--quality', type=int, help='Jakość dla formatów stratnych (webp, jpeg), 1-100')
+    parser.add_argument('--render', choices=SCREENSHOT_RENDERS, default=SCREENSHOT_RENDER,
+                        help='Ścieżka renderowania (direct - samodzielny dokument slajdu, viewer - przez index.html)')
+    parser.add_argument('--serve', action='store_true',
+                        help='Tryb produkcyjny bez GUI (gunicorn/waitress, wiele wątków i procesów), to samo co serve.py')
+    add_serve_arguments(parser, SERVE_HOST, SERVE_PORT)
+    args = parser.parse_args()
+    
+    if args.serve:
+        serve_production(args.host, args.port, args.workers, args.threads, args.keepalive, args.backend)
+        raise SystemExit(0)
+    
+    if args.screenshots:
+        # Batch nie potrzebuje okna Tk
+        app = SlideServer()
+        options = screenshot_options({
+            'mode': args.mode,
+            'render': args.render,
+            'format': args.format,
+            'quality': args.quality
+        })
+        manifest = app.run_batch_cli(args.screenshots, args.manifest, options)
+        raise SystemExit(1 if manifest['errors'] else 0)
+    SlideScreenshotApp().run()
\ No newline at end of file
@@ -0,0 +1,448 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+SESSION_MAX_COUNT = 100
+SESSION_MAX_BYTES = 256 * 1024 * 1024
+SESSION_TTL = 3600              # s bezczynności, po których sesja opuszcza pamięć
+SPILL_MAX_AGE = 7 * 24 * 3600   # s, po których zrzucona sesja jest usuwana z dysku
+PRUNE_SPILL_INTERVAL = 60
+
+
+class SessionEntry:
+    """Sesja w pamięci: obiekt czatu, szacowany rozmiar i czas ostatniego użycia."""
+
+    def __init__(self, session: Any, size: int, last_used: float):
+        self.session = session
+        self.size = size
+        self.last_used = last_used
+
+    def __repr__(self):
+        return f"<SessionEntry size={self.size} last_used={self.last_used:.0f}>"
+
+
+class SessionStore:
+    """Ograniczony magazyn sesji czatu (liczba, bajty, TTL bezczynności, LRU).
+
+    `create(state)` buduje sesję - nową dla state=None albo odtworzoną ze
+    stanu zwróconego wcześniej przez `dump(session)`. Gdy podano
+    `spill_dir`, sesje usuwane z pamięci (LRU, TTL, zamknięcie) są
+    zapisywane na dysk jako JSON i przy następnym użyciu ich id wracają
+    z pełną historią. `size_of(session)` szacuje pamięć trzymaną przez
+    sesję (historia z obrazami i PDF-ami); rozmiar jest przeliczany
+    po każdej wiadomości przez `update`.
+
+    `session(id)` daje wyłączny dostęp do sesji: żądania tej samej sesji
+    wykonują się po kolei (historia w kolejności), różnych - równolegle.
+    Sesja, na którą ktoś czeka lub z której korzysta, nie jest usuwana
+    z pamięci przez limity ani TTL. Pod blokadą magazynu zapadają tylko
+    decyzje; pomiar rozmiaru, zrzut historii i zapis JSON na dysk idą
+    poza nią, pod blokadą danej sesji.
+    """
+
+    def __init__(self, create: Callable[[Optional[Any]], Any], dump: Optional[Callable[[Any], Any]] = None,
+                 size_of: Optional[Callable[[Any], int]] = None, max_sessions: int = SESSION_MAX_COUNT,
+                 max_bytes: int = SESSION_MAX_BYTES, ttl: float = SESSION_TTL, spill_dir: Optional[str] = None,
+                 spill_max_age: float = SPILL_MAX_AGE):
+        self.create = create
+        self.dump = dump
+        self.size_of = size_of or (lambda session: 0)
+        self.max_sessions = max(1, max_sessions)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill_dir = str(spill_dir) if spill_dir and dump else None
+        self.spill_max_age = spill_max_age
+        self._entries: 'OrderedDict[str, SessionEntry]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        # id sesji -> [lock sesji, liczba korzystających/czekających]
+        self._session_locks: Dict[str, List] = {}
+        self._last_spill_prune = 0.0
+        self.stats = {'hits': 0, 'created': 0, 'rehydrated': 0, 'evicted': 0, 'expired': 0,
+                      'spilled': 0, 'spill_errors': 0}
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._entries or self._spill_exists(session_id)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _hold(self, session_id: str) -> List:
+        # Pod self._lock: rejestruje korzystającego z blokady sesji
+        holder = self._session_locks.get(session_id)
+        if holder is None:
+            holder = self._session_locks[session_id] = [threading.Lock(), 0]
+        holder[1] += 1
+        return holder
+
+    def _unhold(self, session_id: str, holder: List):
+        with self._lock:
+            holder[1] -= 1
+            if holder[1] == 0:
+                del self._session_locks[session_id]
+
+    @contextmanager
+    def _session_lock(self, session_id: str) -> Iterator[None]:
+        with self._lock:
+            holder = self._hold(session_id)
+        try:
+            with holder[0]:
+                yield
+        finally:
+            self._unhold(session_id, holder)
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[Any]:
+        """Wyłączny dostęp do sesji na czas bloku; po nim rozmiar jest przeliczany."""
+        with self._session_lock(session_id):
+            session = self._load(session_id)
+            try:
+                yield session
+            finally:
+                self._update(session_id)
+
+    def get_or_create(self, session_id: str) -> Any:
+        """Sesja z pamięci, odtworzona z dysku albo nowa."""
+        with self._session_lock(session_id):
+            return self._load(session_id)
+
+    def update(self, session_id: str):
+        """Przelicza rozmiar sesji po wiadomości i egzekwuje limity."""
+        with self._session_lock(session_id):
+            self._update(session_id)
+
+    def _load(self, session_id: str) -> Any:
+        # Blokada sesji jest trzymana - odczyt zrzutu i create() poza blokadą magazynu
+        now = time.time()
+        with self._lock:
+            victims = self._prune(now)
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry.last_used = now
+                self._entries.move_to_end(session_id)
+                self.stats['hits'] += 1
+        if entry is None:
+            state = self._read_spill(session_id)
+            session = self.create(state)
+            entry = SessionEntry(session, self._measure(session), now)
+            with self._lock:
+                self.stats['rehydrated' if state is not None else 'created'] += 1
+                self._entries[session_id] = entry
+                self._bytes += entry.size
+                victims += self._enforce_limits(keep=session_id)
+        self._spill_victims(victims)
+        self._prune_spill_dir(now)
+        return entry.session
+
+    def _update(self, session_id: str):
+        with self._lock:
+            entry = self._entries.get(session_id)
+        if entry is None:
+            return
+        # Rozmiar (przegląd całej historii) liczony poza blokadą magazynu
+        size = self._measure(entry.session)
+        with self._lock:
+            if self._entries.get(session_id) is not entry:
+                return
+            self._bytes += size - entry.size
+            entry.size = size
+            entry.last_used = time.time()
+            self._entries.move_to_end(session_id)
+            victims = self._enforce_limits(keep=session_id)
+        self._spill_victims(victims)
+
+    def reset(self, session_id: str) -> bool:
+        """Usuwa sesję z pamięci i z dysku; False, gdy nie istniała.
+
+        Czeka na zakończenie trwającej wiadomości w tej sesji.
+        """
+        with self._session_lock(session_id):
+            with self._lock:
+                entry = self._entries.pop(session_id, None)
+                if entry is not None:
+                    self._bytes -= entry.size
+            removed_spill = self._remove_spill(session_id)
+            return entry is not None or removed_spill
+
+    def close(self):
+        """Zrzuca wszystkie sesje na dysk (jeśli włączono) i czyści pamięć.
+
+        Sesja w trakcie wiadomości jest zrzucana dopiero po jej zakończeniu.
+        """
+        with self._lock:
+            session_ids = list(self._entries)
+        for session_id in session_ids:
+            with self._session_lock(session_id):
+                with self._lock:
+                    entry = self._entries.pop(session_id, None)
+                    if entry is None:
+                        continue
+                    self._bytes -= entry.size
+                self._spill(session_id, entry)
+
+    def _measure(self, session: Any) -> int:
+        try:
+            return int(self.size_of(session))
+        except Exception:
+            return 0
+
+    def _evict(self, session_id: str, reason: str) -> tuple:
+        # Pod self._lock: tylko wybór ofiary. Zrzut (dump + zapis JSON) robi _spill_victims
+        # poza blokadą magazynu, trzymając blokadę sesji - kto po nią sięgnie, czeka na zapis
+        entry = self._entries.pop(session_id)
+        self._bytes -= entry.size
+        self.stats[reason] += 1
+        holder = self._hold(session_id)
+        holder[0].acquire()
+        return session_id, entry, holder
+
+    def _spill_victims(self, victims: List[tuple]):
+        for session_id, entry, holder in victims:
+            try:
+                self._spill(session_id, entry)
+            finally:
+                holder[0].release()
+                self._unhold(session_id, holder)
+
+    def _enforce_limits(self, keep: Optional[str] = None) -> List[tuple]:
+        # Najdawniej używane pierwsze; bieżąca i używane sesje zostają, nawet ponad limit
+        victims = []
+        for session_id in list(self._entries):
+            if len(self._entries) <= self.max_sessions and self._bytes <= self.max_bytes:
+                break
+            if session_id != keep and session_id not in self._session_locks:
+                victims.append(self._evict(session_id, 'evicted'))
+        return victims
+
+    def _prune(self, now: float) -> List[tuple]:
+        victims = []
+        for session_id, entry in list(self._entries.items()):
+            if now - entry.last_used < self.ttl:
+                break
+            if session_id not in self._session_locks:
+                victims.append(self._evict(session_id, 'expired'))
+        return victims
+
+    def _prune_spill_dir(self, now: float):
+        if not self.spill_dir:
+            return
+        with self._lock:
+            if now - self._last_spill_prune < PRUNE_SPILL_INTERVAL:
+                return
+            self._last_spill_prune = now
+        for filename in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, filename)
+            try:
+                if now - os.path.getmtime(path) > self.spill_max_age:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _spill_path(self, session_id: str) -> str:
+        digest = hashlib.sha1(session_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.spill_dir, f'{digest}.json')
+
+    def _spill_exists(self, session_id: str) -> bool:
+        return bool(self.spill_dir) and os.path.exists(self._spill_path(session_id))
+
+    def _spill(self, session_id: str, entry: SessionEntry):
+        if not self.spill_dir:
+            return
+        path = self._spill_path(session_id)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'session_id': session_id, 'state': self.dump(entry.session)}, f)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self.stats['spilled'] += 1
+        except Exception as e:
+            with self._lock:
+                self.stats['spill_errors'] += 1
+            print(f"[SESSIONS] Nie można zapisać sesji {session_id} na dysk: {e}")
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+
+    def _read_spill(self, session_id: str) -> Optional[Any]:
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(session_id)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (ValueError, OSError) as e:
+            print(f"[SESSIONS] Uszkodzony zrzut sesji {session_id}, tworzę nową: {e}")
+            return None
+        # Sesja wraca do pamięci - zrzut byłby nieaktualny po kolejnej wiadomości
+        self._remove_spill(session_id)
+        return data.get('state') if data.get('session_id') == session_id else None
+
+    def _remove_spill(self, session_id: str) -> bool:
+        if not self.spill_dir:
+            return False
+        try:
+            os.remove(self._spill_path(session_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {**self.stats, 'sessions': len(self._entries), 'active': len(self._session_locks),
+                     'bytes': self._bytes,
+                     'max_sessions': self.max_sessions, 'max_bytes': self.max_bytes, 'ttl': self.ttl}
+        if self.spill_dir:
+            stats['spill_files'] = sum(1 for name in os.listdir(self.spill_dir) if name.endswith('.json'))
+        return stats
+
+
+def gemini_chat_adapter(get_client: Callable[[], Any], get_model: Callable[[], str]) -> Dict[str, Callable]:
+    """Funkcje create/dump/size_of dla SessionStore z czatami google-genai.
+
+    Zrzut to model i pełna (comprehensive) historia jako JSON - bajty
+    obrazów i PDF-ów są w nim zakodowane base64, a chats.create(history=...)
+    przyjmuje te słowniki bez konwersji.
+    """
+    def create(state=None):
+        if state is None:
+            return get_client().chats.create(model=get_model())
+        return get_client().chats.create(model=state.get('model') or get_model(), history=state['history'])
+
+    def dump(chat):
+        return {
+            'model': getattr(chat, '_model', None),
+            'history': [content.model_dump(mode='json', exclude_none=True) for content in chat.get_history()],
+        }
+
+    def size_of(chat):
+        total = 0
+        for content in chat.get_history():
+            for part in content.parts or []:
+                if part.text:
+                    total += len(part.text)
+                if part.inline_data is not None and part.inline_data.data:
+                    total += len(part.inline_data.data)
+        return total
+
+    return {'create': create, 'dump': dump, 'size_of': size_of}
+
+
+if __name__ == '__main__':
+    # Limity, TTL i odtwarzanie z dysku na sesjach-atrapach (bez API Gemini)
+    import tempfile
+
+    class FakeChat:
+        def __init__(self, history=None):
+            self.history = list(history or [])
+
+        def send_message(self, text):
+            self.history.append(text)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(create=lambda state: FakeChat(state), dump=lambda chat: chat.history,
+                             size_of=lambda chat: sum(len(m) for m in chat.history),
+                             max_sessions=50, max_bytes=200_000, ttl=3600, spill_dir=tmp)
+        started = time.perf_counter()
+        for n in range(500):
+            session_id = f'sesja-{n % 80}'
+            store.get_or_create(session_id).send_message('x' * 1000 + str(n))
+            store.update(session_id)
+        elapsed = time.perf_counter() - started
+        stats = store.get_stats()
+        print(f"500 wiadomości w 80 sesjach: {elapsed * 1000:.0f} ms; {stats}")
+        assert stats['sessions'] <= 50 and stats['bytes'] <= 200_000
+
+        # Sesja zrzucona na dysk wraca z pełną historią
+        history = store.get_or_create('sesja-0').history
+        assert len(history) == len([n for n in range(500) if n % 80 == 0]), history
+        store.ttl = 0
+        store.get_or_create('nowa')
+        assert store.get_stats()['expired'] > 0
+        assert store.reset('sesja-0') and 'sesja-0' not in store
+
+    # Współbieżność: wiele kart na tych samych sesjach, send_message to read-modify-write historii
+    from concurrent.futures import ThreadPoolExecutor
+
+    class SlowChat(FakeChat):
+        def send_message(self, text):
+            history = list(self.history)
+            time.sleep(0.002)  # okno na przeplot dwóch żądań tej samej sesji
+            self.history = history + [text, f'odp:{text}']
+
+    sessions, messages, delay = 16, 25, 0.002
+
+    def run(store, locked):
+        def send(session_id, n):
+            if locked:
+                with store.session(session_id) as chat:
+                    chat.send_message(f'{session_id}/{n}')
+            else:
+                store.get_or_create(session_id).send_message(f'{session_id}/{n}')
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            jobs = [executor.submit(send, f's{i}', n) for n in range(messages) for i in range(sessions)]
+            for job in jobs:
+                job.result()
+        return time.perf_counter() - started
+
+    def lost_messages(store):
+        lost = 0
+        for i in range(sessions):
+            with store.session(f's{i}') as chat:
+                history = chat.history
+            assert all(history[k + 1] == f'odp:{history[k]}' for k in range(0, len(history), 2))
+            lost += messages - len(set(history[0::2]))
+        return lost
+
+    with tempfile.TemporaryDirectory() as tmp:
+        unsafe = SessionStore(create=lambda state: SlowChat(state), dump=lambda chat: chat.history)
+        run(unsafe, locked=False)
+        print(f"Bez blokad: utracono {lost_messages(unsafe)} z {sessions * messages} wiadomości")
+
+        # Z blokadami, a do tego limit 4 sesji w pamięci - reszta krąży przez dysk
+        safe = SessionStore(create=lambda state: SlowChat(state), dump=lambda chat: chat.history,
+                            max_sessions=4, spill_dir=tmp)
+        elapsed = run(safe, locked=True)
+        lost = lost_messages(safe)
+        stats = safe.get_stats()
+        print(f"Z blokadami: {sessions * messages} wiadomości w {elapsed * 1000:.0f} ms "
+              f"(sekwencyjnie {sessions * messages * delay * 1000:.0f} ms), utracono {lost}; {stats}")
+        assert lost == 0
+        assert stats['created'] == sessions, "Zduplikowane tworzenie sesji"
+        assert stats['active'] == 0 and stats['sessions'] <= 4
+        assert elapsed < sessions * messages * delay, "Różne sesje nie działają równolegle"
+
+        # Zrzut na dysk poza blokadą magazynu: wolny dump jednej sesji nie blokuje innych sesji
+        def slow_dump(chat):
+            time.sleep(0.3)
+            return chat.history
+
+        slow = SessionStore(create=lambda state: FakeChat(state), dump=slow_dump, max_sessions=1, spill_dir=tmp)
+        slow.get_or_create('a').send_message('historia a')
+        evicting = threading.Thread(target=slow.get_or_create, args=('b',))
+        evicting.start()
+        time.sleep(0.05)
+        started = time.perf_counter()
+        slow.get_or_create('c')
+        other_ms = (time.perf_counter() - started) * 1000
+        # Sesja w trakcie zrzutu: czekamy na zapis i odtwarzamy ją z pełną historią
+        assert slow.get_or_create('a').history == ['historia a']
+        evicting.join()
+        print(f"Inna sesja w trakcie zrzutu (dump 300 ms): {other_ms:.1f} ms")
+        assert other_ms < 100, "Zrzut sesji blokuje magazyn"
+        slow.close()
+        assert len(slow) == 0 and slow.get_stats()['active'] == 0
+    print("OK")
@@ -0,0 +1,417 @@
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from asset_store import get_asset_store
+from slide_numbering import allocate_export_dirs
+
+# Boksy slajdu: klucz w danych eksportu -> selektor CSS, klasa w HTML,
+# klasa snippetu, domyślne tło i klasa podpisu. Kolejny boks to nowy wpis.
+BOX_TYPES = {
+    'green': {
+        'selector': '.box2',
+        'css_class': 'green-box',
+        'snippet_class': 'box2-snippet',
+        'background': '#81c784',
+        'caption_class': 'green-caption',
+    },
+    'orange': {
+        'selector': '.box1',
+        'css_class': 'orange-box',
+        'snippet_class': 'box1-snippet',
+        'background': '#ff9800',
+        'caption_class': 'orange-caption',
+    },
+}
+
+# Szablony kompilowane raz przy imporcie modułu - eksport tylko je wypełnia
+BASE_CSS = """
+        body {{
+            margin: 0;
+            padding: 0;
+            background-color: {background};
+            font-family: Arial, sans-serif;
+        }}
+        .container {{
+            width: 1536px;
+            height: 864px;
+            position: relative;
+            margin: 0 auto;
+            background-color: {background};
+        }}
+"""
+
+SNIPPET_BOX_CSS = """
+        {selector} {{
+            position: absolute;
+            left: {x}px;
+            top: {y}px;
+            width: {w}px;
+            height: {h}px;
+            border-radius: {radius};
+        }}
+"""
+
+BOX_CSS = """
+        {selector} {{
+            position: absolute;
+            left: {x}px;
+            top: {y}px;
+            width: {w}px;
+            height: {h}px;
+            background-color: {background};
+            border-radius: {radius};
+            {background_image}
+        }}
+"""
+
+BACKGROUND_IMAGE_CSS = ("background-image: url('slides/{slide_dir}/{image}'); background-size: {zoom}%; "
+                        "background-position: center; background-repeat: no-repeat;")
+
+CAPTION_CSS = """
+        .{caption_class} {{
+            position: absolute;
+            left: {x}px;
+            top: {y}px;
+            transform: translateX(-50%);
+            font-size: {size}px;
+            background-color: {background};
+            color: {color};
+            padding: 4px 8px;
+            border-radius: 4px;
+            font-family: {font_family};
+        }}
+"""
+
+TEXT_CSS = """
+        .{name} {{
+            position: absolute;
+            left: {x}px;
+            top: {y}px;
+            font-size: {fontSize}px;
+            font-family: {fontFamily};
+            font-weight: {weight};
+            font-style: {style};
+            text-decoration: {decoration};
+            background-color: {backgroundColor};
+            color: {color};
+            padding-left: {marginLeft}px;
+            padding-right: {marginRight}px;
+            padding-top: 8px;
+            padding-bottom: 8px;
+            display: inline-block;{extra}
+        }}
+"""
+
+CONTENT_EXTRA_CSS = """
+            white-space: pre-wrap;
+            line-height: 1.2;"""
+
+DOCUMENT_HEAD = """<!DOCTYPE html>
+<html lang="pl">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Eksportowany slajd</title>
+    <style>
+"""
+
+DOCUMENT_MIDDLE = """
+    </style>
+</head>
+<body>
+    """
+
+DOCUMENT_TAIL = """
+</body>
+</html>"""
+
+STYLE_RE = re.compile(r'<style>(.*?)</style>', re.DOTALL)
+
+# Elementy tekstowe w kolejności renderowania
+TEXT_ELEMENTS = ('header', 'content')
+
+
+def border_radius(box: Dict[str, Any]) -> str:
+    if box.get('circle'):
+        return '50%'
+    if box.get('rounded'):
+        return f"{min(box['w'], box['h']) * 0.05}px"
+    return '0px'
+
+
+def parse_snippet(snippet_html: str) -> Tuple[str, str]:
+    """Rozdziela snippet na CSS z <style> i pozostały HTML."""
+    css_match = STYLE_RE.search(snippet_html)
+    css = css_match.group(1).strip() if css_match else ''
+    html = STYLE_RE.sub('', snippet_html).strip()
+    return css, html
+
+
+class SnippetCache:
+    """Cache sparsowanych snippetów HTML: ścieżka -> (css, html).
+
+    Wpis jest ważny, dopóki plik ma ten sam mtime_ns i rozmiar, więc
+    zmiana snippetu z dysku unieważnia go sama. Zapis przez aplikację
+    (np. /api/edit-snippet) woła dodatkowo `invalidate`, bo dwa zapisy
+    w obrębie rozdzielczości mtime mogłyby mieć ten sam klucz.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[int, int, Tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, snippet_path: str) -> Optional[Tuple[str, str]]:
+        """Zwraca (css, html) snippetu albo None, gdy plik nie istnieje lub jest pusty."""
+        path = os.path.normpath(snippet_path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._entries.pop(path, None)
+                self.stats['misses'] += 1
+            return None
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self.stats['hits'] += 1
+                return entry[2]
+            self.stats['misses'] += 1
+
+        with open(path, 'r', encoding='utf-8') as f:
+            snippet_html = f.read()
+        parsed = parse_snippet(snippet_html) if snippet_html else None
+        with self._lock:
+            self._entries[path] = (stat.st_mtime_ns, stat.st_size, parsed)
+        return parsed
+
+    def invalidate(self, snippet_path: Optional[str] = None):
+        """Usuwa wpis snippetu (albo wszystkie, gdy nie podano ścieżki)."""
+        with self._lock:
+            if snippet_path is None:
+                self.stats['invalidations'] += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(os.path.normpath(snippet_path), None) is not None:
+                self.stats['invalidations'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else 0.0,
+            }
+
+
+class SlideExportEngine:
+    """Generuje samodzielny HTML eksportowanego slajdu (slides/p{n}/s1.html).
+
+    Wszystkie boksy z BOX_TYPES przechodzą przez jedną ścieżkę kodu,
+    a dokument jest składany z gotowych szablonów przez ''.join zamiast
+    wielokrotnego `styles +=`.
+    """
+
+    def __init__(self, presets_dir: str = 'templates/presets', image_variants=None, image_scale: float = 1.0):
+        self.presets_dir = presets_dir
+        self.snippets = SnippetCache()
+        # Opcjonalne ImageVariants: obrazy w slajdach przeskalowane do rozmiaru boksu (image_scale <= 0 wyłącza)
+        self.image_variants = image_variants
+        self.image_scale = image_scale
+
+    def snippet_path(self, snippet_file: str) -> str:
+        return os.path.join(self.presets_dir, snippet_file)
+
+    def load_snippet(self, snippet_file: str) -> Optional[Tuple[str, str]]:
+        """Zwraca (css, html) snippetu z katalogu presets albo None."""
+        try:
+            return self.snippets.get(self.snippet_path(snippet_file))
+        except Exception as e:
+            print(f"Błąd ładowania snippetu {snippet_file}: {e}")
+            return None
+
+    def invalidate_snippet(self, snippet_file: str):
+        """Wywoływane po nadpisaniu snippetu przez aplikację."""
+        self.snippets.invalidate(self.snippet_path(snippet_file))
+
+    def render_box(self, name: str, box: Dict[str, Any], data: Dict[str, Any], slide_dir: str,
+                   css: List[str], html: List[str]):
+        spec = BOX_TYPES[name]
+        snippet_file = box.get('snippetFile')
+        snippet = self.load_snippet(snippet_file) if snippet_file else None
+        geometry = {'selector': spec['selector'], 'x': box['x'], 'y': box['y'],
+                    'w': box['w'], 'h': box['h'], 'radius': border_radius(box)}
+
+        if snippet:
+            snippet_css, snippet_html = snippet
+            css.append(SNIPPET_BOX_CSS.format(**geometry))
+            css.append(snippet_css)
+            html.append(f'<div class="{spec["css_class"]} {spec["snippet_class"]}">{snippet_html}</div>')
+            return
+
+        background_image = ''
+        if box.get('image'):
+            background_image = BACKGROUND_IMAGE_CSS.format(slide_dir=slide_dir, image=box['image'], zoom=box['zoom'])
+        css.append(BOX_CSS.format(background=spec['background'], background_image=background_image, **geometry))
+        html.append(f'<div class="{spec["css_class"]}"></div>')
+
+        # Podpis tylko dla boksu bez snippetu (brakujący snippet też go nie ma)
+        if snippet_file or not (box.get('captionEnabled') and box.get('captionText')):
+            return
+        css.append(CAPTION_CSS.format(
+            caption_class=spec['caption_class'],
+            x=box['x'] + box['w'] // 2,
+            y=box['y'] + box['h'] + 10,
+            size=box['captionSize'],
+            background=box['captionBackgroundColor'],
+            color=box['captionColor'],
+            font_family=data['content']['fontFamily']
+        ))
+        html.append(f'<div class="{spec["caption_class"]}">{box["captionText"]}</div>')
+
+    def render_text(self, name: str, element: Dict[str, Any], css: List[str], html: List[str]):
+        css.append(TEXT_CSS.format(
+            name=name,
+            weight='bold' if element.get('bold') else 'normal',
+            style='italic' if element.get('italic') else 'normal',
+            decoration='underline' if element.get('underline') else 'none',
+            extra=CONTENT_EXTRA_CSS if name == 'content' else '',
+            **element
+        ))
+        html.append(f'<div class="{name}">{element["text"]}</div>')
+
+    def render(self, data: Dict[str, Any], slide_dir: str) -> str:
+        """HTML slajdu z danych eksportu edytora; obrazy są w slides/{slide_dir}/."""
+        css = [BASE_CSS.format(background=data['slide']['backgroundColor'])]
+        html = ['<div class="container">']
+
+        for name in BOX_TYPES:
+            box = data.get(name)
+            if box and not box.get('hidden'):
+                self.render_box(name, box, data, slide_dir, css, html)
+        for name in TEXT_ELEMENTS:
+            element = data.get(name)
+            if element and not element.get('hidden'):
+                self.render_text(name, element, css, html)
+
+        html.append('</div>')
+        return ''.join([DOCUMENT_HEAD, *css, DOCUMENT_MIDDLE, *html, DOCUMENT_TAIL])
+
+    def export_slides(self, slides: List[Dict[str, Any]], slides_dir: str = 'slides',
+                      images_dir: str = 'img_slides', workers: int = 4) -> List[Dict[str, str]]:
+        """Eksportuje wiele slajdów naraz do kolejnych katalogów p{n}.
+
+        Blok katalogów jest rezerwowany jednorazowo, każdy obraz z banku
+        jest sprawdzany raz (także gdy używa go wiele slajdów) i trafia do
+        slajdów jako hardlink do wspólnego bloba (asset_store), a zapisy HTML
+        i kopie obrazów idą do puli wątków. Z `image_variants` slajd dostaje
+        obraz przeskalowany do szerokości boksu (przy danym zoom) zamiast
+        pełnego pliku z banku. Błąd dowolnego zapisu usuwa cały blok -
+        eksport jest wszystko albo nic.
+        """
+        if not slides:
+            return []
+        numbers = allocate_export_dirs(slides_dir, len(slides))
+        assets = get_asset_store(slides_dir)
+        use_variants = (self.image_variants is not None and self.image_scale > 0 and
+                        os.path.abspath(images_dir) == os.path.abspath(self.image_variants.images_dir))
+
+        def place_image(src_path, image_name, width, dst_path):
+            if use_variants and width:
+                src_path = self.image_variants.variant(image_name, width, scale=self.image_scale)
+            assets.place(src_path, dst_path)
+
+        try:
+            sources = {}
+            writes = []
+            for number, data in zip(numbers, slides):
+                slide_dir = f'p{number}'
+                export_dir = os.path.join(slides_dir, slide_dir)
+                # Obraz użyty w dwóch boksach to jeden plik - o szerokości większego z nich
+                widths = {}
+                for name in BOX_TYPES:
+                    box = data.get(name)
+                    if box and box.get('image'):
+                        width = int((box.get('w') or 0) * (box.get('zoom') or 100) / 100)
+                        widths[box['image']] = max(widths.get(box['image'], 0), width)
+                for image_name, width in widths.items():
+                    if image_name not in sources:
+                        src_path = os.path.join(images_dir, image_name)
+                        sources[image_name] = src_path if os.path.exists(src_path) else None
+                    if sources[image_name]:
+                        writes.append((place_image, sources[image_name], image_name, width,
+                                       os.path.join(export_dir, image_name)))
+                writes.append((write_text, os.path.join(export_dir, 's1.html'), self.render(data, slide_dir)))
+
+            with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='export') as executor:
+                futures = [executor.submit(*write) for write in writes]
+                for future in futures:
+                    future.result()
+        except BaseException:
+            for number in numbers:
+                shutil.rmtree(os.path.join(slides_dir, f'p{number}'), ignore_errors=True)
+            raise
+
+        return [{'directory': f'p{number}', 'path': f'{slides_dir}/p{number}/s1.html'} for number in numbers]
+
+
+def write_text(path: str, content: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def sample_export_data(index: int = 0) -> Dict[str, Any]:
+    """Przykładowe dane eksportu (jak z edytora) - do benchmarku."""
+    box = {
+        'w': 400, 'h': 300, 'x': 100 + index % 50, 'y': 200, 'hidden': False,
+        'circle': False, 'rounded': True, 'image': 'photo.jpg', 'zoom': 100,
+        'captionEnabled': True, 'captionText': f'Podpis {index}', 'captionSize': 16,
+        'captionBackgroundColor': '#81c784', 'captionColor': '#000000', 'snippetFile': None,
+    }
+    text = {
+        'x': 50, 'y': 40, 'fontSize': 32, 'fontFamily': 'Arial', 'bold': True, 'italic': False,
+        'underline': False, 'backgroundColor': '#ffeb3b', 'color': '#000000',
+        'marginLeft': 10, 'marginRight': 10, 'hidden': False,
+    }
+    return {
+        'slide': {'backgroundColor': '#ffffff'},
+        'green': dict(box),
+        'orange': dict(box, x=700, snippetFile='box1a.html', captionEnabled=False),
+        'header': dict(text, text=f'Nagłówek {index}'),
+        'content': dict(text, y=120, fontSize=20, text='Treść slajdu\n' * 5),
+    }
+
+
+if __name__ == '__main__':
+    # Mikrobenchmark: czas eksportu na slajd dla 1, 10 i 1000 slajdów
+    engine = SlideExportEngine()
+    for count in (1, 10, 1000):
+        slides = [sample_export_data(i) for i in range(count)]
+        started = time.perf_counter()
+        total_bytes = 0
+        for i, data in enumerate(slides):
+            total_bytes += len(engine.render(data, f'p{i + 1}'))
+        elapsed = time.perf_counter() - started
+        print(f"{count:5d} slajdów: {elapsed * 1000:8.2f} ms łącznie, "
+              f"{elapsed / count * 1_000_000:8.1f} µs/slajd, {total_bytes / count:.0f} B/slajd")
+    print(f"Cache snippetów: {engine.snippets.get_stats()}")
+
+    # Eksport całej prezentacji (300 slajdów) do katalogu tymczasowego
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        images_dir = os.path.join(tmp, 'img_slides')
+        os.makedirs(images_dir)
+        with open(os.path.join(images_dir, 'photo.jpg'), 'wb') as f:
+            f.write(os.urandom(512 * 1024))
+        started = time.perf_counter()
+        exported = engine.export_slides([sample_export_data(i) for i in range(300)],
+                                        os.path.join(tmp, 'slides'), images_dir, workers=8)
+        elapsed = time.perf_counter() - started
+        print(f"Eksport {len(exported)} slajdów ({exported[0]['directory']}..{exported[-1]['directory']}): "
+              f"{elapsed * 1000:.0f} ms")
@@ -1,7 +1,11 @@
+import copy
 import json
 import os
-import shutil
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from asset_store import get_asset_store
+from slide_numbering import SlideNumberAllocator
 
 class SlideGenerator:
     def __init__(self):
@@ -9,6 +13,7 @@ class SlideGenerator:
         self.presets_dir = 'templates/presets'
         self.slides_dir = 'slides'
         self.img_slides_dir = 'img_slides'
+        self.numbering = SlideNumberAllocator('number.txt')
         
     def load_preset(self, preset_name: str) -> Dict[str, Any]:
         """Ładuje preset z pliku JSON."""
@@ -20,18 +25,12 @@ class SlideGenerator:
             return json.load(f)
     
     def get_next_slide_number(self) -> int:
-        """Zwraca numer następnego slajdu."""
-        try:
-            with open('number.txt', 'r') as f:
-                current_count = int(f.read().strip())
-            return current_count + 1
-        except FileNotFoundError:
-            return 1
+        """Zwraca numer następnego slajdu (bez rezerwacji - do tworzenia służy numbering.reserve)."""
+        return self.numbering.current() + 1
     
     def update_slide_count(self, new_count: int):
-        """Aktualizuje liczbę slajdów w number.txt."""
-        with open('number.txt', 'w') as f:
-            f.write(str(new_count))
+        """Aktualizuje liczbę slajdów w number.txt (atomowa zamiana pliku)."""
+        self.numbering.set(new_count)
     
     def copy_image_to_slides(self, image_filename: str, slide_number: int) -> str:
         """Kopiuje obraz z img_slides do slides z nową nazwą."""
@@ -48,7 +47,8 @@ class SlideGenerator:
         dst_filename = f"{slide_number}{ext}"
         dst_path = os.path.join(self.slides_dir, dst_filename)
         
-        shutil.copy2(src_path, dst_path)
+        # Wspólny blob w slides/_blobs zamiast pełnej kopii obrazu dla każdego slajdu
+        get_asset_store(self.slides_dir).place(src_path, dst_path)
         print(f"Skopiowano obraz: {image_filename} → {dst_filename}")
         return dst_filename
     
@@ -180,35 +180,78 @@ class SlideGenerator:
     def create_slide(self, preset_name: str, images: Dict[str, str], 
                     custom_texts: Optional[Dict[str, str]] = None) -> int:
         """Tworzy nowy slajd na podstawie presetu."""
+        return self.create_slides([{
+            'preset': preset_name,
+            'images': images,
+            'texts': custom_texts
+        }], workers=1)[0]
+    
+    def create_slides(self, slides: List[Dict[str, Any]], workers: int = 4) -> List[int]:
+        """Tworzy wiele slajdów naraz - wszystko albo nic.
         
-        # Załaduj preset
-        preset_config = self.load_preset(preset_name)
-        
-        # Nadpisz teksty jeśli podano
-        if custom_texts:
-            if 'header' in custom_texts:
-                preset_config['header']['text'] = custom_texts['header']
-            if 'content' in custom_texts:
-                preset_config['content']['text'] = custom_texts['content']
-        
-        # Pobierz numer następnego slajdu
-        slide_number = self.get_next_slide_number()
-        
-        # Konwertuj do prostego HTML
-        html_content = self.convert_to_simple_html(preset_config, images, slide_number)
-        
-        # Zapisz plik HTML
-        slide_filename = f's{slide_number}.html'
-        slide_path = os.path.join(self.slides_dir, slide_filename)
+        Każdy element to {'preset': ..., 'images': {...}, 'texts': {...}}.
+        Presety są wczytywane raz, numery rezerwowane pod blokadą number.txt
+        (wątki i procesy), pliki HTML zapisywane równolegle do plików
+        tymczasowych, a number.txt aktualizowany jednym zapisem dopiero po
+        udanej zamianie wszystkich plików. Błąd usuwa wszystko, co batch
+        zdążył zapisać, więc w numeracji nie zostają dziury.
+        """
+        if not slides:
+            return []
         
-        with open(slide_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        presets = {}
+        configs = []
+        for slide in slides:
+            preset_name = slide.get('preset', 'preset-1')
+            if preset_name not in presets:
+                presets[preset_name] = self.load_preset(preset_name)
+            preset_config = copy.deepcopy(presets[preset_name])
+            texts = slide.get('texts') or {}
+            for key in ('header', 'content'):
+                if key in texts:
+                    preset_config.setdefault(key, {})['text'] = texts[key]
+            configs.append((preset_config, slide.get('images') or {}))
         
-        # Aktualizuj liczbę slajdów
-        self.update_slide_count(slide_number)
+        with self.numbering.reserve(len(configs)) as numbers:
+            written = []
+            
+            def write_slide(number, preset_config, images):
+                html_content = self.convert_to_simple_html(preset_config, images, number)
+                slide_path = os.path.join(self.slides_dir, f's{number}.html')
+                with open(f'{slide_path}.tmp', 'w', encoding='utf-8') as f:
+                    f.write(html_content)
+            
+            try:
+                with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='create-slide') as executor:
+                    futures = [executor.submit(write_slide, number, *config)
+                               for number, config in zip(numbers, configs)]
+                    for future in futures:
+                        future.result()
+                for number in numbers:
+                    slide_path = os.path.join(self.slides_dir, f's{number}.html')
+                    os.replace(f'{slide_path}.tmp', slide_path)
+                    written.append(slide_path)
+            except BaseException:
+                for number, (_, images) in zip(numbers, configs):
+                    slide_path = os.path.join(self.slides_dir, f's{number}.html')
+                    leftovers = [f'{slide_path}.tmp']
+                    if slide_path in written:
+                        leftovers.append(slide_path)
+                    if images.get('green'):
+                        _, ext = os.path.splitext(images['green'])
+                        leftovers.append(os.path.join(self.slides_dir, f'{number}{ext}'))
+                    for path in leftovers:
+                        try:
+                            os.remove(path)
+                        except FileNotFoundError:
+                            pass
+                raise
         
-        print(f"Utworzono slajd: {slide_filename}")
-        return slide_number
+        if len(numbers) == 1:
+            print(f"Utworzono slajd: s{numbers[0]}.html")
+        else:
+            print(f"Utworzono {len(numbers)} slajdów: s{numbers[0]}..s{numbers[-1]}")
+        return numbers
 
 # Przykład użycia
 if __name__ == "__main__":
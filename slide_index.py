@@ -0,0 +1,128 @@
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+SLIDE_FILE_RE = re.compile(r'^s(\d+)\.html$')
+PRESET_FILE_RE = re.compile(r'^preset-(\d+)\.json$')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+
+# Zmiana w katalogu w ciągu tego czasu od jego mtime może mieć ten sam
+# znacznik czasu co poprzedni skan (rozdzielczość mtime) - wtedy skanuj ponownie
+RACY_WINDOW_NS = 2_000_000_000
+
+
+class SlideIndex:
+    """Trzymany w pamięci indeks slajdów, katalogów p{n}, presetów i obrazów.
+
+    Każdy odczyt robi jeden os.stat katalogu (lub number.txt); pełne
+    os.listdir i przetworzenie listy dzieje się tylko, gdy zmienił się
+    mtime. Wynik jest zapamiętany razem z mtime, więc endpointy nie
+    skanują dysku przy każdym żądaniu.
+    """
+
+    def __init__(self, root: str = '.', slides_dir: str = 'slides', images_dir: str = 'img_slides',
+                 presets_dir: str = os.path.join('templates', 'presets'), number_file: str = 'number.txt'):
+        self.slides_dir = os.path.join(root, slides_dir)
+        self.images_dir = os.path.join(root, images_dir)
+        self.presets_dir = os.path.join(root, presets_dir)
+        self.number_file = os.path.join(root, number_file)
+        self._cache: Dict[Tuple[str, str], Tuple[Tuple[int, int], Any]] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'scans': 0}
+
+    def _cached(self, path: str, name: str, build: Callable[[], Any], default: Any) -> Any:
+        """Wynik `build()` ważny, dopóki `path` ma ten sam mtime i rozmiar."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return default
+        signature = (stat.st_mtime_ns, stat.st_size)
+        racy = time.time_ns() - stat.st_mtime_ns < RACY_WINDOW_NS
+        with self._lock:
+            entry = self._cache.get((path, name))
+            if entry and entry[0] == signature and not racy:
+                self.stats['hits'] += 1
+                return entry[1]
+            self.stats['scans'] += 1
+        try:
+            value = build()
+        except FileNotFoundError:
+            return default
+        with self._lock:
+            self._cache[(path, name)] = (signature, value)
+        return value
+
+    def number_text(self) -> Optional[str]:
+        """Zawartość number.txt albo None, gdy plik nie istnieje."""
+        def read():
+            with open(self.number_file, 'r') as f:
+                return f.read()
+        return self._cached(self.number_file, 'number', read, None)
+
+    def slide_count(self) -> int:
+        try:
+            return int((self.number_text() or '0').strip())
+        except ValueError:
+            return 0
+
+    def standard_slides(self) -> List[int]:
+        """Numery istniejących plików slides/s{n}.html."""
+        def build():
+            numbers = [int(m.group(1)) for m in map(SLIDE_FILE_RE.match, os.listdir(self.slides_dir)) if m]
+            return sorted(numbers)
+        return self._cached(self.slides_dir, 'slides', build, [])
+
+    def export_dirs(self) -> List[int]:
+        """Numery katalogów slides/p{n}."""
+        def build():
+            numbers = [int(d[1:]) for d in os.listdir(self.slides_dir) if d.startswith('p') and d[1:].isdigit()]
+            return sorted(numbers)
+        return self._cached(self.slides_dir, 'exports', build, [])
+
+    def export_files(self, number: int) -> List[str]:
+        """Pliki w katalogu slides/p{n} (HTML slajdu i skopiowane obrazy)."""
+        path = os.path.join(self.slides_dir, f'p{number}')
+        return self._cached(path, 'files', lambda: sorted(os.listdir(path)), [])
+
+    def images(self) -> List[str]:
+        """Obrazy w banku img_slides/ (kolejność alfabetyczna)."""
+        def build():
+            return sorted(name for name in os.listdir(self.images_dir) if name.lower().endswith(IMAGE_EXTENSIONS))
+        return self._cached(self.images_dir, 'images', build, [])
+
+    def presets(self) -> List[int]:
+        """Numery plików templates/presets/preset-{n}.json."""
+        def build():
+            return sorted(int(m.group(1)) for m in map(PRESET_FILE_RE.match, os.listdir(self.presets_dir)) if m)
+        return self._cached(self.presets_dir, 'presets', build, [])
+
+    def snippets(self) -> List[str]:
+        """Snippety HTML w templates/presets."""
+        def build():
+            return sorted(name for name in os.listdir(self.presets_dir) if name.endswith('.html'))
+        return self._cached(self.presets_dir, 'snippets', build, [])
+
+    def manifest(self) -> Dict[str, Any]:
+        """Cała struktura prezentacji w jednym obiekcie (endpoint /api/deck-manifest)."""
+        exports = []
+        for number in self.export_dirs():
+            files = self.export_files(number)
+            exports.append({
+                'id': f'p{number}',
+                'path': f'slides/p{number}/s1.html' if 's1.html' in files else None,
+                'files': files,
+            })
+        return {
+            'count': self.slide_count(),
+            'slides': [{'id': str(n), 'path': f'slides/s{n}.html'} for n in self.standard_slides()],
+            'exports': exports,
+            'presets': self.presets(),
+            'snippets': self.snippets(),
+            'images': self.images(),
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'entries': len(self._cache)}
@@ -0,0 +1,175 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path: str) -> threading.Lock:
+    """Jeden lock wątków na plik blokady - wspólny dla wszystkich instancji w procesie."""
+    key = os.path.abspath(path)
+    with _thread_locks_guard:
+        if key not in _thread_locks:
+            _thread_locks[key] = threading.Lock()
+        return _thread_locks[key]
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Wyłączna blokada między wątkami i procesami (flock / msvcrt.locking)."""
+    with _thread_lock(path):
+        with open(path, 'a+b') as f:
+            if os.name == 'nt':
+                import msvcrt
+                f.seek(0)
+                while True:
+                    try:
+                        # LK_LOCK ponawia próbę przez ~10 s, potem zgłasza OSError
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+                try:
+                    yield
+                finally:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def write_atomic(path: str, content: str):
+    """Zapis przez plik tymczasowy + os.replace - czytelnik nigdy nie widzi połowy pliku."""
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SlideNumberAllocator:
+    """Przydział numerów slajdów s{n} zapisanych w number.txt.
+
+    `reserve(count)` trzyma blokadę (wątki + procesy) przez cały czas
+    tworzenia slajdów i zapisuje nową liczbę dopiero po udanym wyjściu
+    z bloku - wyjątek zostawia number.txt bez zmian.
+    """
+
+    def __init__(self, number_file: str = 'number.txt'):
+        self.number_file = number_file
+        self.lock_file = f'{number_file}.lock'
+
+    def current(self) -> int:
+        try:
+            with open(self.number_file, 'r') as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return 0
+
+    def set(self, count: int):
+        write_atomic(self.number_file, str(count))
+
+    @contextmanager
+    def reserve(self, count: int = 1) -> Iterator[List[int]]:
+        if count < 1:
+            raise ValueError("Liczba slajdów musi być >= 1")
+        with file_lock(self.lock_file):
+            current = self.current()
+            yield list(range(current + 1, current + count + 1))
+            self.set(current + count)
+
+
+def allocate_export_dirs(slides_dir: str, count: int) -> List[int]:
+    """Rezerwuje ciągły blok katalogów p{n}..p{n+count-1} w `slides_dir`.
+
+    Blokada pliku slides/.export.lock porządkuje rezerwacje wszystkich
+    procesów, a os.mkdir dodatkowo chroni przed katalogiem utworzonym
+    z pominięciem blokady - wtedy częściowy blok jest zwalniany, a
+    rezerwacja ponawiana za najwyższym istniejącym numerem.
+    """
+    if count < 1:
+        raise ValueError("Liczba slajdów musi być >= 1")
+    os.makedirs(slides_dir, exist_ok=True)
+    with file_lock(os.path.join(slides_dir, '.export.lock')):
+        while True:
+            existing = [int(d[1:]) for d in os.listdir(slides_dir) if d.startswith('p') and d[1:].isdigit()]
+            start = max(existing, default=0) + 1
+            created = []
+            try:
+                for number in range(start, start + count):
+                    os.mkdir(os.path.join(slides_dir, f'p{number}'))
+                    created.append(number)
+                return created
+            except FileExistsError:
+                for number in created:
+                    os.rmdir(os.path.join(slides_dir, f'p{number}'))
+
+
+def _stress_worker(args):
+    """Jeden proces stress testu: wiele wątków tworzy slajdy i eksportuje katalogi."""
+    workdir, creates, exports, threads = args
+    import contextlib
+    import io
+    from concurrent.futures import ThreadPoolExecutor
+    from slide_generator import SlideGenerator
+
+    os.chdir(workdir)
+
+    def create(_):
+        return ('s', SlideGenerator().create_slide('preset-1', {}, {'header': f'pid {os.getpid()}'}))
+
+    def export(_):
+        return ('p', allocate_export_dirs('slides', 1)[0])
+
+    # Bez logów "Utworzono slajd" z setek wątków
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=threads) as executor:
+        jobs = [executor.submit(create, n) for n in range(creates)]
+        jobs += [executor.submit(export, n) for n in range(exports)]
+        return [job.result() for job in jobs]
+
+
+if __name__ == '__main__':
+    # Stress test: równoległe create-slide i eksporty z wielu procesów i wątków
+    import shutil
+    import sys
+    import tempfile
+    import time
+    from concurrent.futures import ProcessPoolExecutor
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    processes, creates, exports, threads = 8, 40, 25, 16
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, 'slides'))
+        shutil.copytree(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'presets'),
+                        os.path.join(tmp, 'templates', 'presets'))
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = [item for chunk in executor.map(_stress_worker, [(tmp, creates, exports, threads)] * processes)
+                       for item in chunk]
+        elapsed = time.perf_counter() - started
+
+        slide_numbers = sorted(n for kind, n in results if kind == 's')
+        export_numbers = sorted(n for kind, n in results if kind == 'p')
+        with open(os.path.join(tmp, 'number.txt')) as f:
+            final_count = int(f.read())
+        html_files = [name for name in os.listdir(os.path.join(tmp, 'slides')) if name.endswith('.html')]
+
+        expected_slides = list(range(1, processes * creates + 1))
+        expected_exports = list(range(1, processes * exports + 1))
+        print(f"{len(results)} równoległych operacji w {elapsed:.2f} s "
+              f"({processes} procesów x {threads} wątków)")
+        print(f"Slajdy s{{n}}: {len(slide_numbers)}, unikalne: {len(set(slide_numbers))}, "
+              f"plików HTML: {len(html_files)}, number.txt = {final_count}")
+        print(f"Katalogi p{{n}}: {len(export_numbers)}, unikalne: {len(set(export_numbers))}")
+        assert slide_numbers == expected_slides, "Zduplikowane lub brakujące numery slajdów"
+        assert final_count == len(expected_slides) == len(html_files)
+        assert export_numbers == expected_exports, "Zduplikowane lub brakujące katalogi eksportu"
+        print("OK")
@@ -0,0 +1,118 @@
+import os
+from typing import Callable, Optional
+
+# Tryb produkcyjny: wielowątkowy (i opcjonalnie wieloprocesowy) serwer WSGI
+# zamiast serwera deweloperskiego Werkzeug. Domyślnie tylko lokalnie - API nie ma
+# uwierzytelnienia, nasłuch w sieci (0.0.0.0) trzeba włączyć jawnie przez --host/SERVE_HOST
+SERVE_HOST = os.environ.get('SERVE_HOST', '127.0.0.1')
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+SERVE_BACKEND = os.environ.get('SERVE_BACKEND', 'auto')
+SERVE_BACKENDS = ('auto', 'gunicorn', 'waitress', 'werkzeug')
+SERVE_WORKERS = int(os.environ.get('SERVE_WORKERS', 1))
+SERVE_THREADS = int(os.environ.get('SERVE_THREADS', 16))
+# Czas utrzymania połączenia keep-alive między żądaniami (s) - przeglądarka
+# pobiera HTML, CSS i obrazy slajdu jednym połączeniem
+SERVE_KEEPALIVE = int(os.environ.get('SERVE_KEEPALIVE', 5))
+SERVE_TIMEOUT = int(os.environ.get('SERVE_TIMEOUT', 120))
+
+
+def resolve_backend(backend: str = 'auto') -> str:
+    """Wybiera serwer: gunicorn (Unix), potem waitress, na końcu Werkzeug."""
+    if backend not in SERVE_BACKENDS:
+        raise ValueError(f"Nieznany serwer WSGI: {backend}")
+    if backend != 'auto':
+        return backend
+    if os.name != 'nt':
+        try:
+            import gunicorn  # noqa: F401
+            return 'gunicorn'
+        except ImportError:
+            pass
+    try:
+        import waitress  # noqa: F401
+        return 'waitress'
+    except ImportError:
+        return 'werkzeug'
+
+
+def add_serve_arguments(parser, host: str = SERVE_HOST, port: int = 8000):
+    """Opcje trybu produkcyjnego wspólne dla server.py, serve.py i backendu Gemini."""
+    parser.add_argument('--host', default=host, help='Adres nasłuchu')
+    parser.add_argument('--port', type=int, default=port, help='Port')
+    parser.add_argument('--workers', type=int, default=SERVE_WORKERS, help='Liczba procesów (gunicorn)')
+    parser.add_argument('--threads', type=int, default=SERVE_THREADS, help='Liczba wątków na proces')
+    parser.add_argument('--keepalive', type=int, default=SERVE_KEEPALIVE, help='Keep-alive połączeń (s)')
+    parser.add_argument('--backend', choices=SERVE_BACKENDS, default=SERVE_BACKEND, help='Serwer WSGI')
+    return parser
+
+
+def serve(app_factory: Callable[[], object], host: str = SERVE_HOST, port: int = 8000,
+          workers: int = SERVE_WORKERS, threads: int = SERVE_THREADS, keepalive: int = SERVE_KEEPALIVE,
+          backend: str = SERVE_BACKEND, on_exit: Optional[Callable[[object], None]] = None):
+    """Uruchamia aplikację z `app_factory()` na serwerze produkcyjnym (blokuje).
+
+    gunicorn: `workers` procesów gthread po `threads` wątków; każdy proces
+    buduje własną aplikację po fork (pule wątków i Chrome nie przeżywają
+    fork), a pliki statyczne idą przez wsgi.file_wrapper, czyli sendfile().
+    waitress i Werkzeug mają jeden proces - `workers` jest ignorowane.
+    `on_exit(app)` zamyka zasoby aplikacji przy wyjściu procesu.
+    """
+    backend = resolve_backend(backend)
+    workers = max(1, workers)
+    threads = max(1, threads)
+    print(f"[SERVER] {backend} na {host}:{port} (procesy: {workers if backend == 'gunicorn' else 1}, "
+          f"wątki: {threads}, keep-alive: {keepalive} s)")
+    if host not in LOCAL_HOSTS:
+        print(f"[SERVER] OSTRZEŻENIE: nasłuch na {host} - API (zapis plików, zapytania do Gemini) "
+              f"jest dostępne z sieci bez uwierzytelnienia")
+
+    if backend == 'gunicorn':
+        _serve_gunicorn(app_factory, host, port, workers, threads, keepalive, on_exit)
+        return
+
+    if workers > 1:
+        print(f"[SERVER] {backend} działa w jednym procesie - SERVE_WORKERS={workers} zignorowane")
+    app = app_factory()
+    try:
+        if backend == 'waitress':
+            from waitress import serve as waitress_serve
+            waitress_serve(app, host=host, port=port, threads=threads,
+                           channel_timeout=max(keepalive, SERVE_TIMEOUT), ident='slides')
+        else:
+            print("[SERVER] OSTRZEŻENIE: brak gunicorn/waitress - używam serwera Werkzeug")
+            from werkzeug.serving import run_simple
+            run_simple(host, port, app, threaded=True, use_reloader=False)
+    finally:
+        if on_exit:
+            on_exit(app)
+
+
+def _serve_gunicorn(app_factory, host, port, workers, threads, keepalive, on_exit):
+    from gunicorn.app.base import BaseApplication
+
+    def worker_exit(server, worker):
+        if on_exit and getattr(worker, 'wsgi', None) is not None:
+            on_exit(worker.wsgi)
+
+    class SlideApplication(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': f'{host}:{port}',
+                'workers': workers,
+                'worker_class': 'gthread',
+                'threads': threads,
+                'keepalive': keepalive,
+                'timeout': SERVE_TIMEOUT,
+                'graceful_timeout': 10,
+                'sendfile': True,
+                'accesslog': None,
+                'worker_exit': worker_exit,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app_factory()
+
+    SlideApplication().run()
+